@@ -13,6 +13,21 @@ class ProfessionalAdmin(admin.ModelAdmin):
     search_fields = ('user__email', 'license_number')
     list_filter = ('is_verified',)
 
+from .models import WaitlistProfessional
+
+@admin.register(WaitlistProfessional)
+class WaitlistProfessionalAdmin(admin.ModelAdmin):
+    list_display = ('email', 'full_name', 'medical_type', 'status', 'created_at')
+    search_fields = ('email', 'full_name')
+    list_filter = ('status', 'medical_type')
+    raw_id_fields = ('converted_user',)
+    actions = ['approve_entries']
+
+    @admin.action(description="Approve for onboarding (converted by the next conversion run)")
+    def approve_entries(self, request, queryset):
+        updated = queryset.filter(status='PENDING').update(status='APPROVED')
+        self.message_user(request, f"{updated} entries approved.")
+
 from django.contrib import admin
 from django.shortcuts import render, redirect
 from django.urls import path
@@ -31,6 +46,29 @@ class FacilityAdmin(admin.ModelAdmin):
     search_fields = ('name', 'user__email')
     list_filter = ('is_verified', 'tier')
     actions = ['fund_facility']
+    readonly_fields = ('document_previews',)
+
+    @admin.display(description="Document previews")
+    def document_previews(self, obj):
+        # Thumbnails come from core.tasks.generate_document_variants; PDFs just get a link
+        from django.utils.html import format_html, format_html_join
+        from core.blobs import get_blob_storage
+        from core.imaging import variant_key
+        storage = get_blob_storage()
+        previews = []
+        for label, document in (('CAC', obj.cac_file), ('License', obj.license_file), ('Other', obj.other_documents)):
+            if not document:
+                continue
+            thumb_key = variant_key(document.name, 'thumb')
+            review_key = variant_key(document.name, 'review')
+            if storage.exists(thumb_key):
+                link = storage.url(review_key) if storage.exists(review_key) else storage.url(document.name)
+                previews.append((link, format_html('<img src="{}" alt="{}" style="max-height:120px"/>', storage.url(thumb_key), label)))
+            else:
+                previews.append((storage.url(document.name), label))
+        if not previews:
+            return "-"
+        return format_html_join(' ', '<a href="{}" target="_blank">{}</a>', previews)
 
     def get_urls(self):
         urls = super().get_urls()
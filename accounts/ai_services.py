@@ -1,43 +1,235 @@
-import random
-from datetime import date, timedelta
+import asyncio
+import base64
+import hashlib
+import logging
+import re
+from datetime import date, datetime, timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+from core.blobs import get_blob_storage
+from core.imaging import variant_key
+
+logger = logging.getLogger(__name__)
+
+DATE_PATTERNS = (
+    (re.compile(r'\b(\d{4}-\d{2}-\d{2})\b'), '%Y-%m-%d'),
+    (re.compile(r'\b(\d{2}/\d{2}/\d{4})\b'), '%d/%m/%Y'),
+    (re.compile(r'\b(\d{1,2} [A-Za-z]{3,9} \d{4})\b'), None),
+)
+
+def parse_expiry_date(text):
+    """
+    Pull the first recognisable date out of the vision model's answer.
+    Returns None when nothing parses.
+    """
+    if not text:
+        return None
+    for pattern, fmt in DATE_PATTERNS:
+        for match in pattern.findall(text):
+            formats = [fmt] if fmt else ['%d %B %Y', '%d %b %Y']
+            for candidate in formats:
+                try:
+                    return datetime.strptime(match, candidate).date()
+                except ValueError:
+                    continue
+    return None
+
+class VisionBackend:
+    """
+    Pluggable model that reads a certificate image and answers with its expiry date as text.
+    Selected by AI_VISION_BACKEND.
+    """
+    async def read_certificate(self, image_bytes, location):
+        raise NotImplementedError
+
+class FakeVisionBackend(VisionBackend):
+    """
+    Local, offline stand-in for development and tests.
+    Reads a date straight out of the file contents; keeps the old mock's URL conventions
+    ("expired" / "invalid" in the location) so existing fixtures behave the same.
+    """
+    async def read_certificate(self, image_bytes, location):
+        location = str(location)
+        if "invalid" in location:
+            return ""
+        if "expired" in location:
+            return f"Expiry: {date.today() - timedelta(days=30)}"
+
+        text = image_bytes[:4096].decode('latin-1')
+        if parse_expiry_date(text):
+            return text
+        return f"Expiry: {date.today() + timedelta(days=365)}"
+
+class OpenAIVisionBackend(VisionBackend):
+    PROMPT = (
+        "This is a professional practising licence or certificate. "
+        "Reply with only its expiry date in YYYY-MM-DD format, or NONE if it cannot be read."
+    )
+
+    def __init__(self):
+        from openai import AsyncOpenAI
+        self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+
+    async def read_certificate(self, image_bytes, location):
+        encoded = base64.b64encode(image_bytes).decode('ascii')
+        response = await self.client.chat.completions.create(
+            model=settings.AI_VISION_MODEL,
+            messages=[{
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": self.PROMPT},
+                    {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{encoded}"}},
+                ],
+            }],
+            max_tokens=20,
+        )
+        return response.choices[0].message.content or ""
 
 class AIVerificationService:
-    def verify_certificate(self, image_url):
-        """
-        Mock implementation of AI verification.
-        In real life, this would:
-        1. Download image from Azure Blob Storage (image_url).
-        2. Send to Gemini/OpenAI Vision API.
-        3. Extract expiry date.
-        4. Delete image (as per requirement).
-        """
-        print(f"AI Service: Verifying certificate at {image_url}...")
-        
-        # Simulate processing time
-        # ...
-        
-        # Mock Logic:
-        # If URL contains "expired", simulate expired certificate.
-        # If URL contains "invalid", simulate unreadable.
-        # Otherwise, valid.
-        
-        if "expired" in image_url:
-            expiry_date = date.today() - timedelta(days=30)
+    def __init__(self, backend=None, storage=None):
+        self.backend = backend or import_string(settings.AI_VISION_BACKEND)()
+        self.storage = storage or get_blob_storage()
+
+    def evaluate(self, expiry_date):
+        if expiry_date is None:
             return {
-                "is_valid": False,
-                "expiry_date": expiry_date,
-                "reason": "Certificate expired on " + str(expiry_date)
-            }
-        elif "invalid" in image_url:
-             return {
                 "is_valid": False,
                 "expiry_date": None,
                 "reason": "Could not read expiry date."
             }
-        else:
-            expiry_date = date.today() + timedelta(days=365)
+        if expiry_date < date.today():
             return {
-                "is_valid": True,
+                "is_valid": False,
                 "expiry_date": expiry_date,
-                "reason": None
+                "reason": "Certificate expired on " + str(expiry_date)
             }
+        return {
+            "is_valid": True,
+            "expiry_date": expiry_date,
+            "reason": None
+        }
+
+    async def averify_certificate(self, image_url):
+        """
+        1. Download image from blob storage (image_url), review-size copy when there is one.
+        2. Send to the configured vision backend.
+        3. Extract expiry date.
+        """
+        original = await asyncio.to_thread(self.storage.read, image_url)
+
+        # Re-uploads and admin re-checks of the same file skip the model call entirely.
+        # Keyed on the original upload, so it hits whether or not the review copy exists yet.
+        cache_key = self.cache_key(original)
+        try:
+            cached = await cache.aget(cache_key)
+        except Exception:
+            logger.warning("Verification cache unavailable", exc_info=True)
+            cached = None
+        if cached is not None:
+            return self.evaluate(date.fromisoformat(cached) if cached else None)
+
+        image_bytes = await asyncio.to_thread(self.read_image, image_url, original)
+        answer = await self.backend.read_certificate(image_bytes, image_url)
+        expiry_date = parse_expiry_date(answer)
+        # Only the extracted date is cached; validity is re-evaluated against today on every hit
+        try:
+            await cache.aset(cache_key, expiry_date.isoformat() if expiry_date else "", settings.AI_VERIFICATION_CACHE_TTL_SECONDS)
+        except Exception:
+            logger.warning("Verification cache unavailable", exc_info=True)
+        return self.evaluate(expiry_date)
+
+    def read_image(self, image_url, original):
+        # Prefer the downscaled review copy (see core.tasks.generate_document_variants)
+        review_key = variant_key(self.storage.key_for(image_url), 'review')
+        if self.storage.exists(review_key):
+            return self.storage.read(review_key)
+        return original
+
+    def cache_key(self, image_bytes):
+        return f"certverify:{type(self.backend).__name__}:{hashlib.sha256(image_bytes).hexdigest()}"
+
+    def verify_certificate(self, image_url):
+        return asyncio.run(self.averify_certificate(image_url))
+
+class CertificateVerificationPipeline:
+    """
+    Verifies many certificates at once: downloads and model calls run concurrently on asyncio,
+    bounded by AI_VERIFICATION_CONCURRENCY, with exponential-backoff retries; results are
+    written back with a single bulk_update.
+    """
+    # Missing files and unparseable input won't get better by retrying
+    PERMANENT_ERRORS = (FileNotFoundError, ValueError)
+
+    def __init__(self, service=None, concurrency=None, max_retries=None, backoff=None):
+        self.service = service or AIVerificationService()
+        self.concurrency = concurrency or settings.AI_VERIFICATION_CONCURRENCY
+        self.max_retries = settings.AI_VERIFICATION_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff = settings.AI_VERIFICATION_RETRY_BACKOFF_SECONDS if backoff is None else backoff
+
+    async def _verify_one(self, semaphore, location):
+        async with semaphore:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    return await self.service.averify_certificate(location)
+                except self.PERMANENT_ERRORS:
+                    raise
+                except Exception:
+                    if attempt == self.max_retries:
+                        raise
+                    await asyncio.sleep(self.backoff * (2 ** attempt))
+
+    async def verify_many(self, locations):
+        """
+        {key: location} -> {key: result dict or the exception that ended its retries}
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        keys = list(locations)
+        results = await asyncio.gather(
+            *(self._verify_one(semaphore, locations[key]) for key in keys),
+            return_exceptions=True
+        )
+        return dict(zip(keys, results))
+
+    def run(self, professional_ids):
+        from .models import Professional
+
+        professionals = {
+            pro.id: pro for pro in
+            Professional.objects.filter(id__in=professional_ids, certificate_url__isnull=False)
+            .only('id', 'certificate_url', 'license_expiry_date', 'license_warning_stage', 'is_verified', 'rejection_reason')
+        }
+        if not professionals:
+            return {"verified": 0, "rejected": 0, "failed": 0}
+
+        results = asyncio.run(self.verify_many({pro_id: pro.certificate_url for pro_id, pro in professionals.items()}))
+
+        updated = []
+        summary = {"verified": 0, "rejected": 0, "failed": 0}
+        for pro_id, result in results.items():
+            pro = professionals[pro_id]
+            if isinstance(result, BaseException):
+                logger.warning("Certificate verification failed for professional %s: %r", pro_id, result)
+                summary["failed"] += 1
+                continue
+
+            if result["expiry_date"] is not None:
+                if result["expiry_date"] != pro.license_expiry_date:
+                    # New licence: the expiry sweep should warn again from scratch
+                    pro.license_warning_stage = None
+                pro.license_expiry_date = result["expiry_date"]
+            if result["is_valid"]:
+                pro.rejection_reason = None
+                summary["verified"] += 1
+            else:
+                pro.is_verified = False
+                pro.rejection_reason = result["reason"]
+                summary["rejected"] += 1
+            updated.append(pro)
+
+        Professional.objects.bulk_update(
+            updated,
+            ['license_expiry_date', 'license_warning_stage', 'is_verified', 'rejection_reason'],
+            batch_size=500
+        )
+        return summary
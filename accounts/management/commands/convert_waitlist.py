@@ -0,0 +1,20 @@
+import time
+from django.core.management.base import BaseCommand
+from accounts.services import WaitlistConversionService
+
+class Command(BaseCommand):
+    help = "Create User + Professional accounts for APPROVED waitlist entries and email them invite links."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, help="Convert at most this many entries")
+        parser.add_argument("--chunk-size", type=int, help=f"Entries per transaction (default {WaitlistConversionService.CHUNK_SIZE})")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        stats = WaitlistConversionService()(limit=options["limit"], chunk_size=options["chunk_size"])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Converted {stats['converted']} entries ({stats['already_registered']} already registered, "
+            f"{stats['duplicates']} duplicates) "
+            f"in {time.monotonic() - started:.1f}s"
+        ))
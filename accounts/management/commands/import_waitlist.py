@@ -0,0 +1,28 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from accounts.services import WaitlistImportService
+
+class Command(BaseCommand):
+    help = "Bulk-import waitlist signups from a CSV or NDJSON file, skipping emails already on the waitlist."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=["csv", "ndjson"], help="Defaults to the file extension")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        file_format = options["format"] or ("ndjson" if path.endswith((".ndjson", ".jsonl")) else "csv")
+
+        started = time.monotonic()
+        try:
+            with open(path, encoding="utf-8-sig", newline="") as stream:
+                stats = WaitlistImportService()(stream, file_format)
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        for error in stats["errors"]:
+            self.stderr.write(f"row {error['row']}: {error['error']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {stats['created']} of {stats['received']} rows "
+            f"({stats['duplicates']} duplicates, {stats['invalid']} invalid) in {time.monotonic() - started:.1f}s"
+        ))
@@ -0,0 +1,17 @@
+import time
+from django.core.management.base import BaseCommand
+from accounts.stats import rebuild_stats
+
+class Command(BaseCommand):
+    help = "Recompute the applicant-ranking counters (completions, cancellations) from applications and reviews."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=5000, help="Rows per upsert batch")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        stats = rebuild_stats(chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt stats for {stats['professionals']} professionals "
+            f"({stats['facility_pairs']} professional/facility pairs) in {time.monotonic() - started:.1f}s"
+        ))
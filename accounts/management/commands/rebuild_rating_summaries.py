@@ -0,0 +1,16 @@
+import time
+from django.core.management.base import BaseCommand
+from accounts.ratings import rebuild_rating_summaries
+
+class Command(BaseCommand):
+    help = "Backfill (or repair) per-user rating summaries and recent-window day buckets from the Review table."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=5000, help="Rows per upsert batch")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        stats = rebuild_rating_summaries(chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {stats['summaries']} rating summaries ({stats['days']} day buckets) in {time.monotonic() - started:.1f}s"
+        ))
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_waitlistprofessional_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='professional',
+            name='license_warning_stage',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='professional',
+            index=models.Index(fields=['is_verified', 'license_expiry_date'], name='accounts_pro_expiry_idx'),
+        ),
+    ]
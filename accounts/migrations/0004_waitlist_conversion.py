@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:09
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_license_expiry_sweep'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='waitlistprofessional',
+            name='converted_user',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='waitlist_entry', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='waitlistprofessional',
+            name='status',
+            field=models.CharField(choices=[('PENDING', 'Pending'), ('APPROVED', 'Approved'), ('CONVERTED', 'Converted'), ('REJECTED', 'Rejected')], db_index=True, default='PENDING', max_length=20),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:42
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_waitlist_conversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfessionalStats',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('completed_count', models.PositiveIntegerField(default=0)),
+                ('cancellation_count', models.PositiveIntegerField(default=0)),
+                ('late_cancellation_count', models.PositiveIntegerField(default=0)),
+                ('rating_count', models.PositiveIntegerField(default=0)),
+                ('rating_sum', models.PositiveIntegerField(default=0)),
+                ('professional', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='accounts.professional')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ProfessionalFacilityStats',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('completed_count', models.PositiveIntegerField(default=0)),
+                ('facility', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='professional_stats', to='accounts.facility')),
+                ('professional', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='facility_stats', to='accounts.professional')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('professional', 'facility'), name='accounts_pro_facility_stats_uniq')],
+            },
+        ),
+    ]
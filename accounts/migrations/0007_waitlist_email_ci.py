@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:36
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_rating_summary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='waitlistprofessional',
+            index=models.Index(django.db.models.functions.text.Lower('email'), name='accounts_waitlist_email_ci_idx'),
+        ),
+    ]
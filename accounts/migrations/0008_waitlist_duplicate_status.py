@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_waitlist_email_ci'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='waitlistprofessional',
+            name='status',
+            field=models.CharField(choices=[('PENDING', 'Pending'), ('APPROVED', 'Approved'), ('CONVERTED', 'Converted'), ('DUPLICATE', 'Duplicate'), ('REJECTED', 'Rejected')], db_index=True, default='PENDING', max_length=20),
+        ),
+    ]
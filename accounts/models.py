@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models.functions import Lower
 from django.utils.translation import gettext_lazy as _
 from .managers import CustomUserManager
 from core.models import BaseModel
@@ -45,6 +46,15 @@ class Professional(BaseModel):
     country = models.CharField(max_length=100, default='Nigeria')
     currency = models.CharField(max_length=10, default='NGN')
 
+    # Smallest "days before expiry" warning already sent (60/30/7); reset when the licence is renewed
+    license_warning_stage = models.PositiveSmallIntegerField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Nightly expiry sweep: verified professionals by expiry date range
+            models.Index(fields=['is_verified', 'license_expiry_date'], name='accounts_pro_expiry_idx'),
+        ]
+
     def __str__(self):
         return f"Professional: {self.user.email}"
 
@@ -101,7 +111,91 @@ class Review(BaseModel):
     def __str__(self):
         return f"{self.rating} star review for {self.target_user}"
 
+class RatingSummary(BaseModel):
+    """
+    Running totals of a user's reviews, updated in the transaction that inserts each review
+    (accounts.ratings.create_review), so showing a rating never aggregates Review rows.
+    recent_* covers the last RATING_RECENT_WINDOW_DAYS days, kept in step by the nightly roll-off.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='rating_summary')
+    count = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+    # Histogram
+    stars_1 = models.PositiveIntegerField(default=0)
+    stars_2 = models.PositiveIntegerField(default=0)
+    stars_3 = models.PositiveIntegerField(default=0)
+    stars_4 = models.PositiveIntegerField(default=0)
+    stars_5 = models.PositiveIntegerField(default=0)
+    recent_count = models.PositiveIntegerField(default=0)
+    recent_total = models.PositiveIntegerField(default=0)
+
+    @property
+    def average(self):
+        return self.total / self.count if self.count else None
+
+    @property
+    def recent_average(self):
+        return self.recent_total / self.recent_count if self.recent_count else None
+
+    def __str__(self):
+        return f"{self.user}: {self.count} reviews"
+
+class RatingDay(BaseModel):
+    """
+    Per-user, per-day review totals inside the recent window; the roll-off subtracts and
+    deletes days as they age out.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='rating_days')
+    day = models.DateField()
+    count = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'day'], name='accounts_rating_day_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['day'], name='accounts_rating_day_idx'),
+        ]
+
+class ProfessionalStats(BaseModel):
+    """
+    Running counters behind applicant ranking, bumped as things happen (see accounts.stats)
+    so ranking never aggregates over applications. Ratings come from RatingSummary.
+    """
+    professional = models.OneToOneField(Professional, on_delete=models.CASCADE, related_name='stats')
+    completed_count = models.PositiveIntegerField(default=0)
+    cancellation_count = models.PositiveIntegerField(default=0)
+    late_cancellation_count = models.PositiveIntegerField(default=0) # Cancelled inside the 4-hour window
+
+    def __str__(self):
+        return f"Stats for {self.professional}"
+
+class ProfessionalFacilityStats(BaseModel):
+    """
+    Completed shifts per professional per facility ("has worked here before").
+    """
+    professional = models.ForeignKey(Professional, on_delete=models.CASCADE, related_name='facility_stats')
+    facility = models.ForeignKey(Facility, on_delete=models.CASCADE, related_name='professional_stats')
+    completed_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['professional', 'facility'], name='accounts_pro_facility_stats_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.professional} at {self.facility}: {self.completed_count}"
+
 class WaitlistProfessional(BaseModel):
+    STATUS_CHOICES = (
+        ('PENDING', 'Pending'),
+        ('APPROVED', 'Approved'), # Picked up by the conversion job
+        ('CONVERTED', 'Converted'),
+        ('DUPLICATE', 'Duplicate'), # Same email (any case) as an entry that was already converted
+        ('REJECTED', 'Rejected'),
+    )
+
     email = models.EmailField(unique=True)
     full_name = models.CharField(max_length=255)
     phone_number = models.CharField(max_length=20)
@@ -113,6 +207,14 @@ class WaitlistProfessional(BaseModel):
     shift_rate_9hr = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     years_of_experience = models.IntegerField(null=True, blank=True)
     bio_data = models.TextField(null=True, blank=True) # Any other details
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING', db_index=True)
+    converted_user = models.OneToOneField(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='waitlist_entry')
+
+    class Meta:
+        indexes = [
+            # Dedupe lookups are case-insensitive (older signups weren't lowercased)
+            models.Index(Lower('email'), name='accounts_waitlist_email_ci_idx'),
+        ]
     
     def __str__(self):
         return f"Waitlist: {self.email} ({self.medical_type})"
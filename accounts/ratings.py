@@ -0,0 +1,126 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Q, Sum, Value, When
+from django.utils import timezone
+from .models import RatingDay, RatingSummary, Review
+
+def _recent_cutoff(today=None):
+    # First day still inside the recent window
+    today = today or timezone.localdate()
+    return today - timedelta(days=settings.RATING_RECENT_WINDOW_DAYS - 1)
+
+@transaction.atomic
+def create_review(reviewer, target_user, rating, comment):
+    """
+    Insert a review and fold it into the target's RatingSummary and today's RatingDay in the
+    same transaction: three small writes, no aggregate over the target's reviews.
+    """
+    if rating not in range(1, 6):
+        raise ValueError("Rating must be between 1 and 5.")
+
+    review = Review.objects.create(reviewer=reviewer, target_user=target_user, rating=rating, comment=comment)
+
+    RatingSummary.objects.get_or_create(user_id=target_user.id)
+    RatingSummary.objects.filter(user_id=target_user.id).update(**{
+        "count": F('count') + 1,
+        "total": F('total') + rating,
+        f"stars_{rating}": F(f"stars_{rating}") + 1,
+        "recent_count": F('recent_count') + 1,
+        "recent_total": F('recent_total') + rating,
+        "updated_at": timezone.now(),
+    })
+
+    today = timezone.localdate()
+    RatingDay.objects.get_or_create(user_id=target_user.id, day=today)
+    RatingDay.objects.filter(user_id=target_user.id, day=today).update(count=F('count') + 1, total=F('total') + rating)
+    return review
+
+def roll_recent_window(today=None):
+    """
+    Subtract days that have aged out of the recent window from each summary, then drop them.
+    One locked read, one UPDATE and one DELETE for everything that expired.
+    """
+    cutoff = _recent_cutoff(today)
+    with transaction.atomic():
+        rows = list(
+            RatingDay.objects.filter(day__lt=cutoff).select_for_update().values_list('id', 'user_id', 'count', 'total')
+        )
+        if not rows:
+            return 0
+        expired = defaultdict(lambda: [0, 0])
+        for _, user_id, count, total in rows:
+            expired[user_id][0] += count
+            expired[user_id][1] += total
+
+        RatingSummary.objects.filter(user_id__in=list(expired)).update(
+            recent_count=F('recent_count') - Case(
+                *[When(user_id=user_id, then=Value(count)) for user_id, (count, _) in expired.items()],
+                default=Value(0), output_field=IntegerField()
+            ),
+            recent_total=F('recent_total') - Case(
+                *[When(user_id=user_id, then=Value(total)) for user_id, (_, total) in expired.items()],
+                default=Value(0), output_field=IntegerField()
+            ),
+            updated_at=timezone.now()
+        )
+        RatingDay.objects.filter(id__in=[row[0] for row in rows]).delete()
+    return len(expired)
+
+def rebuild_rating_summaries(chunk_size=5000):
+    """
+    Backfill/repair: recompute every summary and the in-window days from the Review table.
+    Grouped queries streamed into chunked upserts.
+    """
+    cutoff = _recent_cutoff()
+    tz = timezone.get_current_timezone()
+    window_start = timezone.make_aware(datetime.combine(cutoff, time.min), tz)
+
+    totals = (
+        Review.objects.values('target_user_id')
+        .annotate(
+            count=Count('id'),
+            total=Sum('rating'),
+            recent_count=Count('id', filter=Q(created_at__gte=window_start)),
+            recent_total=Sum('rating', filter=Q(created_at__gte=window_start), default=0),
+            **{f"stars_{stars}": Count('id', filter=Q(rating=stars)) for stars in range(1, 6)}
+        )
+        .order_by()
+    )
+    summaries = 0
+    batch = []
+    for row in totals.iterator(chunk_size=chunk_size):
+        user_id = row.pop('target_user_id')
+        batch.append(RatingSummary(user_id=user_id, **row))
+        if len(batch) >= chunk_size:
+            summaries += _upsert_summaries(batch)
+            batch = []
+    summaries += _upsert_summaries(batch)
+
+    # Day buckets for the window, grouped in Python by local date
+    days = defaultdict(lambda: [0, 0])
+    for user_id, created_at, rating in (
+        Review.objects.filter(created_at__gte=window_start)
+        .values_list('target_user_id', 'created_at', 'rating')
+        .iterator(chunk_size=chunk_size)
+    ):
+        bucket = days[(user_id, timezone.localtime(created_at, tz).date())]
+        bucket[0] += 1
+        bucket[1] += rating
+    with transaction.atomic():
+        RatingDay.objects.all().delete()
+        RatingDay.objects.bulk_create(
+            [RatingDay(user_id=user_id, day=day, count=count, total=total) for (user_id, day), (count, total) in days.items()],
+            batch_size=chunk_size
+        )
+    return {"summaries": summaries, "days": len(days)}
+
+def _upsert_summaries(batch):
+    if not batch:
+        return 0
+    RatingSummary.objects.bulk_create(
+        batch, update_conflicts=True, unique_fields=['user'],
+        update_fields=['count', 'total', 'stars_1', 'stars_2', 'stars_3', 'stars_4', 'stars_5', 'recent_count', 'recent_total']
+    )
+    return len(batch)
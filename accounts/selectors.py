@@ -1,5 +1,5 @@
 from core.services import BaseSelector
-from .models import User
+from .models import RatingSummary, User
 
 class UserSelector(BaseSelector):
     def get_user_by_email(self, email):
@@ -21,6 +21,14 @@ class UserSelector(BaseSelector):
                 "specialties": user.professional.specialties,
                 "is_verified": user.professional.is_verified
             }
+        # Precomputed; no aggregate over reviews
+        summary = RatingSummary.objects.filter(user=user).first()
+        data["rating"] = {
+            "average": round(summary.average, 2) if summary and summary.count else None,
+            "count": summary.count if summary else 0,
+            "recent_average": round(summary.recent_average, 2) if summary and summary.recent_count else None,
+            "histogram": {str(stars): getattr(summary, f"stars_{stars}") if summary else 0 for stars in range(1, 6)},
+        }
         if user.is_facility:
             data["facility"] = {
                 "name": user.facility.name,
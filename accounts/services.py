@@ -1,8 +1,12 @@
 from django.contrib.auth import authenticate
 from rest_framework.authtoken.models import Token
 from django.db import transaction
+from django.db.models.functions import Lower
 from core.services import BaseService
-from .models import User, Professional, Facility
+from .models import User, Professional, Facility, WaitlistProfessional
+from decimal import Decimal, InvalidOperation
+import csv
+import json
 
 class UserRegisterService(BaseService):
     @transaction.atomic
@@ -76,12 +80,20 @@ class ProfessionalUpdateService(BaseService):
             
         if certificate_url is not None:
             professional.certificate_url = certificate_url
-            # Trigger AI Verification
-            from .tasks import verify_professional_certificate
-            verify_professional_certificate.delay(professional.id)
             
         professional.save()
-        professional.save()
+
+        if certificate_url is not None:
+            # Trigger AI Verification once the new URL is committed, so the worker reads it.
+            # Queued independently of the variants: verification uses the review copy when it
+            # already exists and the original otherwise, so a failed resize can't block it.
+            from core.tasks import generate_document_variants
+            from .tasks import verify_professional_certificate
+            def enqueue():
+                generate_document_variants.delay([certificate_url])
+                verify_professional_certificate.delay(str(professional.id))
+            transaction.on_commit(enqueue)
+
         return professional
 
 from .models import FacilityStaff
@@ -117,3 +129,258 @@ class FacilityStaffService(BaseService):
             staff.can_view_financials = permissions.get('can_view_financials', staff.can_view_financials)
         staff.save()
         return staff
+
+class WaitlistImportService(BaseService):
+    """
+    Bulk waitlist import from CSV or NDJSON (one JSON object per line).
+    The input is parsed as a stream and written in chunks: each chunk is deduped in memory,
+    checked against the DB with one IN query and inserted with one bulk_create.
+    """
+    CHUNK_SIZE = 2000
+    MAX_REPORTED_ERRORS = 50
+
+    def __call__(self, stream, file_format):
+        if file_format == 'csv':
+            rows = csv.DictReader(stream)
+        elif file_format == 'ndjson':
+            rows = (json.loads(line) for line in stream if line.strip())
+        else:
+            raise ValueError("Format must be 'csv' or 'ndjson'.")
+
+        stats = {"received": 0, "created": 0, "duplicates": 0, "invalid": 0, "errors": []}
+        seen = set()
+        chunk = []
+        try:
+            for line_no, row in enumerate(rows, start=1):
+                stats["received"] += 1
+                try:
+                    entry = self.build_entry(row)
+                except ValueError as e:
+                    stats["invalid"] += 1
+                    if len(stats["errors"]) < self.MAX_REPORTED_ERRORS:
+                        stats["errors"].append({"row": line_no, "error": str(e)})
+                    continue
+
+                if entry.email in seen:
+                    stats["duplicates"] += 1
+                    continue
+                seen.add(entry.email)
+                chunk.append(entry)
+
+                if len(chunk) >= self.CHUNK_SIZE:
+                    self.flush(chunk, stats)
+                    chunk = []
+        except (csv.Error, json.JSONDecodeError, UnicodeDecodeError) as e:
+            raise ValueError(f"Could not parse row {stats['received']}: {e}")
+
+        if chunk:
+            self.flush(chunk, stats)
+        return stats
+
+    def flush(self, chunk, stats):
+        # Imported emails are lowercased; match existing rows case-insensitively too
+        existing = set(
+            WaitlistProfessional.objects.annotate(email_ci=Lower('email'))
+            .filter(email_ci__in=[entry.email for entry in chunk])
+            .values_list('email_ci', flat=True)
+        )
+        new_entries = [entry for entry in chunk if entry.email not in existing]
+        # ignore_conflicts covers signups that land between the IN check and the insert
+        WaitlistProfessional.objects.bulk_create(new_entries, ignore_conflicts=True)
+        # Skipped conflicts don't raise, so count what actually made it in
+        inserted = WaitlistProfessional.objects.filter(id__in=[entry.id for entry in new_entries]).count() if new_entries else 0
+        stats["duplicates"] += len(chunk) - inserted
+        stats["created"] += inserted
+
+    def build_entry(self, row):
+        if not isinstance(row, dict):
+            raise ValueError("Row must be an object.")
+        email = (row.get("email") or "").strip().lower()
+        full_name = (row.get("full_name") or "").strip()
+        if not email or "@" not in email or not full_name:
+            raise ValueError("Email and Name are required")
+
+        shift_rate_9hr = row.get("shift_rate_9hr") or None
+        years_of_experience = row.get("years_of_experience") or None
+        try:
+            if shift_rate_9hr is not None:
+                shift_rate_9hr = Decimal(str(shift_rate_9hr))
+            if years_of_experience is not None:
+                years_of_experience = int(years_of_experience)
+        except (InvalidOperation, ValueError):
+            raise ValueError("shift_rate_9hr and years_of_experience must be numbers")
+
+        return WaitlistProfessional(
+            email=email,
+            full_name=full_name,
+            phone_number=row.get("phone_number") or "",
+            medical_type=row.get("medical_type") or "",
+            bio_data=row.get("bio_data") or None,
+            location=row.get("location") or None,
+            preferred_work_address=row.get("preferred_work_address") or None,
+            shift_rate_9hr=shift_rate_9hr,
+            years_of_experience=years_of_experience
+        )
+
+class WaitlistConversionService(BaseService):
+    """
+    Turns APPROVED waitlist entries into User + Professional rows in chunks.
+    Accounts are created without a usable password (so there is no hashing cost); once each
+    chunk commits, its professionals are emailed an invite link to set one (PasswordResetService).
+    Rows are written with bulk_create, one transaction per chunk.
+    """
+    CHUNK_SIZE = 200
+
+    def __call__(self, limit=None, chunk_size=None):
+        from django.contrib.auth.hashers import make_password
+        from .tasks import send_account_invites
+
+        chunk_size = chunk_size or self.CHUNK_SIZE
+        stats = {"converted": 0, "already_registered": 0, "duplicates": 0}
+
+        while limit is None or sum(stats.values()) < limit:
+            batch = chunk_size if limit is None else min(chunk_size, limit - sum(stats.values()))
+            with transaction.atomic():
+                # skip_locked lets several workers convert different chunks at once
+                entries = list(
+                    WaitlistProfessional.objects.filter(status='APPROVED')
+                    .select_for_update(skip_locked=True)
+                    .order_by('created_at')[:batch]
+                )
+                if not entries:
+                    break
+
+                # bulk_create skips create_user, so normalise the way it does
+                emails = {entry.id: User.objects.normalize_email(entry.email) for entry in entries}
+                existing = dict(
+                    User.objects.annotate(email_ci=Lower('email'))
+                    .filter(email_ci__in=[email.lower() for email in emails.values()])
+                    .values_list('email_ci', 'id')
+                )
+                # converted_user is one-to-one: a user another entry already points at can't be linked again
+                linked = set(
+                    WaitlistProfessional.objects.filter(converted_user_id__in=existing.values())
+                    .values_list('converted_user_id', flat=True)
+                )
+
+                # Older signups weren't lowercased, so one person can have several case-variant entries
+                to_convert, to_link, duplicates = [], [], []
+                seen = set()
+                for entry in entries:
+                    email_ci = emails[entry.id].lower()
+                    if email_ci in seen or existing.get(email_ci) in linked:
+                        duplicates.append(entry)
+                    elif email_ci in existing:
+                        to_link.append(entry)
+                    else:
+                        to_convert.append(entry)
+                    seen.add(email_ci)
+
+                users = []
+                for entry in to_convert:
+                    first_name, _, last_name = entry.full_name.partition(' ')
+                    users.append(User(
+                        email=emails[entry.id],
+                        password=make_password(None),
+                        first_name=first_name[:150],
+                        last_name=last_name[:150]
+                    ))
+                User.objects.bulk_create(users)
+                Professional.objects.bulk_create([
+                    Professional(
+                        user=user,
+                        # Real licence number is collected during profile completion / certificate verification
+                        license_number=f"PENDING-{entry.id.hex[:12].upper()}"
+                    ) for entry, user in zip(to_convert, users)
+                ])
+
+                for entry, user in zip(to_convert, users):
+                    entry.status = 'CONVERTED'
+                    entry.converted_user_id = user.id
+                for entry in to_link:
+                    entry.status = 'CONVERTED'
+                    entry.converted_user_id = existing[emails[entry.id].lower()]
+                for entry in duplicates:
+                    entry.status = 'DUPLICATE'
+                WaitlistProfessional.objects.bulk_update(entries, ['status', 'converted_user'])
+
+                if users:
+                    user_ids = [str(user.id) for user in users]
+                    transaction.on_commit(lambda user_ids=user_ids: send_account_invites.delay(user_ids))
+
+            stats["converted"] += len(to_convert)
+            stats["already_registered"] += len(to_link)
+            stats["duplicates"] += len(duplicates)
+
+        return stats
+
+class PasswordResetService(BaseService):
+    """
+    Email-link password setting, used both for "forgot password" and for inviting accounts
+    that were created without a password (waitlist conversion).
+    Links carry a Django password-reset token, which stops working once the password changes.
+    """
+    INVITE_SUBJECT = "Your Shifta account is ready"
+    RESET_SUBJECT = "Reset your Shifta password"
+
+    def link_for(self, user):
+        from django.conf import settings
+        from django.contrib.auth.tokens import default_token_generator
+        from django.utils.encoding import force_bytes
+        from django.utils.http import urlsafe_base64_encode
+        return settings.PASSWORD_RESET_URL.format(
+            uid=urlsafe_base64_encode(force_bytes(user.pk)),
+            token=default_token_generator.make_token(user)
+        )
+
+    def send_invites(self, users):
+        from django.conf import settings
+        from django.core.mail import send_mass_mail
+        messages = [
+            (
+                self.INVITE_SUBJECT,
+                f"Hi {user.first_name or 'there'},\n\nYou're off the waitlist. "
+                f"Set a password to sign in: {self.link_for(user)}\n\n"
+                "If the link has expired, use \"Forgot password\" with this email address.",
+                settings.DEFAULT_FROM_EMAIL,
+                [user.email]
+            ) for user in users
+        ]
+        return send_mass_mail(messages, fail_silently=False)
+
+    def request_reset(self, email):
+        from django.conf import settings
+        from django.core.mail import send_mail
+        # Silent when there is no such account, so the endpoint can't be used to probe emails
+        user = User.objects.filter(email__iexact=(email or "").strip(), is_active=True).first()
+        if user is None:
+            return
+        send_mail(
+            self.RESET_SUBJECT,
+            f"Set a new password here: {self.link_for(user)}\n\nIf you didn't ask for this, ignore this email.",
+            settings.DEFAULT_FROM_EMAIL,
+            [user.email]
+        )
+
+    def confirm(self, uid, token, password):
+        from django.contrib.auth.password_validation import validate_password
+        from django.contrib.auth.tokens import default_token_generator
+        from django.core.exceptions import ValidationError
+        from django.utils.http import urlsafe_base64_decode
+
+        try:
+            user = User.objects.get(pk=urlsafe_base64_decode(uid or "").decode())
+        except (TypeError, ValueError, OverflowError, ValidationError, User.DoesNotExist):
+            user = None
+        if user is None or not default_token_generator.check_token(user, token):
+            raise ValueError("Invalid or expired link.")
+
+        try:
+            validate_password(password, user)
+        except ValidationError as e:
+            raise ValueError(" ".join(e.messages))
+        user.set_password(password)
+        user.save(update_fields=['password'])
+
+        token, _ = Token.objects.get_or_create(user=user)
+        return user, token.key
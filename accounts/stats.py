@@ -0,0 +1,115 @@
+from collections import Counter
+from django.db.models import Case, F, IntegerField, Value, When
+from .models import ProfessionalStats, ProfessionalFacilityStats
+
+# Incremental upkeep for the ranking counters. Each helper is a couple of set-based
+# statements (create missing rows, then F() increments), safe to call inside the
+# transaction that caused the change.
+
+def _ensure_stats(professional_ids):
+    ProfessionalStats.objects.bulk_create(
+        [ProfessionalStats(professional_id=professional_id) for professional_id in professional_ids],
+        ignore_conflicts=True
+    )
+
+def _increments(counts, key='id'):
+    return Case(
+        *[When(**{key: obj_id}, then=Value(count)) for obj_id, count in counts.items()],
+        default=Value(0), output_field=IntegerField()
+    )
+
+def record_completions(pairs):
+    """
+    pairs: (professional_id, facility_id) for every application that just completed.
+    """
+    if not pairs:
+        return
+    per_professional = Counter(professional_id for professional_id, _ in pairs)
+    per_facility = Counter(pairs)
+
+    _ensure_stats(per_professional)
+    ProfessionalStats.objects.filter(professional_id__in=list(per_professional)).update(
+        completed_count=F('completed_count') + _increments(per_professional, key='professional_id')
+    )
+
+    ProfessionalFacilityStats.objects.bulk_create(
+        [ProfessionalFacilityStats(professional_id=pro_id, facility_id=facility_id) for pro_id, facility_id in per_facility],
+        ignore_conflicts=True
+    )
+    # One UPDATE per facility in the batch (a batch is usually a handful of facilities)
+    by_facility = {}
+    for (professional_id, facility_id), count in per_facility.items():
+        by_facility.setdefault(facility_id, {})[professional_id] = count
+    for facility_id, counts in by_facility.items():
+        ProfessionalFacilityStats.objects.filter(facility_id=facility_id, professional_id__in=list(counts)).update(
+            completed_count=F('completed_count') + _increments(counts, key='professional_id')
+        )
+
+def record_cancellation(professional_id, late):
+    _ensure_stats([professional_id])
+    ProfessionalStats.objects.filter(professional_id=professional_id).update(
+        cancellation_count=F('cancellation_count') + 1,
+        late_cancellation_count=F('late_cancellation_count') + (1 if late else 0)
+    )
+
+# Comment the late-cancellation path leaves on its automatic 1-star review
+LATE_CANCELLATION_REVIEW = "Automatic review: Late cancellation."
+
+def rebuild_stats(chunk_size=5000):
+    """
+    Recompute every counter from applications (and late-cancellation reviews) for the initial
+    backfill, or after repairs. One grouped query per counter, written back with chunked upserts.
+    Historical cancellations can't be told apart by who cancelled, so all of them count;
+    late ones are recognised by the automatic review they left.
+    """
+    from django.db.models import Count, Q
+    from shifts.models import ShiftApplication
+    from .models import Review
+
+    rows = {}
+    def row(professional_id):
+        return rows.setdefault(professional_id, ProfessionalStats(professional_id=professional_id))
+
+    applications = (
+        ShiftApplication.objects.filter(status__in=['COMPLETED', 'CANCELLED'])
+        .values('professional_id')
+        .annotate(
+            completed=Count('id', filter=Q(status='COMPLETED')),
+            cancelled=Count('id', filter=Q(status='CANCELLED'))
+        )
+    )
+    for item in applications.iterator(chunk_size=chunk_size):
+        stats = row(item['professional_id'])
+        stats.completed_count = item['completed']
+        stats.cancellation_count = item['cancelled']
+
+    late = (
+        Review.objects.filter(comment=LATE_CANCELLATION_REVIEW, target_user__professional__isnull=False)
+        .values('target_user__professional')
+        .annotate(late=Count('id'))
+    )
+    for item in late.iterator(chunk_size=chunk_size):
+        row(item['target_user__professional']).late_cancellation_count = item['late']
+
+    ProfessionalStats.objects.bulk_create(
+        rows.values(), batch_size=chunk_size,
+        update_conflicts=True, unique_fields=['professional'],
+        update_fields=['completed_count', 'cancellation_count', 'late_cancellation_count']
+    )
+
+    per_facility = (
+        ShiftApplication.objects.filter(status='COMPLETED')
+        .values('professional_id', 'shift__facility_id')
+        .annotate(completed=Count('id'))
+    )
+    ProfessionalFacilityStats.objects.bulk_create(
+        [
+            ProfessionalFacilityStats(
+                professional_id=item['professional_id'], facility_id=item['shift__facility_id'], completed_count=item['completed']
+            )
+            for item in per_facility.iterator(chunk_size=chunk_size)
+        ],
+        batch_size=chunk_size,
+        update_conflicts=True, unique_fields=['professional', 'facility'], update_fields=['completed_count']
+    )
+    return {"professionals": len(rows), "facility_pairs": ProfessionalFacilityStats.objects.count()}
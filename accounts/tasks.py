@@ -1,20 +1,102 @@
 from celery import shared_task
+from django.db import transaction
+from django.db.models import Q
 from django.utils import timezone
 from datetime import timedelta
+from core.models import Notification
 from .models import Professional
 
+# Days-before-expiry warnings, smallest first so each professional only gets the most urgent one due
+LICENSE_WARNING_STAGES = (7, 30, 60)
+
 @shared_task
 def check_license_expiry():
+    """
+    Nightly licence sweep. Set-based throughout: one select, one UPDATE and one bulk insert
+    for the expired set and for each warning stage, whatever the headcount.
+    """
     today = timezone.now().date()
-    
-    # Deactivate expired licenses
-    expired_pros = Professional.objects.filter(license_expiry_date__lt=today, is_verified=True)
-    for pro in expired_pros:
-        pro.is_verified = False # Or use a separate is_active field if needed
-        pro.save()
-        # TODO: Send notification "Your license has expired"
-
-    # Send warnings (60, 30, 7 days)
-    # This logic would typically send notifications.
-    # For now we just log or pass.
-    pass
+    summary = {"expired": 0}
+
+    with transaction.atomic():
+        # Deactivate expired licenses
+        expired = list(
+            Professional.objects.filter(license_expiry_date__lt=today, is_verified=True)
+            .values_list('id', 'user_id', 'license_expiry_date')
+        )
+        if expired:
+            Professional.objects.filter(id__in=[pro_id for pro_id, _, _ in expired]).update(is_verified=False) # Or use a separate is_active field if needed
+            Notification.objects.bulk_create([
+                Notification(
+                    user_id=user_id,
+                    title="License expired",
+                    message=f"Your license expired on {expiry}. Upload a renewed certificate to keep receiving shifts.",
+                    notification_type="LICENSE_EXPIRY",
+                    related_object_id=pro_id,
+                    data={"stage": 0, "expiry_date": str(expiry)}
+                ) for pro_id, user_id, expiry in expired
+            ])
+        summary["expired"] = len(expired)
+
+        # Send warnings (7, 30, 60 days)
+        for stage in LICENSE_WARNING_STAGES:
+            cohort = list(
+                Professional.objects.filter(
+                    Q(license_warning_stage__isnull=True) | Q(license_warning_stage__gt=stage),
+                    is_verified=True,
+                    license_expiry_date__gte=today,
+                    license_expiry_date__lte=today + timedelta(days=stage),
+                ).values_list('id', 'user_id', 'license_expiry_date')
+            )
+            if cohort:
+                Notification.objects.bulk_create([
+                    Notification(
+                        user_id=user_id,
+                        title="License expiring soon",
+                        message=f"Your license expires on {expiry} ({(expiry - today).days} days). Please renew it.",
+                        notification_type="LICENSE_EXPIRY",
+                        related_object_id=pro_id,
+                        data={"stage": stage, "expiry_date": str(expiry)}
+                    ) for pro_id, user_id, expiry in cohort
+                ])
+                # Recording the stage is what makes re-runs idempotent
+                Professional.objects.filter(id__in=[pro_id for pro_id, _, _ in cohort]).update(license_warning_stage=stage)
+            summary[f"warned_{stage}d"] = len(cohort)
+
+    return summary
+
+@shared_task
+def verify_professional_certificate(professional_id):
+    return verify_professional_certificates([professional_id])
+
+@shared_task
+def verify_professional_certificates(professional_ids):
+    """
+    Batch entry point for onboarding waves and admin re-checks: one worker verifies the whole
+    list concurrently instead of tying up a worker per certificate.
+    """
+    from .ai_services import CertificateVerificationPipeline
+    return CertificateVerificationPipeline().run(professional_ids)
+
+@shared_task
+def convert_approved_waitlist(limit=None):
+    """
+    Onboard approved waitlist entries. Accounts start without a password; each chunk's
+    professionals are emailed an invite link to set one (send_account_invites).
+    """
+    from .services import WaitlistConversionService
+    return WaitlistConversionService()(limit=limit)
+
+@shared_task
+def send_account_invites(user_ids):
+    from .models import User
+    from .services import PasswordResetService
+    return PasswordResetService().send_invites(User.objects.filter(id__in=user_ids))
+
+@shared_task
+def roll_rating_windows():
+    """
+    Nightly: age reviews out of every RatingSummary's recent window.
+    """
+    from .ratings import roll_recent_window
+    return roll_recent_window()
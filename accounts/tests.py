@@ -1,3 +1,328 @@
+import asyncio
+import io
+import tempfile
+from collections import Counter
+from datetime import date, timedelta
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+from django.core import mail
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from core.blobs import LocalBlobStorage
+from core.imaging import variant_key
+from core.models import Notification
+from .ai_services import AIVerificationService, CertificateVerificationPipeline, FakeVisionBackend
+from .models import Professional, RatingDay, RatingSummary, Review, User, WaitlistProfessional
+from .ratings import create_review, rebuild_rating_summaries, roll_recent_window
+from .services import PasswordResetService, UserLoginService, WaitlistConversionService, WaitlistImportService
+from .tasks import check_license_expiry
 
-# Create your tests here.
+class RatingSummaryTests(TestCase):
+    def setUp(self):
+        self.reviewer = User.objects.create_user(email="facility@example.com", password="x")
+        self.target = User.objects.create_user(email="pro@example.com", password="x")
+
+    def summary(self):
+        return RatingSummary.objects.get(user=self.target)
+
+    def test_reviews_update_summary_in_place(self):
+        for rating in (5, 4, 4, 1):
+            create_review(self.reviewer, self.target, rating, "Review")
+
+        summary = self.summary()
+        self.assertEqual((summary.count, summary.total), (4, 14))
+        self.assertEqual([summary.stars_1, summary.stars_2, summary.stars_3, summary.stars_4, summary.stars_5], [1, 0, 0, 2, 1])
+        self.assertEqual(summary.average, 3.5)
+        self.assertEqual(summary.recent_average, 3.5)
+
+        with self.assertRaises(ValueError):
+            create_review(self.reviewer, self.target, 6, "Too good")
+
+    def test_old_days_roll_out_of_the_recent_window(self):
+        create_review(self.reviewer, self.target, 2, "Old")
+        create_review(self.reviewer, self.target, 4, "New")
+        old = timezone.now() - timedelta(days=120)
+        Review.objects.filter(comment="Old").update(created_at=old)
+        # Split today's bucket as if the first review had landed 120 days ago
+        RatingDay.objects.filter(user=self.target).update(day=old.date(), count=1, total=2)
+        RatingDay.objects.create(user=self.target, day=timezone.localdate(), count=1, total=4)
+
+        self.assertEqual(roll_recent_window(), 1)
+        summary = self.summary()
+        self.assertEqual((summary.count, summary.recent_count, summary.recent_total), (2, 1, 4))
+        self.assertEqual(roll_recent_window(), 0)
+
+        # The backfill arrives at the same numbers from the Review table
+        RatingSummary.objects.all().delete()
+        RatingDay.objects.all().delete()
+        rebuild_rating_summaries()
+        rebuilt = self.summary()
+        self.assertEqual((rebuilt.count, rebuilt.total, rebuilt.recent_count, rebuilt.recent_total), (2, 6, 1, 4))
+        self.assertEqual(RatingDay.objects.get().total, 4)
+
+class WaitlistImportTests(TestCase):
+    def test_import_dedupes_case_insensitively_and_counts_inserted_rows(self):
+        # A signup from before emails were normalised
+        WaitlistProfessional.objects.create(email="Existing@Example.com", full_name="Ada Obi", phone_number="1", medical_type="Nurse")
+        csv_data = (
+            "email,full_name,medical_type,years_of_experience\n"
+            "existing@example.com,Ada Obi,Nurse,3\n"
+            "New@Example.com,Bola Ade,Doctor,5\n"
+            "new@example.com,Bola Ade,Doctor,5\n"
+            "not-an-email,Chi Eze,Nurse,\n"
+            "late@example.com,Dayo Ola,Nurse,\n"
+        )
+        real_bulk_create = WaitlistProfessional.objects.bulk_create
+
+        def bulk_create_after_signup(objs, **kwargs):
+            # A signup landing between the IN check and the insert is skipped by ignore_conflicts
+            WaitlistProfessional.objects.create(email="late@example.com", full_name="Dayo Ola", phone_number="2", medical_type="Nurse")
+            return real_bulk_create(objs, **kwargs)
+
+        with mock.patch.object(WaitlistProfessional.objects, "bulk_create", side_effect=bulk_create_after_signup):
+            stats = WaitlistImportService()(io.StringIO(csv_data), "csv")
+
+        self.assertEqual((stats["received"], stats["invalid"]), (5, 1))
+        self.assertEqual((stats["created"], stats["duplicates"]), (1, 3))
+        self.assertEqual(WaitlistProfessional.objects.filter(email__iexact="existing@example.com").count(), 1)
+        self.assertEqual(WaitlistProfessional.objects.get(email="new@example.com").years_of_experience, 5)
+
+class WaitlistConversionTests(TestCase):
+    def approve(self, email, full_name):
+        return WaitlistProfessional.objects.create(
+            email=email, full_name=full_name, phone_number="1", medical_type="Nurse", status="APPROVED"
+        )
+
+    def test_converted_professionals_are_invited_to_set_a_password(self):
+        entry = self.approve("ada@Example.COM", "Ada Obi")
+        self.approve("bola@example.com", "Bola Ade")
+        User.objects.create_user(email="Bola@example.com", password="x")
+
+        with mock.patch("accounts.tasks.send_account_invites.delay") as delay, self.captureOnCommitCallbacks(execute=True):
+            stats = WaitlistConversionService()()
+        self.assertEqual(stats, {"converted": 1, "already_registered": 1, "duplicates": 0})
+
+        user = User.objects.get(waitlist_entry=entry)
+        # Normalised like create_user, and no password anyone could know
+        self.assertEqual(user.email, "ada@example.com")
+        self.assertFalse(user.has_usable_password())
+        delay.assert_called_once_with([str(user.id)])
+
+        PasswordResetService().send_invites([user])
+        self.assertEqual(mail.outbox[0].to, ["ada@example.com"])
+        link = parse_qs(urlparse(mail.outbox[0].body.split("sign in: ")[1].split()[0]).query)
+
+        _, token = PasswordResetService().confirm(link["uid"][0], link["token"][0], "a-Long-enough-passw0rd")
+        self.assertEqual(UserLoginService()(email="ada@example.com", password="a-Long-enough-passw0rd")[1], token)
+        # The link is single-use: it stops working once the password has changed
+        with self.assertRaises(ValueError):
+            PasswordResetService().confirm(link["uid"][0], link["token"][0], "another-Passw0rd-here")
+
+    def test_case_variant_entries_are_converted_once(self):
+        existing = User.objects.create_user(email="bola@example.com", password="x")
+        linked_first = self.approve("Bola@example.com", "Bola Ade")
+        self.approve("BOLA@example.com", "Bola Ade")
+        created_first = self.approve("chi@example.com", "Chi Eze")
+        self.approve("Chi@example.com", "Chi Eze")
+
+        with mock.patch("accounts.tasks.send_account_invites.delay") as delay, self.captureOnCommitCallbacks(execute=True):
+            stats = WaitlistConversionService()(chunk_size=10)
+        self.assertEqual(stats, {"converted": 1, "already_registered": 1, "duplicates": 2})
+
+        linked_first.refresh_from_db()
+        created_first.refresh_from_db()
+        self.assertEqual(linked_first.converted_user, existing)
+        self.assertEqual(created_first.converted_user.email, "chi@example.com")
+        self.assertEqual(User.objects.filter(email__iexact="chi@example.com").count(), 1)
+        self.assertEqual(WaitlistProfessional.objects.filter(status="DUPLICATE", converted_user__isnull=True).count(), 2)
+        delay.assert_called_once_with([str(created_first.converted_user_id)])
+
+        # A variant approved later finds its user already linked and doesn't wedge the queue
+        self.approve("CHI@EXAMPLE.COM", "Chi Eze")
+        with mock.patch("accounts.tasks.send_account_invites.delay"):
+            self.assertEqual(WaitlistConversionService()(), {"converted": 0, "already_registered": 0, "duplicates": 1})
+        self.assertFalse(WaitlistProfessional.objects.filter(status="APPROVED").exists())
+
+class FlakyVisionBackend(FakeVisionBackend):
+    """
+    Fails the first call for "flaky" certificates and every call for "down" ones,
+    and records how many reads are in flight at once.
+    """
+    def __init__(self):
+        self.calls = Counter()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def read_certificate(self, image_bytes, location):
+        self.calls[location] += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            if "down" in location or ("flaky" in location and self.calls[location] == 1):
+                raise ConnectionError("vision backend unavailable")
+            return await super().read_certificate(image_bytes, location)
+        finally:
+            self.in_flight -= 1
+
+class CertificateVerificationPipelineTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.storage = LocalBlobStorage(root=media_root.name, base_url="/media/")
+        self.backend = FlakyVisionBackend()
+        self.pipeline = CertificateVerificationPipeline(
+            service=AIVerificationService(backend=self.backend, storage=self.storage),
+            concurrency=2, max_retries=2, backoff=0
+        )
+        cache.clear()
+
+    def professional(self, name, contents=None):
+        key = f"certificates/{name}.txt"
+        if contents is not None:
+            self.storage.write(key, contents.encode())
+        user = User.objects.create_user(email=f"{name}@example.com", password="x")
+        return Professional.objects.create(
+            user=user, license_number=f"LIC-{name}", is_verified=True, license_warning_stage=30,
+            certificate_url=f"http://testserver/media/{key}"
+        )
+
+    def test_transient_failures_are_retried_and_results_written(self):
+        flaky = self.professional("flaky", "Expiry: 2099-05-01")
+        flaky.rejection_reason = "Could not read expiry date."
+        flaky.save()
+        expired = self.professional("expired", "old licence")
+        down = self.professional("down", "Expiry: 2099-06-01")
+
+        with self.assertLogs("accounts.ai_services", "WARNING"):
+            summary = self.pipeline.run([flaky.id, expired.id, down.id])
+        self.assertEqual(summary, {"verified": 1, "rejected": 1, "failed": 1})
+        self.assertEqual(self.backend.calls[flaky.certificate_url], 2)
+        self.assertEqual(self.backend.calls[down.certificate_url], 3)
+
+        flaky.refresh_from_db()
+        self.assertEqual(flaky.license_expiry_date, date(2099, 5, 1))
+        self.assertIsNone(flaky.rejection_reason)
+        # A new expiry date restarts the warning sequence
+        self.assertIsNone(flaky.license_warning_stage)
+        self.assertTrue(flaky.is_verified)
+
+        expired.refresh_from_db()
+        self.assertFalse(expired.is_verified)
+        self.assertIn("expired", expired.rejection_reason)
+
+        # Retries exhausted: the row is left as it was for the next run
+        down.refresh_from_db()
+        self.assertIsNone(down.license_expiry_date)
+        self.assertTrue(down.is_verified)
+        self.assertEqual(down.license_warning_stage, 30)
+
+    def test_concurrency_is_bounded_and_missing_files_are_not_retried(self):
+        ids = [self.professional(f"pro{i}", f"Expiry: 2099-01-0{i + 1}").id for i in range(5)]
+        missing = self.professional("missing")
+
+        with self.assertLogs("accounts.ai_services", "WARNING"):
+            summary = self.pipeline.run(ids + [missing.id])
+        self.assertEqual(summary, {"verified": 5, "rejected": 0, "failed": 1})
+        self.assertEqual(self.backend.max_in_flight, 2)
+        self.assertNotIn(missing.certificate_url, self.backend.calls)
+
+    def test_cache_hits_whether_or_not_the_review_copy_exists(self):
+        pro = self.professional("scan", "Expiry: 2099-03-01")
+        service = self.pipeline.service
+        self.assertTrue(service.verify_certificate(pro.certificate_url)["is_valid"])
+
+        # The review copy lands after the first check; the same upload must still hit the cache
+        self.storage.write(variant_key("certificates/scan.txt", "review"), b"Expiry: 2099-03-01 (review)")
+        result = service.verify_certificate(pro.certificate_url)
+        self.assertEqual(result["expiry_date"], date(2099, 3, 1))
+        self.assertEqual(self.backend.calls[pro.certificate_url], 1)
+
+class LicenseExpiryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email="pro@example.com", password="x")
+        self.pro = Professional.objects.create(user=self.user, license_number="LIC-1", is_verified=True)
+
+    def expire_in(self, days):
+        # Moving the expiry date closer stands in for the nightly sweep running on later days
+        Professional.objects.filter(id=self.pro.id).update(license_expiry_date=timezone.localdate() + timedelta(days=days))
+
+    def stages_sent(self):
+        return [n.data["stage"] for n in Notification.objects.filter(user=self.user, notification_type="LICENSE_EXPIRY").order_by("created_at")]
+
+    def test_warnings_escalate_once_per_stage(self):
+        self.expire_in(50)
+        self.assertEqual(check_license_expiry()["warned_60d"], 1)
+        self.assertEqual(check_license_expiry(), {"expired": 0, "warned_7d": 0, "warned_30d": 0, "warned_60d": 0})
+
+        self.expire_in(25)
+        self.assertEqual(check_license_expiry()["warned_30d"], 1)
+        self.expire_in(5)
+        self.assertEqual(check_license_expiry()["warned_7d"], 1)
+        check_license_expiry()
+        self.assertEqual(self.stages_sent(), [60, 30, 7])
+
+        self.expire_in(-1)
+        self.assertEqual(check_license_expiry()["expired"], 1)
+        self.pro.refresh_from_db()
+        self.assertFalse(self.pro.is_verified)
+        expired = Notification.objects.filter(user=self.user, data__stage=0).get()
+        self.assertEqual(expired.title, "License expired")
+        self.assertEqual(expired.related_object_id, self.pro.id)
+        # Unverified now, so later runs leave them alone
+        check_license_expiry()
+        self.assertEqual(self.stages_sent(), [60, 30, 7, 0])
+
+    def test_only_the_most_urgent_warning_is_sent(self):
+        self.expire_in(5)
+        summary = check_license_expiry()
+        self.assertEqual((summary["warned_7d"], summary["warned_30d"], summary["warned_60d"]), (1, 0, 0))
+        self.assertEqual(self.stages_sent(), [7])
+
+class PasswordResetEndpointTests(TestCase):
+    def setUp(self):
+        # Throttle history lives in the cache
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(email="ada@example.com", password="old-Passw0rd-value")
+
+    def request_reset(self, email):
+        return self.client.post(reverse("password-reset"), {"email": email}, format="json")
+
+    def confirm(self, **data):
+        return self.client.post(reverse("password-reset-confirm"), data, format="json")
+
+    def test_reset_link_sets_the_password(self):
+        response = self.request_reset("ADA@example.com")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mail.outbox[0].to, ["ada@example.com"])
+        link = parse_qs(urlparse(mail.outbox[0].body.split("here: ")[1].split()[0]).query)
+
+        response = self.confirm(uid=link["uid"][0], token=link["token"][0], password="new-Passw0rd-value")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["data"]["email"], "ada@example.com")
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password("new-Passw0rd-value"))
+
+    def test_unknown_email_gets_the_same_answer(self):
+        known = self.request_reset("ada@example.com")
+        unknown = self.request_reset("nobody@example.com")
+        self.assertEqual((unknown.status_code, unknown.json()), (known.status_code, known.json()))
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_bad_token_is_rejected(self):
+        uid = parse_qs(urlparse(PasswordResetService().link_for(self.user)).query)["uid"][0]
+        for data in ({"uid": uid, "token": "not-a-token"}, {"uid": "garbage", "token": "not-a-token"}, {}):
+            with self.subTest(data=data):
+                response = self.confirm(password="new-Passw0rd-value", **data)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()["message"], "Invalid or expired link.")
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password("old-Passw0rd-value"))
+
+    def test_requests_are_throttled(self):
+        statuses = [self.request_reset("nobody@example.com").status_code for _ in range(6)]
+        self.assertEqual(statuses, [200] * 5 + [429])
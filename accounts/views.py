@@ -2,6 +2,7 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
+from rest_framework.throttling import ScopedRateThrottle
 from core.router import route
 from .services import UserRegisterService, UserLoginService, AdminVerifyFacilityService, AdminVerifyProfessionalService, ProfessionalUpdateService
 from .selectors import UserSelector
@@ -113,6 +114,68 @@ class LoginView(APIView):
         except ValueError as e:
             return Response({"error": str(e)}, status=401)
 
+@extend_schema(
+    request=inline_serializer(name='PasswordResetRequest', fields={'email': serializers.EmailField()}),
+    responses={200: inline_serializer(name='PasswordResetResponse', fields={'message': serializers.CharField()})}
+)
+@route("auth/password-reset/", name="password-reset")
+class PasswordResetView(APIView):
+    """
+    Emails a link to set a new password. Always answers the same way, whether or not the account exists.
+    """
+    permission_classes = [AllowAny]
+    throttle_classes = [ScopedRateThrottle]
+    throttle_scope = "password_reset"
+
+    def post(self, request):
+        from .services import PasswordResetService
+        PasswordResetService().request_reset(request.data.get("email"))
+        return Response({"message": "If that account exists, a reset link has been sent."})
+
+@extend_schema(
+    request=inline_serializer(
+        name='PasswordResetConfirmRequest',
+        fields={
+            'uid': serializers.CharField(),
+            'token': serializers.CharField(),
+            'password': serializers.CharField(),
+        }
+    ),
+    responses={
+        200: inline_serializer(
+            name='PasswordResetConfirmResponse',
+            fields={
+                'token': serializers.CharField(),
+                'user_id': serializers.UUIDField(),
+                'email': serializers.EmailField()
+            }
+        ),
+        400: inline_serializer(name='PasswordResetConfirmError', fields={'error': serializers.CharField()})
+    }
+)
+@route("auth/password-reset/confirm/", name="password-reset-confirm")
+class PasswordResetConfirmView(APIView):
+    """
+    Sets the password from a reset or invite link and signs the user in.
+    """
+    permission_classes = [AllowAny]
+    throttle_classes = [ScopedRateThrottle]
+    throttle_scope = "password_reset_confirm"
+
+    def post(self, request):
+        from .services import PasswordResetService
+        try:
+            user, token = PasswordResetService().confirm(
+                uid=request.data.get("uid"), token=request.data.get("token"), password=request.data.get("password")
+            )
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
+        return Response({
+            "token": token,
+            "user_id": user.id,
+            "email": user.email
+        })
+
 @extend_schema(
     responses={
         200: inline_serializer(
@@ -123,12 +186,21 @@ class LoginView(APIView):
                 'first_name': serializers.CharField(),
                 'last_name': serializers.CharField(),
                 'role': serializers.CharField(),
+                'rating': inline_serializer(
+                    name='ProfileRating',
+                    fields={
+                        'average': serializers.FloatField(allow_null=True),
+                        'count': serializers.IntegerField(),
+                        'recent_average': serializers.FloatField(allow_null=True),
+                        'histogram': serializers.DictField(child=serializers.IntegerField()),
+                    }
+                ),
                 # Add other fields as returned by UserSelector.get_profile_data
             }
         )
     }
 )
-@route("auth/profile/", name="profile")
+@route("auth/profile/", name="profile", query_budget=3)
 class ProfileView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -268,6 +340,8 @@ class AdminVerifyProfessionalView(APIView):
             'years_of_experience': serializers.IntegerField(required=False),
             'cv_file': serializers.FileField(required=False),
             'license_file': serializers.FileField(required=False),
+            'cv_upload_token': serializers.CharField(required=False, help_text='From uploads/sign/ (purpose waitlist_cv), instead of cv_file'),
+            'license_upload_token': serializers.CharField(required=False, help_text='From uploads/sign/ (purpose waitlist_license), instead of license_file'),
         }
     ),
     responses={
@@ -311,11 +385,28 @@ class WaitlistCreateView(APIView):
         
         if not email or not full_name:
              return Response({"error": "Email and Name are required"}, status=400)
+        # Stored lowercased, like bulk imports, so both paths dedupe against each other
+        email = str(email).strip().lower()
+
+        # Direct-upload path: the files are already in blob storage, we only record their keys
+        from core.uploads import load_upload_token
+        from core.blobs import get_blob_storage
+        try:
+            if request.data.get("cv_upload_token"):
+                cv_file = load_upload_token(request.data["cv_upload_token"], "waitlist_cv")
+            if request.data.get("license_upload_token"):
+                license_file = load_upload_token(request.data["license_upload_token"], "waitlist_license")
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
+        storage = get_blob_storage()
+        for key in (cv_file, license_file):
+            if isinstance(key, str) and not storage.exists(key):
+                return Response({"error": "Uploaded file not found. Please upload again."}, status=400)
              
-        if WaitlistProfessional.objects.filter(email=email).exists():
+        if WaitlistProfessional.objects.filter(email__iexact=email).exists():
             return Response({"message": "Already on waitlist"}, status=200)
             
-        WaitlistProfessional.objects.create(
+        entry = WaitlistProfessional.objects.create(
             email=email,
             full_name=full_name,
             phone_number=phone_number,
@@ -328,9 +419,61 @@ class WaitlistCreateView(APIView):
             cv_file=cv_file,
             license_file=license_file
         )
+
+        # Review copies / thumbnails for the admin UI
+        from core.tasks import generate_document_variants
+        documents = [f.name for f in (entry.cv_file, entry.license_file) if f]
+        if documents:
+            generate_document_variants.delay(documents)
         
         return Response({"status": "success", "message": "Added to waitlist"}, status=201)
 
+@extend_schema(
+    request=inline_serializer(
+        name='WaitlistImportRequest',
+        fields={
+            'file': serializers.FileField(help_text='CSV with a header row, or NDJSON (one object per line)'),
+            'format': serializers.ChoiceField(choices=['csv', 'ndjson'], required=False, help_text='Defaults to the file extension'),
+        }
+    ),
+    responses={
+        200: inline_serializer(
+            name='WaitlistImportResponse',
+            fields={
+                'received': serializers.IntegerField(),
+                'created': serializers.IntegerField(),
+                'duplicates': serializers.IntegerField(),
+                'invalid': serializers.IntegerField(),
+                'errors': serializers.ListField(child=serializers.DictField())
+            }
+        ),
+        400: inline_serializer(name='WaitlistImportError', fields={'error': serializers.CharField()}),
+        403: inline_serializer(name='WaitlistImportPermissionError', fields={'error': serializers.CharField()})
+    }
+)
+@route("auth/waitlist/import/", name="waitlist-import")
+class WaitlistImportView(APIView):
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        if not request.user.is_staff:
+            return Response({"error": "Only admins can import the waitlist"}, status=403)
+
+        upload = request.FILES.get("file")
+        if not upload:
+            return Response({"error": "file is required"}, status=400)
+        file_format = request.data.get("format") or ("ndjson" if upload.name.endswith((".ndjson", ".jsonl")) else "csv")
+
+        import io
+        from .services import WaitlistImportService
+        stream = io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+        try:
+            stats = WaitlistImportService()(stream, file_format)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
+        return Response(stats)
+
 @extend_schema(
     request=inline_serializer(
         name='FacilityDocumentUploadRequest',
@@ -374,9 +517,81 @@ class FacilityDocumentUploadView(APIView):
             facility.other_documents = other_documents
             
         facility.save()
+
+        from core.tasks import generate_document_variants
+        documents = [getattr(facility, field).name for field, f in (('cac_file', cac_file), ('license_file', license_file), ('other_documents', other_documents)) if f]
+        if documents:
+            generate_document_variants.delay(documents)
         
         return Response({"status": "success", "message": "Documents uploaded successfully"})
 
+@extend_schema(
+    request=inline_serializer(
+        name='FacilityDocumentCompleteRequest',
+        fields={
+            'cac_file': serializers.CharField(required=False, help_text='upload_token for purpose facility_cac'),
+            'license_file': serializers.CharField(required=False, help_text='upload_token for purpose facility_license'),
+            'other_documents': serializers.CharField(required=False, help_text='upload_token for purpose facility_other'),
+        }
+    ),
+    responses={
+        200: inline_serializer(
+            name='FacilityDocumentCompleteResponse',
+            fields={
+                'status': serializers.CharField(),
+                'message': serializers.CharField()
+            }
+        ),
+        400: inline_serializer(name='DocCompleteValidationError', fields={'error': serializers.CharField()}),
+        403: inline_serializer(name='DocCompletePermissionError', fields={'error': serializers.CharField()})
+    }
+)
+@route("facility/documents/complete/", name="facility-document-complete")
+class FacilityDocumentCompleteView(APIView):
+    """
+    Completion step of the direct upload flow (see uploads/sign/): records the blob keys
+    of documents the client has already PUT to storage.
+    """
+    permission_classes = [IsAuthenticated]
+
+    DOCUMENT_PURPOSES = {
+        'cac_file': 'facility_cac',
+        'license_file': 'facility_license',
+        'other_documents': 'facility_other',
+    }
+
+    def post(self, request):
+        if not request.user.is_facility:
+            return Response({"error": "Only facilities can upload documents"}, status=403)
+
+        from core.uploads import load_upload_token
+        from core.blobs import get_blob_storage
+
+        facility = request.user.facility
+        storage = get_blob_storage()
+        updated_fields = []
+        for field, purpose in self.DOCUMENT_PURPOSES.items():
+            token = request.data.get(field)
+            if not token:
+                continue
+            try:
+                key = load_upload_token(token, purpose)
+            except ValueError as e:
+                return Response({"error": str(e)}, status=400)
+            if not storage.exists(key):
+                return Response({"error": f"Uploaded file for {field} not found. Please upload again."}, status=400)
+            getattr(facility, field).name = key
+            updated_fields.append(field)
+
+        if not updated_fields:
+            return Response({"error": "No documents provided"}, status=400)
+
+        facility.save(update_fields=updated_fields + ['updated_at'])
+
+        from core.tasks import generate_document_variants
+        generate_document_variants.delay([getattr(facility, field).name for field in updated_fields])
+        return Response({"status": "success", "message": "Documents uploaded successfully"})
+
 @extend_schema(
     responses={
         200: inline_serializer(
@@ -398,7 +613,7 @@ class FacilityDocumentUploadView(APIView):
         403: inline_serializer(name='StaffListPermissionError', fields={'error': serializers.CharField()})
     }
 )
-@route("facility/staff/", name="facility-staff-list")
+@route("facility/staff/", name="facility-staff-list", query_budget=2)
 class FacilityStaffListView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -412,7 +627,7 @@ class FacilityStaffListView(APIView):
         # We need to fetch FacilityStaff objects where facility=facility
         from .models import FacilityStaff
         
-        staff_members = FacilityStaff.objects.filter(facility=facility)
+        staff_members = FacilityStaff.objects.filter(facility=facility).select_related('user')
         
         data = [{
             "id": str(s.id),
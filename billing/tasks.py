@@ -1,5 +1,11 @@
 from celery import shared_task
+from collections import defaultdict
+from datetime import timedelta
+from django.conf import settings
 from django.db import transaction
+from django.db.models import Case, DecimalField, F, Value, When
+from django.utils import timezone
+from accounts.models import Professional
 from shifts.models import ShiftApplication
 from .models import Transaction
 import uuid
@@ -7,38 +13,83 @@ from decimal import Decimal
 
 @shared_task
 def payout_professional(application_id):
-    try:
-        application = ShiftApplication.objects.get(id=application_id)
-    except ShiftApplication.DoesNotExist:
-        return
-
-    if application.status != 'CONFIRMED' or not application.clock_out_time:
-        return # Not eligible
-
-    professional = application.professional
-    shift = application.shift
-    
-    # Calculate Amount: Hourly Rate * Duration
-    duration = (shift.end_time - shift.start_time).total_seconds() / 3600
-    amount = shift.rate * Decimal(duration)
-    
-    # 1. Call Paystack API (Mocked) - Transfer to Bank?
-    # User said: "Professional can make withdrawal".
-    # So here we just credit their wallet. Withdrawal is a separate action.
-    
+    return payout_professionals([application_id])
+
+@shared_task
+def payout_professionals(application_ids):
+    """
+    Credit professionals for completed shifts. Only COMPLETED, unpaid applications are paid and
+    each is claimed by setting paid_at, so re-runs, retries and early releases never pay twice.
+    """
+    now = timezone.now()
     with transaction.atomic():
-        # Credit Professional Wallet
-        professional.wallet_balance += amount
-        professional.save()
-        
-        # Create Transaction Record (Credit)
-        Transaction.objects.create(
-            user=professional.user,
-            amount=amount,
-            transaction_type='PAYOUT', # Or 'EARNING'
-            reference=str(uuid.uuid4()),
-            status='SUCCESS',
-            shift=shift
+        applications = list(
+            ShiftApplication.objects
+            .filter(id__in=application_ids, status='COMPLETED', paid_at__isnull=True, clock_out_time__isnull=False)
+            .select_related('shift', 'professional')
+            .select_for_update(skip_locked=True, of=('self',))
+        )
+        if not applications:
+            return 0 # Not eligible (or already paid)
+
+        ShiftApplication.objects.filter(id__in=[app.id for app in applications]).update(paid_at=now, updated_at=now)
+
+        credits = defaultdict(Decimal)
+        payouts = []
+        for application in applications:
+            shift = application.shift
+            # Calculate Amount: Hourly Rate * Duration
+            duration = (shift.end_time - shift.start_time).total_seconds() / 3600
+            amount = (shift.rate * Decimal(duration)).quantize(Decimal('0.01'))
+            credits[application.professional_id] += amount
+            payouts.append(Transaction(
+                user_id=application.professional.user_id,
+                amount=amount,
+                transaction_type='PAYOUT', # Or 'EARNING'
+                reference=str(uuid.uuid4()),
+                status='SUCCESS',
+                shift=shift
+            ))
+
+        # 1. Call Paystack API (Mocked) - Transfer to Bank?
+        # User said: "Professional can make withdrawal".
+        # So here we just credit their wallet (in-database increment). Withdrawal is a separate action.
+        Professional.objects.filter(id__in=list(credits)).update(
+            wallet_balance=F('wallet_balance') + Case(
+                *[When(id=professional_id, then=Value(amount)) for professional_id, amount in credits.items()],
+                output_field=DecimalField(max_digits=12, decimal_places=2)
+            )
+        )
+        Transaction.objects.bulk_create(payouts)
+
+    for payout in payouts:
+        print(f"Credited {payout.amount} to professional user {payout.user_id} wallet.")
+    return len(payouts)
+
+@shared_task
+def pay_completed_applications(batch_size=None, max_batches=None):
+    """
+    Safety net for the delayed payouts queued at clock-out: pays every COMPLETED, unpaid
+    application whose payout delay has passed, whether its job was lost from the broker or the
+    row was skipped while locked. Walks shifts_app_unpaid_idx in bounded batches.
+    """
+    batch_size = batch_size or settings.PAYOUT_SWEEP_BATCH_SIZE
+    max_batches = max_batches or settings.PAYOUT_SWEEP_MAX_BATCHES
+    due = timezone.now() - timedelta(seconds=settings.PAYOUT_DELAY_SECONDS)
+
+    paid = 0
+    for _ in range(max_batches):
+        ids = list(
+            ShiftApplication.objects
+            .filter(status='COMPLETED', paid_at__isnull=True, clock_out_time__lte=due)
+            .order_by('clock_out_time')
+            .values_list('id', flat=True)[:batch_size]
         )
-    
-    print(f"Credited {amount} to {professional.user.email} wallet.")
+        if not ids:
+            break
+        count = payout_professionals(ids)
+        paid += count
+        # Nothing claimable means the rest are locked by a payout in flight
+        if not count or len(ids) < batch_size:
+            break
+    return paid
@@ -25,7 +25,7 @@ from rest_framework import serializers
     }
 )
 
-@route("billing/invoices/", name="invoice-list")
+@route("billing/invoices/", name="invoice-list", query_budget=2)
 class InvoiceListView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -58,7 +58,7 @@ class InvoiceListView(APIView):
         )
     }
 )
-@route("billing/transactions/", name="transaction-list")
+@route("billing/transactions/", name="transaction-list", query_budget=1)
 class TransactionListView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -1,7 +1,13 @@
+import asyncio
 import json
+from django.conf import settings
+from django.core.exceptions import ValidationError
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from asgiref.sync import sync_to_async
 from .models import ChatRoom, Message
+from .services import MarkRoomReadService
+from .presence import presence, user_group_name
 from accounts.models import User
 
 class ChatConsumer(AsyncWebsocketConsumer):
@@ -9,15 +15,34 @@ class ChatConsumer(AsyncWebsocketConsumer):
         self.room_id = self.scope['url_route']['kwargs']['room_id']
         self.room_group_name = f'chat_{self.room_id}'
 
+        # Read receipts are coalesced: only the latest "read up to" per flush window hits the DB
+        self.pending_read_message_id = None
+        self.read_flush_task = None
+
         # Join room group
         await self.channel_layer.group_add(
             self.room_group_name,
             self.channel_name
         )
 
+        user = self.scope['user']
+        if user.is_authenticated:
+            # Per-user group so notification fan-out can reach whichever socket the user has open
+            await self.channel_layer.group_add(user_group_name(user.id), self.channel_name)
+            await sync_to_async(presence.connect)(user.id, self.channel_name, self.room_id)
+
         await self.accept()
 
     async def disconnect(self, close_code):
+        if self.read_flush_task:
+            self.read_flush_task.cancel()
+        await self.flush_read_receipt()
+
+        user = self.scope['user']
+        if user.is_authenticated:
+            await sync_to_async(presence.disconnect)(user.id, self.channel_name, self.room_id)
+            await self.channel_layer.group_discard(user_group_name(user.id), self.channel_name)
+
         # Leave room group
         await self.channel_layer.group_discard(
             self.room_group_name,
@@ -27,11 +52,30 @@ class ChatConsumer(AsyncWebsocketConsumer):
     # Receive message from WebSocket
     async def receive(self, text_data):
         text_data_json = json.loads(text_data)
+        user = self.scope['user']
+
+        if text_data_json.get('type') == 'heartbeat':
+            # Clients ping every PRESENCE_HEARTBEAT_SECONDS to stay marked online
+            if user.is_authenticated:
+                await sync_to_async(presence.heartbeat)(user.id, self.channel_name, self.room_id)
+            return
+
+        if text_data_json.get('type') == 'read':
+            # {"type": "read", "message_id": "<uuid>"} - everything up to this message has been seen
+            message_id = text_data_json.get('message_id')
+            if not message_id:
+                # Malformed ack; ignore it rather than dropping the socket
+                return
+            self.pending_read_message_id = message_id
+            if self.read_flush_task is None:
+                self.read_flush_task = asyncio.create_task(self.schedule_read_flush())
+            return
+
         message = text_data_json['message']
         sender_id = self.scope['user'].id # Assuming AuthMiddlewareStack is working
 
         # Save message to DB
-        await self.save_message(self.room_id, sender_id, message)
+        saved = await self.save_message(self.room_id, sender_id, message)
 
         # Send message to room group
         await self.channel_layer.group_send(
@@ -39,23 +83,72 @@ class ChatConsumer(AsyncWebsocketConsumer):
             {
                 'type': 'chat_message',
                 'message': message,
-                'sender_id': str(sender_id)
+                'sender_id': str(sender_id),
+                'message_id': str(saved.id),
+                'created_at': saved.created_at.isoformat()
             }
         )
 
     # Receive message from room group
     async def chat_message(self, event):
-        message = event['message']
-        sender_id = event['sender_id']
-
         # Send message to WebSocket
         await self.send(text_data=json.dumps({
-            'message': message,
-            'sender_id': sender_id
+            'message': event['message'],
+            'sender_id': event['sender_id'],
+            'message_id': event.get('message_id'),
+            'created_at': event.get('created_at')
+        }))
+
+    # Receive read watermark from room group
+    async def chat_read(self, event):
+        await self.send(text_data=json.dumps({
+            'type': 'read',
+            'user_id': event['user_id'],
+            'read_up_to': event['read_up_to']
         }))
 
+    # Receive a notification addressed to this user (see NotificationService.fan_out)
+    async def notify(self, event):
+        await self.send(text_data=json.dumps({
+            'type': 'notification',
+            **event['payload']
+        }))
+
+    async def schedule_read_flush(self):
+        await asyncio.sleep(settings.CHAT_READ_RECEIPT_FLUSH_SECONDS)
+        self.read_flush_task = None
+        await self.flush_read_receipt()
+
+    async def flush_read_receipt(self):
+        message_id, self.pending_read_message_id = self.pending_read_message_id, None
+        if message_id is None:
+            return
+
+        user = self.scope['user']
+        try:
+            up_to = await self.mark_read(user, self.room_id, message_id)
+        except (PermissionError, ValueError, ValidationError):
+            return
+        if up_to is None:
+            # Stale ack: the stored watermark is already past it, nothing new to tell the room
+            return
+
+        # Let the other participant render "seen" ticks
+        await self.channel_layer.group_send(
+            self.room_group_name,
+            {
+                'type': 'chat_read',
+                'user_id': str(user.id),
+                'read_up_to': up_to.isoformat()
+            }
+        )
+
+    @database_sync_to_async
+    def mark_read(self, user, room_id, message_id):
+        return MarkRoomReadService()(user=user, room_id=room_id, message_id=message_id)
+
     @database_sync_to_async
     def save_message(self, room_id, sender_id, message):
         room = ChatRoom.objects.get(id=room_id)
         sender = User.objects.get(id=sender_id)
-        Message.objects.create(room=room, sender=sender, content=message)
+        return Message.objects.create(room=room, sender=sender, content=message)
@@ -17,5 +17,26 @@ class Message(BaseModel):
     # timestamp replaced by created_at
     is_read = models.BooleanField(default=False)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['room', 'created_at'], name='comm_msg_room_created_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.sender} at {self.created_at}"
+
+class ChatReadState(BaseModel):
+    """
+    Per-participant read watermark: everything in the room up to last_read_at has been seen.
+    Unread counts are derived from this instead of scanning Message.is_read.
+    """
+    room = models.ForeignKey(ChatRoom, on_delete=models.CASCADE, related_name='read_states')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chat_read_states')
+    last_read_at = models.DateTimeField()
+    last_read_message = models.ForeignKey(Message, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+
+    class Meta:
+        unique_together = ('room', 'user')
+
+    def __str__(self):
+        return f"{self.user} read {self.room} up to {self.last_read_at}"
@@ -0,0 +1,100 @@
+import logging
+import time
+import redis
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+class PresenceRegistry:
+    """
+    Redis-backed record of who currently has a socket open.
+
+    presence:user:<user_id>  hash  channel_name -> last heartbeat (unix ts)
+    presence:room:<room_id>  hash  channel_name -> "<user_id>|<last heartbeat>"
+
+    Every connect/heartbeat refreshes the key TTL, so a crashed worker's entries
+    expire on their own. "Is this user online?" is a single EXISTS.
+    """
+    USER_KEY = "presence:user:{}"
+    ROOM_KEY = "presence:room:{}"
+
+    def __init__(self, client=None, ttl=None):
+        self._client = client
+        self.ttl = ttl or settings.PRESENCE_TTL_SECONDS
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = redis.Redis.from_url(settings.PRESENCE_REDIS_URL, decode_responses=True)
+        return self._client
+
+    def heartbeat(self, user_id, channel_name, room_id=None):
+        now = int(time.time())
+        user_key = self.USER_KEY.format(user_id)
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            pipe.hset(user_key, channel_name, now)
+            pipe.expire(user_key, self.ttl)
+            if room_id is not None:
+                room_key = self.ROOM_KEY.format(room_id)
+                pipe.hset(room_key, channel_name, f"{user_id}|{now}")
+                pipe.expire(room_key, self.ttl)
+            pipe.execute()
+        except redis.RedisError:
+            logger.warning("Presence heartbeat failed for user %s", user_id, exc_info=True)
+
+    # Connecting is just the first heartbeat
+    connect = heartbeat
+
+    def disconnect(self, user_id, channel_name, room_id=None):
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            pipe.hdel(self.USER_KEY.format(user_id), channel_name)
+            if room_id is not None:
+                pipe.hdel(self.ROOM_KEY.format(room_id), channel_name)
+            pipe.execute()
+        except redis.RedisError:
+            logger.warning("Presence disconnect failed for user %s", user_id, exc_info=True)
+
+    def is_online(self, user_id):
+        try:
+            return bool(self.client.exists(self.USER_KEY.format(user_id)))
+        except redis.RedisError:
+            return False
+
+    def online_user_ids(self, user_ids):
+        """
+        Subset of user_ids with a live socket, in one round trip.
+        On Redis errors everyone is treated as offline so callers fall back to push.
+        """
+        user_ids = [str(user_id) for user_id in user_ids]
+        if not user_ids:
+            return set()
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            for user_id in user_ids:
+                pipe.exists(self.USER_KEY.format(user_id))
+            flags = pipe.execute()
+        except redis.RedisError:
+            logger.warning("Presence lookup failed", exc_info=True)
+            return set()
+        return {user_id for user_id, flag in zip(user_ids, flags) if flag}
+
+    def room_user_ids(self, room_id):
+        try:
+            entries = self.client.hgetall(self.ROOM_KEY.format(room_id))
+        except redis.RedisError:
+            return set()
+        # Individual channels can go stale while the key is kept alive by another one
+        cutoff = int(time.time()) - self.ttl
+        online = set()
+        for value in entries.values():
+            user_id, _, seen_at = value.partition("|")
+            if int(seen_at) >= cutoff:
+                online.add(user_id)
+        return online
+
+presence = PresenceRegistry()
+
+def user_group_name(user_id):
+    return f"user_{user_id}"
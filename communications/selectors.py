@@ -0,0 +1,28 @@
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from core.services import BaseSelector
+from .models import ChatRoom, ChatReadState
+
+class ChatSelector(BaseSelector):
+    def list_user_rooms(self, user):
+        return ChatRoom.objects.filter(
+            Q(application__professional__user=user) | Q(application__shift__facility__user=user)
+        )
+
+    def unread_counts(self, user):
+        """
+        Unread messages per room for this user, in a single query.
+        Counts only messages from the other party newer than the user's read watermark,
+        which is an index range scan on (room, created_at).
+        """
+        watermark = ChatReadState.objects.filter(room=OuterRef('pk'), user=user).values('last_read_at')[:1]
+        return (
+            self.list_user_rooms(user)
+            .annotate(last_read_at=Subquery(watermark))
+            .annotate(unread=Count(
+                'messages',
+                filter=~Q(messages__sender=user) & (
+                    Q(last_read_at__isnull=True) | Q(messages__created_at__gt=F('last_read_at'))
+                )
+            ))
+            .values('id', 'last_read_at', 'unread')
+        )
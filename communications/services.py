@@ -1,8 +1,9 @@
 from core.services import BaseService
 from shifts.models import Shift
-from communications.models import ChatRoom, Message
+from communications.models import ChatRoom, Message, ChatReadState
 from core.models import Notification
 from django.db import transaction
+from django.db.models import Q
 
 class SendBroadcastService(BaseService):
     @transaction.atomic
@@ -19,12 +20,13 @@ class SendBroadcastService(BaseService):
             raise PermissionError("Not your shift.")
             
         # Find all confirmed applications
-        applications = shift.applications.filter(status__in=['CONFIRMED', 'IN_PROGRESS', 'ATTENDANCE_PENDING'])
+        applications = shift.applications.filter(status__in=['CONFIRMED', 'IN_PROGRESS', 'ATTENDANCE_PENDING']).select_related('professional')
         
         if not applications.exists():
             return {"status": "no_recipients", "message": "No confirmed professionals for this shift."}
             
         count = 0
+        recipient_ids = []
         for app in applications:
             # Ensure ChatRoom exists (it should, but let's be safe)
             chat_room, created = ChatRoom.objects.get_or_create(application=app)
@@ -45,7 +47,16 @@ class SendBroadcastService(BaseService):
                 notification_type="BROADCAST",
                 related_object_id=shift.id
             )
+            recipient_ids.append(app.professional.user_id)
             count += 1
+
+        payload = {
+            "title": f"Broadcast from {shift.facility.name}",
+            "message": message_content,
+            "notification_type": "BROADCAST",
+            "related_object_id": str(shift.id)
+        }
+        transaction.on_commit(lambda: NotificationService().fan_out(recipient_ids, payload))
             
         return {"status": "success", "recipients_count": count}
 
@@ -61,3 +72,71 @@ class NotificationService(BaseService):
             message=message,
             data=data or {}
         )
+
+    def fan_out(self, user_ids, payload):
+        """
+        Deliver a real-time notification. Users with a live socket (per the presence
+        registry) get it over the channel layer; everyone else goes to push.
+        Returns (socket_user_ids, push_user_ids).
+        """
+        from asgiref.sync import async_to_sync
+        from channels.layers import get_channel_layer
+        from .presence import presence, user_group_name
+
+        user_ids = [str(user_id) for user_id in user_ids]
+        online = presence.online_user_ids(user_ids)
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            online = set()
+
+        for user_id in online:
+            async_to_sync(channel_layer.group_send)(
+                user_group_name(user_id),
+                {"type": "notify", "payload": payload}
+            )
+
+        offline = [user_id for user_id in user_ids if user_id not in online]
+        for user_id in offline:
+            # Mock sending Push/SMS
+            print(f"Sending push to user {user_id}: {payload.get('title')}")
+
+        return online, offline
+
+class MarkRoomReadService(BaseService):
+    """
+    Apply a "read up to message X" watermark for one participant.
+    One conditional UPDATE on the watermark and one set-based UPDATE on Message.is_read,
+    however many messages the client has just scrolled past.
+    Returns the new watermark, or None when the ack is not newer than the stored one.
+    """
+    @transaction.atomic
+    def __call__(self, user, room_id, message_id):
+        is_participant = ChatRoom.objects.filter(
+            Q(application__professional__user=user) | Q(application__shift__facility__user=user),
+            id=room_id
+        ).exists()
+        if not is_participant:
+            raise PermissionError("Not a participant of this chat.")
+
+        up_to = Message.objects.filter(id=message_id, room_id=room_id).values_list('created_at', flat=True).first()
+        if up_to is None:
+            raise ValueError("Message not found in this chat.")
+
+        # Only ever move the watermark forward; stale/out-of-order acks are no-ops
+        moved = ChatReadState.objects.filter(
+            room_id=room_id, user=user, last_read_at__lt=up_to
+        ).update(last_read_at=up_to, last_read_message_id=message_id)
+        if not moved:
+            _, created = ChatReadState.objects.get_or_create(
+                room_id=room_id,
+                user=user,
+                defaults={"last_read_at": up_to, "last_read_message_id": message_id}
+            )
+            if not created:
+                return None
+
+        Message.objects.filter(
+            room_id=room_id, created_at__lte=up_to, is_read=False
+        ).exclude(sender=user).update(is_read=True)
+
+        return up_to
@@ -1,3 +1,172 @@
-from django.test import TestCase
+import time
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
+import redis
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.models import AnonymousUser
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from accounts.models import User, Facility, Professional
+from shifts.models import Shift, ShiftApplication
+from .consumers import ChatConsumer
+from .models import ChatReadState, ChatRoom, Message
+from .presence import PresenceRegistry, presence
+from .selectors import ChatSelector
+from .services import MarkRoomReadService
 
-# Create your tests here.
+class ReadWatermarkTests(TestCase):
+    def setUp(self):
+        self.facility_user = User.objects.create_user(email="facility@example.com", password="x")
+        facility = Facility.objects.create(user=self.facility_user, name="General", address="1 Marina", rc_number="RC-1")
+        self.pro_user = User.objects.create_user(email="pro@example.com", password="x")
+        professional = Professional.objects.create(user=self.pro_user, license_number="LIC-1")
+        start = timezone.now() + timedelta(days=1)
+        shift = Shift.objects.create(
+            facility=facility, role="Nurse", specialty="ICU", rate=Decimal("2000.00"),
+            start_time=start, end_time=start + timedelta(hours=8)
+        )
+        self.room = ChatRoom.objects.create(application=ShiftApplication.objects.create(shift=shift, professional=professional))
+
+        # Alternating senders, one minute apart so the watermark order is unambiguous
+        base = timezone.now() - timedelta(hours=1)
+        self.messages = []
+        for i in range(6):
+            sender = self.facility_user if i % 2 == 0 else self.pro_user
+            message = Message.objects.create(room=self.room, sender=sender, content=f"Message {i}")
+            Message.objects.filter(id=message.id).update(created_at=base + timedelta(minutes=i))
+            message.refresh_from_db()
+            self.messages.append(message)
+
+    def unread(self, user):
+        return {row['id']: row['unread'] for row in ChatSelector().unread_counts(user)}[self.room.id]
+
+    def mark_read(self, user, message):
+        return MarkRoomReadService()(user=user, room_id=self.room.id, message_id=message.id)
+
+    def test_own_messages_never_count_as_unread(self):
+        self.assertEqual(self.unread(self.pro_user), 3)
+        self.assertEqual(self.unread(self.facility_user), 3)
+
+    def test_watermark_only_moves_forward(self):
+        self.assertEqual(self.mark_read(self.pro_user, self.messages[2]), self.messages[2].created_at)
+        self.assertEqual(self.unread(self.pro_user), 1)
+        self.assertEqual(
+            list(Message.objects.filter(room=self.room, is_read=True).order_by('created_at').values_list('id', flat=True)),
+            [self.messages[0].id, self.messages[2].id]
+        )
+
+        # An out-of-order (older) ack is a no-op and reports nothing new
+        self.assertIsNone(self.mark_read(self.pro_user, self.messages[0]))
+        self.assertIsNone(self.mark_read(self.pro_user, self.messages[2]))
+        state = ChatReadState.objects.get(room=self.room, user=self.pro_user)
+        self.assertEqual(state.last_read_message_id, self.messages[2].id)
+        self.assertEqual(self.unread(self.pro_user), 1)
+
+        self.assertEqual(self.mark_read(self.pro_user, self.messages[5]), self.messages[5].created_at)
+        self.assertEqual(self.unread(self.pro_user), 0)
+        # The facility's own read state is untouched
+        self.assertEqual(self.unread(self.facility_user), 3)
+
+    def test_outsiders_cannot_move_the_watermark(self):
+        outsider = User.objects.create_user(email="other@example.com", password="x")
+        with self.assertRaises(PermissionError):
+            self.mark_read(outsider, self.messages[0])
+
+try:
+    import fakeredis
+except ImportError:  # optional dev dependency, see benchmark_lifecycle
+    fakeredis = None
+
+
+@skipUnless(fakeredis, "fakeredis is not installed")
+class PresenceRegistryTests(SimpleTestCase):
+    def setUp(self):
+        self.client = fakeredis.FakeRedis(decode_responses=True)
+        self.registry = PresenceRegistry(client=self.client, ttl=1)
+
+    def test_connect_heartbeat_disconnect(self):
+        self.registry.connect("u1", "chan-a", room_id="r1")
+        self.registry.connect("u1", "chan-b")
+        self.registry.heartbeat("u2", "chan-c", room_id="r1")
+        self.assertTrue(self.registry.is_online("u1"))
+        self.assertEqual(self.registry.online_user_ids(["u1", "u2", "u3"]), {"u1", "u2"})
+        self.assertEqual(self.registry.room_user_ids("r1"), {"u1", "u2"})
+
+        # Still online while another socket is open
+        self.registry.disconnect("u1", "chan-a", room_id="r1")
+        self.assertTrue(self.registry.is_online("u1"))
+        self.assertEqual(self.registry.room_user_ids("r1"), {"u2"})
+
+        self.registry.disconnect("u1", "chan-b")
+        self.assertFalse(self.registry.is_online("u1"))
+        self.assertEqual(self.registry.online_user_ids(["u1", "u2"]), {"u2"})
+
+    def test_entries_expire_without_heartbeats(self):
+        self.registry.connect("u1", "chan-a", room_id="r1")
+        self.assertEqual(self.client.ttl(PresenceRegistry.USER_KEY.format("u1")), 1)
+        time.sleep(1.1)
+        self.assertFalse(self.registry.is_online("u1"))
+        self.assertEqual(self.registry.room_user_ids("r1"), set())
+
+    def test_stale_channel_dropped_while_room_key_is_alive(self):
+        with mock.patch("communications.presence.time") as clock:
+            clock.time.return_value = time.time() - 5
+            self.registry.heartbeat("u1", "chan-a", room_id="r1")
+        # u2's heartbeat refreshes the room key, but u1's own entry is past the TTL
+        self.registry.heartbeat("u2", "chan-b", room_id="r1")
+        self.assertEqual(self.registry.room_user_ids("r1"), {"u2"})
+
+    def test_redis_errors_read_as_offline(self):
+        broken = mock.Mock()
+        broken.exists.side_effect = redis.ConnectionError
+        broken.pipeline.side_effect = redis.ConnectionError
+        registry = PresenceRegistry(client=broken, ttl=1)
+        with self.assertLogs("communications.presence", "WARNING"):
+            registry.heartbeat("u1", "chan-a")
+            self.assertFalse(registry.is_online("u1"))
+            self.assertEqual(registry.online_user_ids(["u1"]), set())
+
+
+@skipUnless(fakeredis, "fakeredis is not installed")
+@override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}})
+class ConsumerPresenceTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(presence, "_client", fakeredis.FakeRedis(decode_responses=True))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def communicator(self, user):
+        communicator = WebsocketCommunicator(ChatConsumer.as_asgi(), "/ws/chat/r1/")
+        communicator.scope["url_route"] = {"kwargs": {"room_id": "r1"}}
+        communicator.scope["user"] = user
+        return communicator
+
+    async def test_socket_lifecycle_tracks_presence(self):
+        user = User(id=uuid.uuid4(), email="pro@example.com")
+        communicator = self.communicator(user)
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        self.assertTrue(presence.is_online(user.id))
+        self.assertEqual(presence.room_user_ids("r1"), {str(user.id)})
+
+        # A heartbeat refreshes the TTL the connect set
+        key = PresenceRegistry.USER_KEY.format(user.id)
+        presence.client.expire(key, 5)
+        await communicator.send_json_to({"type": "heartbeat"})
+        await communicator.receive_nothing()
+        self.assertEqual(presence.client.ttl(key), presence.ttl)
+
+        await communicator.disconnect()
+        self.assertFalse(presence.is_online(user.id))
+        self.assertEqual(presence.room_user_ids("r1"), set())
+
+    async def test_anonymous_sockets_are_not_tracked(self):
+        communicator = self.communicator(AnonymousUser())
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        await communicator.send_json_to({"type": "heartbeat"})
+        await communicator.receive_nothing()
+        self.assertEqual(presence.room_user_ids("r1"), set())
+        await communicator.disconnect()
@@ -71,6 +71,33 @@ class ChatRoomCreateView(APIView):
         room, created = ChatRoom.objects.get_or_create(application=application)
         return Response({"room_id": room.id, "created": created})
 
+@extend_schema(
+    responses={
+        200: inline_serializer(
+            name='ChatUnreadCountResponse',
+            many=True,
+            fields={
+                'room_id': serializers.UUIDField(),
+                'unread': serializers.IntegerField(),
+                'last_read_at': serializers.DateTimeField()
+            }
+        )
+    }
+)
+@route("chat/rooms/unread/", name="chat-unread-counts", query_budget=1)
+class ChatUnreadCountView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        from .selectors import ChatSelector
+        rooms = ChatSelector().unread_counts(request.user)
+        data = [{
+            "room_id": r["id"],
+            "unread": r["unread"],
+            "last_read_at": r["last_read_at"]
+        } for r in rooms]
+        return Response(data)
+
 @extend_schema(
     responses={
         200: inline_serializer(
@@ -84,7 +111,7 @@ class ChatRoomCreateView(APIView):
         )
     }
 )
-@route("chat/rooms/<int:room_id>/messages/", name="chat-history")
+@route("chat/rooms/<uuid:room_id>/messages/", name="chat-history", query_budget=2)
 class ChatHistoryView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -93,7 +120,7 @@ class ChatHistoryView(APIView):
         # Check permissions
         # ... (omitted for brevity, similar to above)
         
-        messages = room.messages.order_by('created_at')
+        messages = room.messages.select_related('sender').order_by('created_at')
         data = [{
             "sender": m.sender.email,
             "content": m.content,
@@ -120,7 +147,7 @@ from core.models import Notification
         )
     }
 )
-@route("notifications/", name="notifications-list")
+@route("notifications/", name="notifications-list", query_budget=1)
 class NotificationListView(APIView):
     permission_classes = [IsAuthenticated]
 
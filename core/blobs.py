@@ -0,0 +1,172 @@
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from urllib.parse import urlencode, urlparse, unquote
+from django.conf import settings
+from django.core import signing
+from django.core.files.base import ContentFile, File
+from django.core.files.storage import FileSystemStorage
+from django.utils.module_loading import import_string
+
+class UploadTooLarge(ValueError):
+    pass
+
+class CappedStream:
+    """
+    Read-through wrapper that raises UploadTooLarge once more than max_bytes have been read,
+    whatever the request headers claimed.
+    """
+    def __init__(self, stream, max_bytes):
+        self.stream = stream
+        self.max_bytes = max_bytes
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = self.stream.read(size)
+        self.bytes_read += len(data)
+        if self.bytes_read > self.max_bytes:
+            raise UploadTooLarge(f"Upload exceeds {self.max_bytes} bytes")
+        return data
+
+class BlobStorage:
+    """
+    Minimal interface over wherever uploaded documents live.
+    Locations can be a storage key ("facility/cac/x.pdf") or a full URL to the blob.
+    """
+    def key_for(self, location):
+        raise NotImplementedError
+
+    def read(self, location):
+        raise NotImplementedError
+
+    def write(self, key, data, content_type=None):
+        raise NotImplementedError
+
+    def exists(self, location):
+        raise NotImplementedError
+
+    def url(self, key):
+        raise NotImplementedError
+
+    def upload_target(self, key, content_type=None, expires_in=None):
+        """
+        Short-lived URL the client can PUT the file to directly, bypassing the app server.
+        Returns {"url", "method", "headers"}.
+        """
+        raise NotImplementedError
+
+class LocalBlobStorage(BlobStorage):
+    """
+    Local stand-in backed by MEDIA_ROOT, used in development and tests.
+    """
+    def __init__(self, root=None, base_url=None):
+        self.storage = FileSystemStorage(location=root or settings.MEDIA_ROOT, base_url=base_url or settings.MEDIA_URL)
+
+    def key_for(self, location):
+        location = str(location)
+        parsed = urlparse(location)
+        path = unquote(parsed.path)
+        if parsed.scheme == 'file':
+            return str(path).replace(str(self.storage.location), '', 1).lstrip('/')
+        path = path.lstrip('/')
+        media_path = urlparse(self.storage.base_url).path.lstrip('/')
+        if media_path and path.startswith(media_path):
+            path = path[len(media_path):]
+        return path.lstrip('/')
+
+    def read(self, location):
+        with self.storage.open(self.key_for(location), 'rb') as f:
+            return f.read()
+
+    def write(self, key, data, content_type=None):
+        if self.storage.exists(key):
+            self.storage.delete(key)
+        return self.storage.save(key, ContentFile(data))
+
+    def exists(self, location):
+        return self.storage.exists(self.key_for(location))
+
+    def url(self, key):
+        return self.storage.url(key)
+
+    # Stand-in for a signed blob URL: an HMAC-signed token for our own local upload view
+    UPLOAD_SALT = "core.blobs.local-upload"
+
+    def upload_target(self, key, content_type=None, expires_in=None):
+        from django.urls import reverse
+        token = signing.dumps({"k": key}, salt=self.UPLOAD_SALT)
+        return {
+            "url": f"{reverse('blob-local-upload')}?{urlencode({'token': token})}",
+            "method": "PUT",
+            "headers": {"Content-Type": content_type} if content_type else {},
+        }
+
+    def key_from_upload_token(self, token, max_age):
+        return signing.loads(token, salt=self.UPLOAD_SALT, max_age=max_age)["k"]
+
+    def write_stream(self, key, stream, max_bytes=None):
+        # File.chunks() reads the request body piece by piece, so the upload is never held in memory
+        if max_bytes is not None:
+            stream = CappedStream(stream, max_bytes)
+        try:
+            return self.storage.save(key, File(stream))
+        except UploadTooLarge:
+            # Don't leave the partial file behind
+            self.storage.delete(key)
+            raise
+
+class AzureBlobStorage(BlobStorage):
+    """
+    Azure Blob Storage container configured by AZURE_STORAGE_CONNECTION_STRING / AZURE_STORAGE_CONTAINER.
+    """
+    def __init__(self, connection_string=None, container=None):
+        from azure.storage.blob import BlobServiceClient
+        self.service = BlobServiceClient.from_connection_string(connection_string or settings.AZURE_STORAGE_CONNECTION_STRING)
+        self.container_name = container or settings.AZURE_STORAGE_CONTAINER
+        self.container = self.service.get_container_client(self.container_name)
+
+    def key_for(self, location):
+        location = str(location)
+        if '://' not in location:
+            return location.lstrip('/')
+        # https://<account>.blob.core.windows.net/<container>/<key>
+        path = unquote(urlparse(location).path).lstrip('/')
+        prefix = f"{self.container_name}/"
+        return path[len(prefix):] if path.startswith(prefix) else path
+
+    def read(self, location):
+        return self.container.download_blob(self.key_for(location)).readall()
+
+    def write(self, key, data, content_type=None):
+        from azure.storage.blob import ContentSettings
+        self.container.upload_blob(
+            key, data, overwrite=True,
+            content_settings=ContentSettings(content_type=content_type) if content_type else None
+        )
+        return key
+
+    def exists(self, location):
+        return self.container.get_blob_client(self.key_for(location)).exists()
+
+    def url(self, key):
+        return self.container.get_blob_client(key).url
+
+    def upload_target(self, key, content_type=None, expires_in=None):
+        from azure.storage.blob import BlobSasPermissions, generate_blob_sas
+        expires_in = expires_in or settings.UPLOAD_URL_TTL_SECONDS
+        sas = generate_blob_sas(
+            account_name=self.service.account_name,
+            container_name=self.container_name,
+            blob_name=key,
+            account_key=self.service.credential.account_key,
+            permission=BlobSasPermissions(create=True, write=True),
+            expiry=datetime.now(timezone.utc) + timedelta(seconds=expires_in),
+            content_type=content_type,
+        )
+        headers = {"x-ms-blob-type": "BlockBlob"}
+        if content_type:
+            headers["Content-Type"] = content_type
+        return {"url": f"{self.url(key)}?{sas}", "method": "PUT", "headers": headers}
+
+@lru_cache(maxsize=1)
+def get_blob_storage():
+    return import_string(settings.BLOB_STORAGE_BACKEND)()
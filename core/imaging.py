@@ -0,0 +1,34 @@
+from io import BytesIO
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+VARIANTS = ('review', 'thumb')
+
+def variant_key(key, variant):
+    """
+    Variants live next to the original: facility/cac/<id>/scan.png -> facility/cac/<id>/scan.png.review.jpg
+    """
+    return f"{key}.{variant}.jpg"
+
+def render_variants(data, sizes):
+    """
+    Downscaled, recompressed copies of an uploaded document image.
+    sizes: {variant: (max_px, jpeg_quality)}. Returns {variant: jpeg bytes}, or {} when the
+    upload isn't an image Pillow can read (e.g. PDF scans).
+    """
+    try:
+        image = Image.open(BytesIO(data))
+        image.load()
+    except (UnidentifiedImageError, OSError):
+        return {}
+
+    # Phone photos are often stored sideways with an EXIF rotation flag
+    image = ImageOps.exif_transpose(image).convert('RGB')
+
+    rendered = {}
+    for variant, (max_px, quality) in sizes.items():
+        copy = image.copy()
+        copy.thumbnail((max_px, max_px), Image.Resampling.LANCZOS)
+        out = BytesIO()
+        copy.save(out, format='JPEG', quality=quality, optimize=True, progressive=True)
+        rendered[variant] = out.getvalue()
+    return rendered
@@ -0,0 +1,96 @@
+import threading
+from collections import defaultdict
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+# Upper bounds for the histogram buckets (seconds / number of queries)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250, 500)
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0
+
+    def observe(self, value):
+        self.total += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+class MetricsRegistry:
+    """
+    In-process store of per-route request metrics, rendered in the Prometheus text format.
+    Each worker process keeps its own numbers; Prometheus sums them across scrape targets.
+    """
+    HISTOGRAMS = {
+        "shifta_request_duration_seconds": ("Total request latency", LATENCY_BUCKETS),
+        "shifta_db_queries": ("SQL queries per request", QUERY_BUCKETS),
+        "shifta_db_duration_seconds": ("Time spent in SQL per request", LATENCY_BUCKETS),
+        "shifta_serialization_duration_seconds": ("Time spent rendering the response body", LATENCY_BUCKETS),
+    }
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.requests = defaultdict(int)
+            self.histograms = {}
+
+    def record(self, route, method, status, duration, queries, db_duration, serialization_duration):
+        labels = (route, method)
+        with self.lock:
+            self.requests[(route, method, str(status))] += 1
+            for name, value in (
+                ("shifta_request_duration_seconds", duration),
+                ("shifta_db_queries", queries),
+                ("shifta_db_duration_seconds", db_duration),
+                ("shifta_serialization_duration_seconds", serialization_duration),
+            ):
+                key = (name, labels)
+                if key not in self.histograms:
+                    self.histograms[key] = Histogram(self.HISTOGRAMS[name][1])
+                self.histograms[key].observe(value)
+
+    def render(self):
+        with self.lock:
+            lines = [
+                "# HELP shifta_requests_total Sampled requests per route",
+                "# TYPE shifta_requests_total counter",
+            ]
+            for (route, method, status), count in sorted(self.requests.items()):
+                lines.append(f'shifta_requests_total{{{_labels(route=route, method=method, status=status)}}} {count}')
+
+            for name, (help_text, _) in self.HISTOGRAMS.items():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} histogram")
+                for (metric, (route, method)), hist in sorted(self.histograms.items(), key=lambda item: item[0]):
+                    if metric != name:
+                        continue
+                    labels = _labels(route=route, method=method)
+                    for bound, count in zip(hist.buckets, hist.counts):
+                        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+                    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {hist.total}')
+                    lines.append(f'{name}_sum{{{labels}}} {hist.sum}')
+                    lines.append(f'{name}_count{{{labels}}} {hist.total}')
+        return "\n".join(lines) + "\n"
+
+def _labels(**labels):
+    escaped = (
+        (key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in labels.items()
+    )
+    return ",".join(f'{key}="{value}"' for key, value in escaped)
+
+metrics = MetricsRegistry()
+
+def metrics_view(request):
+    # Scraped from inside the cluster only; never exposed through the public API
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+        return HttpResponseForbidden()
+    return HttpResponse(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
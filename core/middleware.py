@@ -0,0 +1,69 @@
+import random
+import time
+from django.conf import settings
+from django.db import connection
+from .metrics import metrics
+
+class QueryCounter:
+    """
+    connection.execute_wrapper hook that counts queries and the time spent in them.
+    """
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - start
+
+class QueryMetricsMiddleware:
+    """
+    Records per-route query count, DB time, serialization time and total latency
+    for a METRICS_SAMPLE_RATE fraction of requests. Served at /metrics/.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.METRICS_ENABLED or random.random() >= settings.METRICS_SAMPLE_RATE:
+            return self.get_response(request)
+
+        counter = QueryCounter()
+        request._metrics_serialization = 0.0
+        start = time.perf_counter()
+        with connection.execute_wrapper(counter):
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        match = request.resolver_match
+        if match is None:
+            route = "unmatched"
+        elif match.url_name == "metrics":
+            return response
+        else:
+            # The URL pattern, not the concrete path, so ids don't explode the label set
+            route = match.route
+
+        metrics.record(
+            route=route,
+            method=request.method,
+            status=response.status_code,
+            duration=duration,
+            queries=counter.count,
+            db_duration=counter.duration,
+            serialization_duration=request._metrics_serialization,
+        )
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered lazily right after this hook; render here to time it.
+        # Responses are only rendered once, so the handler's own render() is then a no-op.
+        if hasattr(request, '_metrics_serialization'):
+            start = time.perf_counter()
+            response.render()
+            request._metrics_serialization = time.perf_counter() - start
+        return response
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_notificationarchive_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notification',
+            name='notification_type',
+            field=models.CharField(choices=[('SHIFT_POSTED', 'Shift Posted'), ('SHIFT_APPROVED', 'Shift Approved'), ('REMINDER', 'Reminder'), ('CANCELLED', 'Shift Cancelled'), ('BOOKED', 'Shift Booked'), ('MESSAGE', 'New Message'), ('INVOICE_UPCOMING', 'Invoice Upcoming'), ('INVOICE_GENERATED', 'Invoice Generated'), ('BROADCAST', 'Broadcast'), ('LICENSE_EXPIRY', 'License Expiry')], max_length=50),
+        ),
+    ]
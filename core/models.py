@@ -20,6 +20,7 @@ class Notification(BaseModel):
         ('INVOICE_UPCOMING', 'Invoice Upcoming'),
         ('INVOICE_GENERATED', 'Invoice Generated'),
         ('BROADCAST', 'Broadcast'),
+        ('LICENSE_EXPIRY', 'License Expiry'),
     )
 
     user = models.ForeignKey('accounts.User', on_delete=models.CASCADE, related_name='notifications')
@@ -29,6 +30,37 @@ class Notification(BaseModel):
     is_read = models.BooleanField(default=False)
     related_object_id = models.UUIDField(null=True, blank=True) # Generic link to related object
     data = models.JSONField(default=dict, blank=True) # For extra context
+
+    class Meta:
+        indexes = [
+            # Feed: a user's notifications, newest first
+            models.Index(fields=['user', '-created_at'], name='core_notif_user_created_idx'),
+            # Retention sweep: only read rows are ever archived
+            models.Index(fields=['created_at'], condition=models.Q(is_read=True), name='core_notif_read_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.title} - {self.user.email}"
+
+class NotificationArchive(models.Model):
+    """
+    Cold storage for read notifications moved out of the hot Notification table
+    by the retention job. Keeps the original id and timestamp, drops the
+    mutable/bulky columns (is_read, updated_at, data).
+    """
+    id = models.UUIDField(primary_key=True, editable=False)
+    user = models.ForeignKey('accounts.User', on_delete=models.CASCADE, related_name='archived_notifications')
+    title = models.CharField(max_length=255)
+    message = models.TextField()
+    notification_type = models.CharField(max_length=50)
+    related_object_id = models.UUIDField(null=True, blank=True)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='core_notifarch_user_idx'),
+        ]
+
+    def __str__(self):
+        return f"[archived] {self.title}"
@@ -5,13 +5,18 @@ class EndpointRegistry:
     def __init__(self):
         self._registry = []
 
-    def route(self, path_str, name=None, methods=None):
+    def route(self, path_str, name=None, methods=None, query_budget=None):
+        """
+        query_budget: max SQL queries a GET to this route may run, whatever the data size.
+        Authentication queries are not counted. Enforced by the query-budget tests in core/tests.py.
+        """
         def decorator(view_class):
             self._registry.append({
                 "path": path_str,
                 "view": view_class,
                 "name": name or view_class.__name__.lower(),
-                "methods": methods
+                "methods": methods,
+                "query_budget": query_budget
             })
             return view_class
         return decorator
@@ -24,5 +29,9 @@ class EndpointRegistry:
             )
         return urlpatterns
 
+    @property
+    def entries(self):
+        return list(self._registry)
+
 registry = EndpointRegistry()
 route = registry.route
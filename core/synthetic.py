@@ -0,0 +1,353 @@
+import io
+import json
+import random
+import uuid
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.utils import timezone
+
+CITIES = (
+    # name, lat, lng, weight
+    ("Lagos", 6.5244, 3.3792, 40),
+    ("Abuja", 9.0765, 7.3986, 18),
+    ("Port Harcourt", 4.8156, 7.0498, 10),
+    ("Ibadan", 7.3775, 3.9470, 9),
+    ("Kano", 12.0022, 8.5920, 8),
+    ("Enugu", 6.4584, 7.5464, 6),
+    ("Benin City", 6.3350, 5.6037, 5),
+    ("Kaduna", 10.5105, 7.4165, 4),
+)
+SPECIALTIES = (
+    "ICU", "Emergency", "Pediatrics", "Theatre", "Maternity", "Oncology", "Cardiology",
+    "General Ward", "Psychiatry", "Renal", "Orthopaedics", "Neonatal",
+)
+ROLES = ("Nurse", "Doctor", "Midwife", "Pharmacist", "Lab Scientist", "Physiotherapist")
+FIRST_NAMES = ("Ada", "Chinedu", "Funke", "Ibrahim", "Kemi", "Musa", "Ngozi", "Segun", "Tolu", "Zainab", "Emeka", "Aisha")
+LAST_NAMES = ("Okafor", "Adeyemi", "Bello", "Eze", "Ogunleye", "Abubakar", "Nwosu", "Balogun", "Danjuma", "Okoro")
+MESSAGES = (
+    "Hi, are you still available for this shift?",
+    "Yes, I'll be there 15 minutes early.",
+    "Please report to the nurses' station on arrival.",
+    "Running a little late, traffic on the bridge.",
+    "Thanks for covering today.",
+    "Can you do the same shift next week?",
+)
+
+class RowWriter:
+    """
+    Writes generated rows for one model in chunks: COPY on Postgres, bulk_create elsewhere.
+    Rows are dicts keyed by field attname; anything left out gets the field default.
+    """
+    def __init__(self, model, chunk_size=50000):
+        self.model = model
+        self.fields = list(model._meta.concrete_fields)
+        self.chunk_size = chunk_size
+        self.pending = []
+        self.written = 0
+
+    def add(self, row):
+        self.pending.append(row)
+        if len(self.pending) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        rows = [self.complete(row) for row in self.pending]
+        if connection.vendor == 'postgresql':
+            self.copy(rows)
+        else:
+            self.model.objects.bulk_create(
+                [self.model(**{field.attname: row[i] for i, field in enumerate(self.fields)}) for row in rows],
+                batch_size=1000
+            )
+        self.written += len(rows)
+        self.pending = []
+
+    def complete(self, row):
+        values = []
+        for field in self.fields:
+            if field.attname in row:
+                values.append(row[field.attname])
+            elif field.has_default():
+                values.append(field.get_default())
+            else:
+                values.append(None)
+        return values
+
+    def copy(self, rows):
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write("\t".join(_copy_value(value) for value in row))
+            buffer.write("\n")
+        buffer.seek(0)
+        columns = ", ".join(connection.ops.quote_name(field.column) for field in self.fields)
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(f"COPY {table} ({columns}) FROM STDIN", buffer)
+
+def _copy_value(value):
+    # Postgres COPY text format
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value)
+    elif isinstance(value, (datetime, date)):
+        value = value.isoformat()
+    else:
+        value = str(value)
+    return value.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+class SyntheticDataGenerator:
+    """
+    Deterministic fixtures for performance work: the same seed and sizes always give the same rows
+    (ids included), so a slow query found on one machine can be reproduced on another.
+
+    Facilities and professionals are clustered around Nigerian cities; shifts are spread over
+    `months` months either side of `now` so past shifts are completed/cancelled and future ones
+    open/filled, with applications, payouts, charges, chat rooms and messages to match.
+    """
+    PASSWORD = "synthetic-password"
+
+    def __init__(self, seed=1, facilities=100, professionals=10000, shifts=50000, applicants_per_shift=3,
+                 months=6, chat_ratio=0.3, messages_per_room=8, chunk_size=50000, email_domain="synthetic.test", now=None):
+        self.rng = random.Random(seed)
+        self.seed = seed
+        self.facility_count = facilities
+        self.professional_count = professionals
+        self.shift_count = shifts
+        self.applicants_per_shift = applicants_per_shift
+        self.months = months
+        self.chat_ratio = chat_ratio
+        self.messages_per_room = messages_per_room
+        self.chunk_size = chunk_size
+        self.email_domain = email_domain
+        # Pinned to midnight so a rerun on the same day gives identical timestamps
+        self.now = now or timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+    def uuid(self):
+        return uuid.UUID(int=self.rng.getrandbits(128), version=4)
+
+    def location(self):
+        city, lat, lng, _ = self.rng.choices(CITIES, weights=[c[3] for c in CITIES])[0]
+        return city, round(lat + self.rng.gauss(0, 0.08), 6), round(lng + self.rng.gauss(0, 0.08), 6)
+
+    def writer(self, model):
+        return RowWriter(model, self.chunk_size)
+
+    def run(self, log=None):
+        from accounts.models import User, Facility, Professional, Review
+        from billing.models import Transaction
+        from communications.models import ChatRoom, Message
+        from shifts.models import Shift, ShiftApplication, ProfessionalCommitment
+
+        log = log or (lambda message: None)
+        # Hashing once keeps user creation I/O-bound; every synthetic user shares the password
+        password = make_password(self.PASSWORD, salt=f"synthetic{self.seed}")
+        writers = {model: self.writer(model) for model in (
+            User, Facility, Professional, Shift, ShiftApplication, ProfessionalCommitment, Transaction, ChatRoom, Message, Review
+        )}
+
+        with transaction.atomic():
+            facilities = self.generate_facilities(writers, password)
+            log(f"facilities: {len(facilities)}")
+            professionals = self.generate_professionals(writers, password)
+            log(f"professionals: {len(professionals)}")
+            writers[User].flush()
+            writers[Facility].flush()
+            writers[Professional].flush()
+            self.generate_shifts(writers, facilities, professionals, log)
+            for model_writer in writers.values():
+                model_writer.flush()
+
+            # Derived tables the app keeps incrementally; built from what was just written
+            from accounts.ratings import rebuild_rating_summaries
+            from accounts.stats import rebuild_stats
+            from shifts.market import rebuild_market_rates
+            derived = rebuild_rating_summaries(chunk_size=self.chunk_size)
+            stats = rebuild_stats(chunk_size=self.chunk_size)
+            market = rebuild_market_rates(chunk_size=self.chunk_size)
+            log("rating summaries, professional stats and market rates")
+
+        counts = {model._meta.label: model_writer.written for model, model_writer in writers.items()}
+        counts["accounts.RatingSummary"] = derived["summaries"]
+        counts["accounts.RatingDay"] = derived["days"]
+        counts["accounts.ProfessionalStats"] = stats["professionals"]
+        counts["accounts.ProfessionalFacilityStats"] = stats["facility_pairs"]
+        counts["shifts.MarketRateStat"] = market["stats"]
+        return counts
+
+    def generate_facilities(self, writers, password):
+        from accounts.models import User, Facility
+
+        facilities = []
+        for i in range(self.facility_count):
+            user_id, facility_id = self.uuid(), self.uuid()
+            city, lat, lng = self.location()
+            joined = self.now - timedelta(days=self.rng.randint(30, 900))
+            writers[User].add({
+                "id": user_id, "email": f"facility{i}-{self.seed}@{self.email_domain}", "password": password,
+                "first_name": "", "last_name": "", "date_joined": joined,
+            })
+            writers[Facility].add({
+                "id": facility_id, "user_id": user_id, "created_at": joined, "updated_at": joined,
+                "name": f"{city} {self.rng.choice(('General', 'Specialist', 'Teaching', 'Mercy', 'Unity'))} Hospital {i}",
+                "address": f"{self.rng.randint(1, 300)} Hospital Road, {city}",
+                "rc_number": f"SYN-RC-{self.seed}-{i}",
+                "wallet_balance": Decimal(self.rng.randrange(1_000_000, 50_000_000)),
+                "tier": self.rng.randint(1, 4),
+                "is_verified": self.rng.random() < 0.9,
+                "location_lat": lat, "location_lng": lng,
+            })
+            facilities.append((facility_id, user_id, city, lat, lng))
+        return facilities
+
+    def generate_professionals(self, writers, password):
+        from accounts.models import User, Professional
+
+        professionals = []
+        for i in range(self.professional_count):
+            user_id, professional_id = self.uuid(), self.uuid()
+            city, lat, lng = self.location()
+            joined = self.now - timedelta(days=self.rng.randint(1, 900))
+            writers[User].add({
+                "id": user_id, "email": f"pro{i}-{self.seed}@{self.email_domain}", "password": password,
+                "first_name": self.rng.choice(FIRST_NAMES), "last_name": self.rng.choice(LAST_NAMES),
+                "date_joined": joined,
+            })
+            writers[Professional].add({
+                "id": professional_id, "user_id": user_id, "created_at": joined, "updated_at": joined,
+                "license_number": f"SYN-LIC-{self.seed}-{i}",
+                "license_expiry_date": (self.now + timedelta(days=self.rng.randint(-60, 1000))).date(),
+                "specialties": self.rng.sample(SPECIALTIES, self.rng.randint(1, 3)),
+                "is_verified": self.rng.random() < 0.85,
+                "current_location_lat": lat, "current_location_lng": lng,
+                "wallet_balance": Decimal(self.rng.randrange(0, 500_000)),
+            })
+            professionals.append((professional_id, user_id))
+        return professionals
+
+    def generate_shifts(self, writers, facilities, professionals, log):
+        from accounts.models import Review
+        from billing.models import Transaction
+        from shifts.commitments import ACTIVE_STATUSES
+        from shifts.models import Shift, ShiftApplication, ProfessionalCommitment
+
+        span_hours = self.months * 30 * 24
+        for i in range(self.shift_count):
+            facility_id, facility_user_id, city, lat, lng = self.rng.choice(facilities)
+            start = self.now + timedelta(hours=self.rng.randint(-span_hours, span_hours))
+            end = start + timedelta(hours=self.rng.choice((6, 8, 9, 12)))
+            created = min(start, self.now) - timedelta(days=self.rng.randint(1, 21))
+            rate = Decimal(self.rng.randrange(2000, 9000, 50))
+            needed = self.rng.choices((1, 2, 3, 5), weights=(50, 25, 15, 10))[0]
+            shift_id = self.uuid()
+
+            if end < self.now:
+                status = 'CANCELLED' if self.rng.random() < 0.05 else 'COMPLETED'
+            elif start < self.now:
+                status = 'FILLED'
+            else:
+                status = self.rng.choices(('OPEN', 'FILLED', 'CANCELLED'), weights=(70, 25, 5))[0]
+
+            applicant_count = max(0, int(self.rng.gauss(self.applicants_per_shift, self.applicants_per_shift / 2)))
+            applicants = self.rng.sample(professionals, min(applicant_count, len(professionals)))
+            filled = 0
+            for position, (professional_id, professional_user_id) in enumerate(applicants):
+                app_status, clock_in, clock_out = self.application_state(status, position, needed, start, end)
+                if app_status in ('CONFIRMED', 'ATTENDANCE_PENDING', 'IN_PROGRESS', 'COMPLETED'):
+                    filled += 1
+                application_id = self.uuid()
+                applied = created + timedelta(minutes=self.rng.randint(5, 60 * 24))
+                writers[ShiftApplication].add({
+                    "id": application_id, "shift_id": shift_id, "professional_id": professional_id,
+                    "status": app_status, "clock_in_time": clock_in, "clock_out_time": clock_out,
+                    # Completed work was paid out a day after clock-out (see the PAYOUT row below)
+                    "paid_at": clock_out + timedelta(days=1) if app_status == 'COMPLETED' else None,
+                    "created_at": applied, "updated_at": clock_out or clock_in or applied,
+                })
+
+                if app_status in ACTIVE_STATUSES:
+                    writers[ProfessionalCommitment].add({
+                        "id": self.uuid(), "professional_id": professional_id, "application_id": application_id,
+                        "start_time": start, "end_time": end, "created_at": applied, "updated_at": applied,
+                    })
+
+                if app_status == 'COMPLETED':
+                    hours = Decimal((end - start).total_seconds() / 3600)
+                    writers[Transaction].add({
+                        "id": self.uuid(), "user_id": professional_user_id, "shift_id": shift_id,
+                        "amount": (rate * hours).quantize(Decimal("0.01")), "transaction_type": 'PAYOUT',
+                        "reference": f"syn-{self.seed}-payout-{application_id.hex}", "status": 'SUCCESS',
+                        "created_at": clock_out + timedelta(days=1), "updated_at": clock_out + timedelta(days=1),
+                    })
+                    if self.rng.random() < 0.2:
+                        writers[Review].add({
+                            "id": self.uuid(), "reviewer_id": facility_user_id, "target_user_id": professional_user_id,
+                            "rating": self.rng.choices((1, 2, 3, 4, 5), weights=(3, 5, 15, 40, 37))[0],
+                            "comment": "Synthetic review", "created_at": clock_out, "updated_at": clock_out,
+                        })
+
+                if app_status not in ('PENDING', 'REJECTED') and self.rng.random() < self.chat_ratio:
+                    self.generate_chat(writers, application_id, professional_user_id, facility_user_id, applied)
+
+            writers[Shift].add({
+                "id": shift_id, "facility_id": facility_id, "role": self.rng.choice(ROLES),
+                "specialty": self.rng.choice(SPECIALTIES), "quantity_needed": needed,
+                "quantity_filled": min(filled, needed), "start_time": start, "end_time": end, "rate": rate,
+                "is_negotiable": self.rng.random() < 0.2, "address": f"{self.rng.randint(1, 300)} Hospital Road, {city}",
+                "latitude": lat, "longitude": lng, "status": status, "created_at": created, "updated_at": created,
+            })
+            writers[Transaction].add({
+                "id": self.uuid(), "user_id": facility_user_id, "shift_id": shift_id,
+                "amount": (rate * Decimal((end - start).total_seconds() / 3600) * needed).quantize(Decimal("0.01")),
+                "transaction_type": 'CHARGE', "reference": f"syn-{self.seed}-charge-{shift_id.hex}", "status": 'SUCCESS',
+                "created_at": created, "updated_at": created,
+            })
+
+            if (i + 1) % self.chunk_size == 0:
+                log(f"shifts: {i + 1}/{self.shift_count}")
+
+    def application_state(self, shift_status, position, needed, start, end):
+        """
+        (status, clock_in_time, clock_out_time) for the applicant at `position`, consistent with the shift:
+        the first `needed` applicants are the ones taken on.
+        """
+        if shift_status == 'CANCELLED':
+            return 'CANCELLED', None, None
+        if position >= needed:
+            return ('REJECTED' if shift_status != 'OPEN' else self.rng.choice(('PENDING', 'REJECTED'))), None, None
+        if shift_status == 'OPEN':
+            # At least the last slot stays unconfirmed, otherwise the shift would be FILLED
+            if position == needed - 1:
+                return 'PENDING', None, None
+            return self.rng.choice(('CONFIRMED', 'PENDING')), None, None
+
+        clock_in = start + timedelta(minutes=self.rng.randint(-20, 30))
+        if shift_status == 'COMPLETED':
+            if self.rng.random() < 0.03:
+                return 'CANCELLED', None, None
+            return 'COMPLETED', clock_in, end + timedelta(minutes=self.rng.randint(-15, 45))
+        if start < self.now:
+            # Happening right now
+            return self.rng.choice(('ATTENDANCE_PENDING', 'IN_PROGRESS')), clock_in, None
+        return 'CONFIRMED', None, None
+
+    def generate_chat(self, writers, application_id, professional_user_id, facility_user_id, opened):
+        from communications.models import ChatRoom, Message
+
+        room_id = self.uuid()
+        writers[ChatRoom].add({"id": room_id, "application_id": application_id, "created_at": opened, "updated_at": opened})
+        sent = opened
+        for n in range(self.rng.randint(1, self.messages_per_room * 2)):
+            sent = sent + timedelta(minutes=self.rng.randint(1, 600))
+            writers[Message].add({
+                "id": self.uuid(), "room_id": room_id,
+                "sender_id": professional_user_id if n % 2 else facility_user_id,
+                "content": self.rng.choice(MESSAGES), "is_read": sent < self.now - timedelta(hours=6),
+                "created_at": sent, "updated_at": sent,
+            })
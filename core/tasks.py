@@ -0,0 +1,80 @@
+import logging
+from celery import shared_task
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from datetime import timedelta
+from .models import Notification, NotificationArchive
+
+logger = logging.getLogger(__name__)
+
+ARCHIVED_FIELDS = ('id', 'user_id', 'title', 'message', 'notification_type', 'related_object_id', 'created_at')
+
+@shared_task
+def archive_read_notifications(retention_days=None, batch_size=None, max_batches=None):
+    """
+    Move read notifications older than the retention window into NotificationArchive.
+    Works in bounded batches, each in its own short transaction, so no long locks are held
+    on the hot table.
+    """
+    retention_days = retention_days or settings.NOTIFICATION_RETENTION_DAYS
+    batch_size = batch_size or settings.NOTIFICATION_ARCHIVE_BATCH_SIZE
+    max_batches = max_batches or settings.NOTIFICATION_ARCHIVE_MAX_BATCHES
+    cutoff = timezone.now() - timedelta(days=retention_days)
+
+    archived = 0
+    for _ in range(max_batches):
+        with transaction.atomic():
+            # skip_locked lets two overlapping runs split the work instead of blocking each other
+            rows = list(
+                Notification.objects
+                .filter(is_read=True, created_at__lt=cutoff)
+                .order_by('created_at')
+                .select_for_update(skip_locked=True)
+                .values(*ARCHIVED_FIELDS)[:batch_size]
+            )
+            if not rows:
+                break
+
+            NotificationArchive.objects.bulk_create(
+                [NotificationArchive(**row) for row in rows],
+                ignore_conflicts=True
+            )
+            Notification.objects.filter(id__in=[row['id'] for row in rows]).delete()
+
+        archived += len(rows)
+        if len(rows) < batch_size:
+            break
+
+    return archived
+
+@shared_task
+def generate_document_variants(locations):
+    """
+    Make a review-size copy and a thumbnail for each uploaded document image and store them
+    next to the original. Resizing runs inline: prefork workers are daemonic and can't start a
+    child pool. Non-images are skipped, and a missing or unreadable document is logged and skipped
+    so it doesn't cost the rest of the batch.
+    """
+    from .blobs import get_blob_storage
+    from .imaging import render_variants, variant_key
+
+    storage = get_blob_storage()
+    sizes = {
+        'review': (settings.DOCUMENT_REVIEW_MAX_PX, settings.DOCUMENT_REVIEW_QUALITY),
+        'thumb': (settings.DOCUMENT_THUMB_MAX_PX, settings.DOCUMENT_THUMB_QUALITY),
+    }
+
+    written = []
+    for location in locations:
+        if not location:
+            continue
+        key = storage.key_for(location)
+        try:
+            data = storage.read(key)
+        except Exception:
+            logger.warning("Could not read document %s for variants", key, exc_info=True)
+            continue
+        for variant, rendered in render_variants(data, sizes).items():
+            written.append(storage.write(variant_key(key, variant), rendered, content_type='image/jpeg'))
+    return written
@@ -1,3 +1,281 @@
-from django.test import TestCase
+import io
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient, APIRequestFactory
+import shifta_project.urls  # noqa: F401 - registers every route
+from accounts.models import User, Facility, Professional, FacilityStaff, ProfessionalStats
+from accounts.ratings import create_review
+from billing.models import Invoice, Transaction
+from communications.models import ChatRoom, Message
+from core.blobs import get_blob_storage
+from core.metrics import metrics
+from core.imaging import variant_key
+from core.models import Notification, NotificationArchive
+from core.tasks import archive_read_notifications, generate_document_variants
+from core.views import LocalBlobUploadView
+from core.router import registry
+from shifts.models import Shift, ShiftApplication, ShiftTemplate
 
-# Create your tests here.
+# Who calls each GET route and with what; anything not listed is called as the professional
+ROUTE_REQUESTS = {
+    "facility-staff-list": {"as": "facility"},
+    "facility-qrcode": {"as": "facility"},
+    "facility-shift-list": {"as": "facility"},
+    "facility-dashboard-stats": {"as": "facility"},
+    "invoice-list": {"as": "facility"},
+    "shift-template-list-create": {"as": "facility"},
+    "shift-calendar": {
+        "as": "facility",
+        "params": lambda data: {
+            "date_start": (data.now - timedelta(days=1)).date().isoformat(),
+            "date_end": (data.now + timedelta(days=60)).date().isoformat(),
+        },
+    },
+    "chat-history": {"kwargs": lambda data: {"room_id": data.room.id}},
+    "shift-applicant-list": {"as": "facility", "kwargs": lambda data: {"shift_id": data.shift.id}},
+    "shift-search": {"params": lambda data: {"q": "nurse", "lat": 6.45, "lng": 3.39, "radius_km": 50}},
+    "shift-facets": {"params": lambda data: {"lat": 6.45, "lng": 3.39}},
+}
+
+SMALL, LARGE = 2, 12
+
+class Fixtures:
+    """
+    A facility and a professional that keep gaining related rows with every grow() call,
+    so the same requests can be replayed against more data.
+    """
+    def __init__(self):
+        self.now = timezone.now()
+        self.size = 0
+        self.facility_user = User.objects.create_user(email="facility@example.com", password="x")
+        self.facility = Facility.objects.create(
+            user=self.facility_user, name="General Hospital", address="1 Marina", rc_number="RC-1",
+            wallet_balance=Decimal("1000000.00"), is_verified=True
+        )
+        self.professional_user = User.objects.create_user(email="pro@example.com", password="x")
+        self.professional = Professional.objects.create(
+            user=self.professional_user, license_number="LIC-0", specialties=["ICU"], is_verified=True
+        )
+        self.room = None
+        self.shift = None
+
+    def grow(self, to_size):
+        for i in range(self.size, to_size):
+            shift = Shift.objects.create(
+                facility=self.facility, role="Nurse", specialty="ICU",
+                start_time=self.now + timedelta(days=i + 1), end_time=self.now + timedelta(days=i + 1, hours=9),
+                rate=Decimal("2500.00"), quantity_needed=3
+            )
+            application = ShiftApplication.objects.create(shift=shift, professional=self.professional, status='CONFIRMED')
+            self.shift = self.shift or shift
+
+            colleague = User.objects.create_user(email=f"colleague{i}@example.com", password="x")
+            colleague_pro = Professional.objects.create(user=colleague, license_number=f"LIC-{i + 1}")
+            ShiftApplication.objects.create(shift=shift, status='IN_PROGRESS', professional=colleague_pro)
+            if shift != self.shift:
+                # The first shift keeps gaining applicants
+                ShiftApplication.objects.create(shift=self.shift, professional=colleague_pro)
+                ProfessionalStats.objects.create(professional=colleague_pro, completed_count=i)
+                create_review(self.facility_user, colleague, 4, "Good")
+
+            room = ChatRoom.objects.create(application=application)
+            self.room = self.room or room
+            Message.objects.create(room=self.room, sender=self.facility_user, content=f"Message {i}")
+            Message.objects.create(room=room, sender=colleague, content="Hello")
+
+            staff_user = User.objects.create_user(email=f"staff{i}@example.com", password="x")
+            FacilityStaff.objects.create(user=staff_user, facility=self.facility)
+            Invoice.objects.create(facility=self.facility, month=self.now.date(), amount=Decimal("100.00"))
+            Transaction.objects.create(
+                user=self.professional_user, amount=Decimal("50.00"), transaction_type='PAYOUT',
+                reference=f"ref-{i}", shift=shift
+            )
+            Notification.objects.create(
+                user=self.professional_user, title="Hi", message="Hello", notification_type='SHIFT_POSTED'
+            )
+            ShiftTemplate.objects.create(
+                facility=self.facility, role="Nurse", specialty="ICU", rate=Decimal("2500.00"),
+                weekdays=[i % 7], start_time=shift.start_time.time(), end_time=shift.end_time.time()
+            )
+        self.size = to_size
+
+class QueryBudgetTests(TestCase):
+    """
+    Every GET route must declare a query_budget on @route, stay within it, and run the same
+    number of queries whether the caller has 2 or 12 of everything (no N+1).
+    """
+    def get_routes(self):
+        routes = []
+        for entry in registry.entries:
+            if not hasattr(entry["view"], "get"):
+                continue
+            routes.append(entry)
+        return routes
+
+    def request_route(self, entry, data):
+        spec = ROUTE_REQUESTS.get(entry["name"], {})
+        kwargs = spec["kwargs"](data) if "kwargs" in spec else None
+        params = spec["params"](data) if "params" in spec else None
+        path = reverse(entry["name"], kwargs=kwargs)
+        if resolve(path).func.view_class is not entry["view"]:
+            # Shadowed by an earlier route on the same path; it never serves requests
+            return None
+
+        # Fresh user each time so cached relations don't hide queries
+        user_id = data.facility_user.id if spec.get("as") == "facility" else data.professional_user.id
+        client = APIClient()
+        client.force_authenticate(User.objects.get(id=user_id))
+
+        # Cold cache, so cached routes are measured on a miss
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(path, params)
+        self.assertEqual(response.status_code, 200, f"{entry['name']}: {response.content[:300]}")
+        return len(queries)
+
+    def test_every_get_route_declares_a_budget(self):
+        missing = [entry["name"] for entry in self.get_routes() if entry["query_budget"] is None]
+        self.assertEqual(missing, [], "GET routes without a query_budget")
+
+    def test_query_counts_are_flat_and_within_budget(self):
+        data = Fixtures()
+        data.grow(SMALL)
+        small = {entry["name"]: self.request_route(entry, data) for entry in self.get_routes()}
+        data.grow(LARGE)
+        large = {entry["name"]: self.request_route(entry, data) for entry in self.get_routes()}
+
+        for entry in self.get_routes():
+            name = entry["name"]
+            if small[name] is None:
+                continue
+            with self.subTest(route=name):
+                self.assertEqual(
+                    small[name], large[name],
+                    f"{name} ran {small[name]} queries with {SMALL} rows and {large[name]} with {LARGE}"
+                )
+                if entry["query_budget"] is not None:
+                    self.assertLessEqual(large[name], entry["query_budget"], f"{name} is over its query budget")
+
+@override_settings(BLOB_STORAGE_BACKEND="core.blobs.LocalBlobStorage", UPLOAD_MAX_BYTES=10)
+class LocalBlobUploadTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        override = override_settings(MEDIA_ROOT=media_root.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        get_blob_storage.cache_clear()
+        self.addCleanup(get_blob_storage.cache_clear)
+        self.storage = get_blob_storage()
+        self.target = self.storage.upload_target("waitlist/cv/test.pdf")
+
+    def put(self, body, content_length):
+        request = APIRequestFactory().put(self.target["url"], data=b"", content_type="application/pdf")
+        # Stand-in for a chunked or mislabelled upload: the header and the body disagree
+        request.META["CONTENT_LENGTH"] = str(content_length)
+        request._stream = io.BytesIO(body)
+        return LocalBlobUploadView.as_view()(request)
+
+    def test_upload_within_limit_is_stored(self):
+        response = self.put(b"0123456789", content_length=10)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.storage.read("waitlist/cv/test.pdf"), b"0123456789")
+
+    def test_body_over_limit_is_rejected_whatever_the_header_says(self):
+        response = self.put(b"x" * 100, content_length=4)
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(self.storage.exists("waitlist/cv/test.pdf"))
+
+class NotificationArchiveTests(TestCase):
+    def test_old_read_notifications_move_to_the_archive_in_batches(self):
+        user = User.objects.create_user(email="pro@example.com", password="x")
+        old = timezone.now() - timedelta(days=40)
+        for i in range(5):
+            Notification.objects.create(user=user, title=f"Old {i}", message="Read", notification_type="REMINDER", is_read=True)
+        Notification.objects.create(user=user, title="Unread", message="Old", notification_type="REMINDER")
+        Notification.objects.update(created_at=old)
+        Notification.objects.create(user=user, title="Recent", message="Read", notification_type="REMINDER", is_read=True)
+        expected = dict(Notification.objects.filter(title__startswith="Old").values_list('id', 'created_at'))
+
+        # Two rows a batch: three batches, the last one short
+        self.assertEqual(archive_read_notifications(retention_days=30, batch_size=2, max_batches=10), 5)
+
+        self.assertEqual(dict(NotificationArchive.objects.values_list('id', 'created_at')), expected)
+        self.assertEqual(sorted(Notification.objects.values_list('title', flat=True)), ["Recent", "Unread"])
+        self.assertEqual(archive_read_notifications(retention_days=30, batch_size=2, max_batches=10), 0)
+
+@override_settings(BLOB_STORAGE_BACKEND="core.blobs.LocalBlobStorage", DOCUMENT_REVIEW_MAX_PX=100, DOCUMENT_THUMB_MAX_PX=20)
+class DocumentVariantTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        override = override_settings(MEDIA_ROOT=media_root.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        get_blob_storage.cache_clear()
+        self.addCleanup(get_blob_storage.cache_clear)
+        self.storage = get_blob_storage()
+
+    def test_images_get_variants_and_other_uploads_are_skipped(self):
+        scan = io.BytesIO()
+        Image.new("RGB", (400, 200), "white").save(scan, format="PNG")
+        self.storage.write("facility/cac/1/scan.png", scan.getvalue())
+        self.storage.write("waitlist/cv/1/cv.pdf", b"%PDF-1.4 not an image")
+
+        with self.assertLogs("core.tasks", "WARNING"):
+            written = generate_document_variants([
+                self.storage.url("facility/cac/1/scan.png"), "waitlist/cv/1/cv.pdf", "waitlist/cv/2/missing.png", None
+            ])
+
+        self.assertEqual(sorted(written), [variant_key("facility/cac/1/scan.png", "review"), variant_key("facility/cac/1/scan.png", "thumb")])
+        review = Image.open(io.BytesIO(self.storage.read(variant_key("facility/cac/1/scan.png", "review"))))
+        thumb = Image.open(io.BytesIO(self.storage.read(variant_key("facility/cac/1/scan.png", "thumb"))))
+        self.assertEqual((review.format, review.size), ("JPEG", (100, 50)))
+        self.assertEqual(thumb.size, (20, 10))
+        self.assertFalse(self.storage.exists(variant_key("waitlist/cv/1/cv.pdf", "review")))
+
+@override_settings(METRICS_ENABLED=True, METRICS_SAMPLE_RATE=1.0)
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+        self.user = User.objects.create_user(email="pro@example.com", password="x")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_requests_are_recorded_per_route(self):
+        # CaptureQueriesContext is reset by request_started, so count with a wrapper of our own
+        queries = []
+        with connection.execute_wrapper(lambda execute, sql, *args: queries.append(sql) or execute(sql, *args)):
+            self.assertEqual(self.client.get(reverse("profile")).status_code, 200)
+
+        route = resolve(reverse("profile")).route
+        hist = metrics.histograms[("shifta_db_queries", (route, "GET"))]
+        self.assertEqual((hist.total, hist.sum), (1, len(queries)))
+
+        self.client.get(reverse("profile"))
+        self.assertEqual(dict(metrics.requests), {(route, "GET", "200"): 2})
+        self.assertEqual(hist.total, 2)
+        self.assertEqual(metrics.histograms[("shifta_serialization_duration_seconds", (route, "GET"))].total, 2)
+
+        # The scrape itself is not recorded
+        body = self.client.get("/metrics/").content.decode()
+        self.assertIn(f'shifta_requests_total{{route="{route}",method="GET",status="200"}} 2', body)
+        self.assertIn(f'shifta_db_queries_count{{route="{route}",method="GET"}} 2', body)
+        self.assertEqual(len(metrics.requests), 1)
+
+    @override_settings(METRICS_SAMPLE_RATE=0.0)
+    def test_unsampled_requests_are_not_recorded(self):
+        self.client.get(reverse("profile"))
+        self.assertEqual(metrics.requests, {})
+
+    def test_scrape_is_limited_to_allowed_ips(self):
+        self.assertEqual(self.client.get("/metrics/", REMOTE_ADDR="203.0.113.7").status_code, 403)
@@ -0,0 +1,40 @@
+import uuid
+from django.conf import settings
+from django.core import signing
+from django.utils.text import get_valid_filename
+
+# Where each kind of direct upload lands; matches the upload_to of the model FileFields
+UPLOAD_PURPOSES = {
+    'waitlist_cv': 'waitlist/cvs/',
+    'waitlist_license': 'waitlist/licenses/',
+    'facility_cac': 'facility/cac/',
+    'facility_license': 'facility/licenses/',
+    'facility_other': 'facility/others/',
+}
+
+UPLOAD_TOKEN_SALT = "core.uploads"
+
+def new_upload_key(purpose, filename):
+    if purpose not in UPLOAD_PURPOSES:
+        raise ValueError("Unknown upload purpose.")
+    return f"{UPLOAD_PURPOSES[purpose]}{uuid.uuid4().hex}/{get_valid_filename(filename or 'upload')}"
+
+def sign_upload(key, purpose):
+    """
+    Token handed back to the client with the upload URL. The completion endpoint only accepts
+    keys that come back inside a valid token, so clients can't point records at arbitrary blobs.
+    """
+    return signing.dumps({"k": key, "p": purpose}, salt=UPLOAD_TOKEN_SALT)
+
+def load_upload_token(token, purpose):
+    """
+    Returns the blob key for a completed upload, or raises ValueError.
+    Tokens stay valid a little longer than the upload URL so slow uploads can still complete.
+    """
+    try:
+        payload = signing.loads(token, salt=UPLOAD_TOKEN_SALT, max_age=settings.UPLOAD_URL_TTL_SECONDS * 2)
+    except signing.BadSignature:
+        raise ValueError("Invalid or expired upload token.")
+    if payload["p"] != purpose:
+        raise ValueError("Upload token does not match this document.")
+    return payload["k"]
@@ -15,3 +15,22 @@ def haversine(lat1, lon1, lat2, lon2):
     c = 2 * math.asin(math.sqrt(a)) 
     r = 6371 # Radius of earth in kilometers. Use 3956 for miles
     return c * r
+
+def haversine_expression(lat_field, lng_field, lat, lng):
+    """
+    haversine() as a database expression: km from the point (lat, lng) to the row's
+    lat_field/lng_field (field names or expressions), for annotating and ordering in the query itself.
+    NULL coordinates give NULL.
+    """
+    from django.db.models import F, FloatField, Value
+    from django.db.models.functions import ASin, Cos, Least, Power, Radians, Sin, Sqrt
+
+    if isinstance(lat_field, str):
+        lat_field = F(lat_field)
+    if isinstance(lng_field, str):
+        lng_field = F(lng_field)
+    lat1, lng1 = Radians(lat_field), Radians(lng_field)
+    lat2, lng2 = Value(math.radians(lat), output_field=FloatField()), Value(math.radians(lng), output_field=FloatField())
+    a = Power(Sin((lat2 - lat1) / 2), 2) + Cos(lat1) * Cos(lat2) * Power(Sin((lng2 - lng1) / 2), 2)
+    # Least() guards asin against rounding just past 1 for antipodal points
+    return 2 * 6371 * ASin(Least(Sqrt(a), Value(1.0)))
@@ -4,7 +4,7 @@ from rest_framework.permissions import IsAuthenticated
 from core.router import route
 from core.models import Notification
 
-@route("notifications/", name="notification-list")
+@route("notifications/", name="notification-list", query_budget=1)
 class NotificationListView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -33,3 +33,98 @@ class NotificationReadView(APIView):
             return Response({"status": "marked_read"})
         except Notification.DoesNotExist:
             return Response({"error": "Notification not found"}, status=404)
+
+from django.conf import settings
+from django.core import signing
+from rest_framework.permissions import AllowAny
+from drf_spectacular.utils import extend_schema, inline_serializer
+from rest_framework import serializers
+from core.blobs import get_blob_storage, LocalBlobStorage, UploadTooLarge
+from core.uploads import UPLOAD_PURPOSES, new_upload_key, sign_upload
+
+@extend_schema(
+    request=inline_serializer(
+        name='UploadSignRequest',
+        fields={
+            'purpose': serializers.ChoiceField(choices=list(UPLOAD_PURPOSES)),
+            'filename': serializers.CharField(),
+            'content_type': serializers.CharField(required=False),
+        }
+    ),
+    responses={
+        200: inline_serializer(
+            name='UploadSignResponse',
+            fields={
+                'upload_url': serializers.CharField(),
+                'method': serializers.CharField(),
+                'headers': serializers.DictField(),
+                'upload_token': serializers.CharField(),
+                'expires_in': serializers.IntegerField()
+            }
+        ),
+        400: inline_serializer(name='UploadSignError', fields={'error': serializers.CharField()}),
+        403: inline_serializer(name='UploadSignPermissionError', fields={'error': serializers.CharField()})
+    }
+)
+@route("uploads/sign/", name="upload-sign")
+class UploadSignView(APIView):
+    """
+    Step 1 of a direct upload: issue a short-lived URL the client PUTs the file to.
+    Step 2 is the document's completion endpoint, which takes the returned upload_token.
+    """
+    permission_classes = [AllowAny] # Waitlist signups are anonymous
+
+    def post(self, request):
+        purpose = request.data.get("purpose")
+        filename = request.data.get("filename")
+        content_type = request.data.get("content_type")
+
+        if purpose not in UPLOAD_PURPOSES or not filename:
+            return Response({"error": "A valid purpose and filename are required"}, status=400)
+        if purpose.startswith("facility_") and not (request.user.is_authenticated and request.user.is_facility):
+            return Response({"error": "Only facilities can upload facility documents"}, status=403)
+
+        key = new_upload_key(purpose, filename)
+        target = get_blob_storage().upload_target(key, content_type=content_type, expires_in=settings.UPLOAD_URL_TTL_SECONDS)
+        return Response({
+            "upload_url": request.build_absolute_uri(target["url"]),
+            "method": target["method"],
+            "headers": target["headers"],
+            "upload_token": sign_upload(key, purpose),
+            "expires_in": settings.UPLOAD_URL_TTL_SECONDS
+        })
+
+@extend_schema(exclude=True)
+@route("uploads/local/", name="blob-local-upload")
+class LocalBlobUploadView(APIView):
+    """
+    Receiver for LocalBlobStorage's signed upload URLs (development and tests only).
+    The body is streamed straight to storage instead of going through a parser.
+    """
+    permission_classes = [AllowAny]
+    authentication_classes = []
+    parser_classes = []
+
+    def put(self, request):
+        storage = get_blob_storage()
+        if not isinstance(storage, LocalBlobStorage):
+            return Response({"error": "Direct uploads go to blob storage"}, status=404)
+
+        try:
+            key = storage.key_from_upload_token(request.query_params.get("token", ""), max_age=settings.UPLOAD_URL_TTL_SECONDS)
+        except signing.BadSignature:
+            return Response({"error": "Invalid or expired upload URL"}, status=403)
+
+        # Cheap early reject; the real limit is enforced on the bytes actually read below,
+        # since the header can be missing or wrong
+        if int(request.META.get("CONTENT_LENGTH") or 0) > settings.UPLOAD_MAX_BYTES:
+            return Response({"error": "File too large"}, status=413)
+
+        if request.stream is None:
+            return Response({"error": "Empty upload"}, status=400)
+
+        try:
+            storage.write_stream(key, request.stream, max_bytes=settings.UPLOAD_MAX_BYTES)
+        except UploadTooLarge:
+            return Response({"error": "File too large"}, status=413)
+        return Response(status=201)
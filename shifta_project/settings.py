@@ -4,8 +4,10 @@ Django settings for shifta_project project.
 Generated by 'django-admin startproject' using Django 5.1.4.
 """
 
+from decimal import Decimal
 from pathlib import Path
 import os
+from celery.schedules import crontab
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -60,6 +62,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "core.middleware.QueryMetricsMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -159,6 +162,11 @@ REST_FRAMEWORK = {
         "rest_framework.authentication.SessionAuthentication",
     ),
     "EXCEPTION_HANDLER": "core.exceptions.custom_exception_handler",
+    # Per-IP limits for anonymous account-recovery endpoints (ScopedRateThrottle)
+    "DEFAULT_THROTTLE_RATES": {
+        "password_reset": "5/hour",
+        "password_reset_confirm": "20/hour",
+    },
 }
 
 # Swagger Settings
@@ -179,3 +187,153 @@ CELERY_TIMEZONE = "UTC"
 
 # Custom User Model
 AUTH_USER_MODEL = "accounts.User"
+
+# Periodic tasks (run with `celery -A shifta_project beat`)
+CELERY_BEAT_SCHEDULE = {
+    "archive-read-notifications": {
+        "task": "core.tasks.archive_read_notifications",
+        "schedule": crontab(hour=2, minute=0),
+    },
+    "check-license-expiry": {
+        "task": "accounts.tasks.check_license_expiry",
+        "schedule": crontab(hour=1, minute=0),
+    },
+    "expire-stale-shifts": {
+        "task": "shifts.tasks.expire_stale_shifts",
+        "schedule": crontab(minute="*/15"),
+    },
+    "roll-rating-windows": {
+        "task": "accounts.tasks.roll_rating_windows",
+        "schedule": crontab(hour=0, minute=15),
+    },
+    "complete-finished-shifts": {
+        "task": "shifts.tasks.complete_finished_shifts",
+        "schedule": crontab(minute="5,20,35,50"),
+    },
+    "pay-completed-applications": {
+        "task": "billing.tasks.pay_completed_applications",
+        "schedule": crontab(minute=40),
+    },
+}
+
+# Notification retention
+# Read notifications older than this are moved to NotificationArchive by the nightly job.
+NOTIFICATION_RETENTION_DAYS = 30
+NOTIFICATION_ARCHIVE_BATCH_SIZE = 1000
+NOTIFICATION_ARCHIVE_MAX_BATCHES = 500
+
+# Chat read receipts
+# The consumer coalesces "read up to" acks and writes at most once per window per connection.
+CHAT_READ_RECEIPT_FLUSH_SECONDS = 2
+
+# Channels / presence
+CHANNEL_LAYERS = {
+    "default": {
+        "BACKEND": "channels_redis.core.RedisChannelLayer",
+        "CONFIG": {"hosts": ["redis://localhost:6379/2"]},
+    },
+}
+# Online users are tracked in Redis; a socket that misses heartbeats for this long is considered gone.
+PRESENCE_REDIS_URL = "redis://localhost:6379/1"
+PRESENCE_TTL_SECONDS = 60
+PRESENCE_HEARTBEAT_SECONDS = 20
+
+# Media / blob storage
+MEDIA_URL = "media/"
+MEDIA_ROOT = BASE_DIR / "media"
+# core.blobs.LocalBlobStorage (MEDIA_ROOT) or core.blobs.AzureBlobStorage
+BLOB_STORAGE_BACKEND = os.environ.get("BLOB_STORAGE_BACKEND", "core.blobs.LocalBlobStorage")
+AZURE_STORAGE_CONNECTION_STRING = os.environ.get("AZURE_STORAGE_CONNECTION_STRING")
+AZURE_STORAGE_CONTAINER = os.environ.get("AZURE_STORAGE_CONTAINER", "shifta")
+
+# AI certificate verification
+# accounts.ai_services.FakeVisionBackend (offline) or accounts.ai_services.OpenAIVisionBackend
+AI_VISION_BACKEND = os.environ.get("AI_VISION_BACKEND", "accounts.ai_services.FakeVisionBackend")
+AI_VISION_MODEL = "gpt-4o-mini"
+OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
+AI_VERIFICATION_CONCURRENCY = 8
+AI_VERIFICATION_MAX_RETRIES = 3
+AI_VERIFICATION_RETRY_BACKOFF_SECONDS = 1.0
+# Verification results are cached by SHA-256 of the certificate file
+AI_VERIFICATION_CACHE_TTL_SECONDS = 60 * 60 * 24 * 30
+
+# Cache
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": "redis://localhost:6379/3",
+    }
+}
+
+# Direct-to-blob uploads: clients PUT files to a signed URL instead of posting multipart to the API
+UPLOAD_URL_TTL_SECONDS = 15 * 60
+UPLOAD_MAX_BYTES = 25 * 1024 * 1024
+
+# Outgoing email (password reset and waitlist invite links); console backend unless configured
+EMAIL_BACKEND = os.environ.get("EMAIL_BACKEND", "django.core.mail.backends.console.EmailBackend")
+DEFAULT_FROM_EMAIL = os.environ.get("DEFAULT_FROM_EMAIL", "Shifta <no-reply@localhost>")
+# Frontend page that posts uid/token/password to auth/password-reset/confirm/
+PASSWORD_RESET_URL = os.environ.get("PASSWORD_RESET_URL", "http://localhost:3000/reset-password?uid={uid}&token={token}")
+# Invite and reset links stay valid this long (or until the password is set)
+PASSWORD_RESET_TIMEOUT = 7 * 24 * 3600
+
+# Uploaded document images get a review copy and a thumbnail stored next to the original
+DOCUMENT_REVIEW_MAX_PX = 1600
+DOCUMENT_REVIEW_QUALITY = 80
+DOCUMENT_THUMB_MAX_PX = 320
+DOCUMENT_THUMB_QUALITY = 70
+
+# Per-route query/latency metrics, exposed in Prometheus format at /metrics/
+METRICS_ENABLED = True
+METRICS_SAMPLE_RATE = float(os.environ.get("METRICS_SAMPLE_RATE", "1.0"))
+METRICS_ALLOWED_IPS = os.environ.get("METRICS_ALLOWED_IPS", "127.0.0.1,::1").split(",")
+
+# Shift expiry
+# OPEN shifts that started more than this long ago are closed and their unfilled slots refunded.
+SHIFT_EXPIRY_GRACE_MINUTES = 30
+SHIFT_EXPIRY_BATCH_SIZE = 500
+SHIFT_EXPIRY_MAX_BATCHES = 200
+
+# Shift completion
+# IN_PROGRESS applications this long past the shift's end are completed and queued for payout;
+# CONFIRMED ones that never clocked in become NO_SHOW.
+SHIFT_COMPLETION_GRACE_MINUTES = 60
+SHIFT_COMPLETION_BATCH_SIZE = 500
+SHIFT_COMPLETION_MAX_BATCHES = 200
+# Payouts run this long after clock-out (PRD: 24 hours)
+PAYOUT_DELAY_SECONDS = 24 * 3600
+# Hourly sweep that pays completed applications whose delayed payout never ran
+PAYOUT_SWEEP_BATCH_SIZE = 500
+PAYOUT_SWEEP_MAX_BATCHES = 200
+
+# Applicant ranking (shifts.ranking): weighted sum of 0-1 signals
+APPLICANT_RANKING_WEIGHTS = {"distance": 0.3, "rating": 0.3, "reliability": 0.25, "history": 0.15}
+APPLICANT_RANKING_MAX_KM = 20 # At or beyond this distance the distance signal is 0
+APPLICANT_RANKING_HISTORY_CAP = 5 # Completions at the facility that count as "well known here"
+# Unreviewed professionals start from this many virtual reviews of this rating
+APPLICANT_RATING_PRIOR = 3.0
+APPLICANT_RATING_PRIOR_WEIGHT = 2
+
+# Rating summaries: "recent" average covers this many days (including today)
+RATING_RECENT_WINDOW_DAYS = 90
+
+# Shift feed facets (shifts.facets): rate bands start at these rates, distance rings end at these km
+SHIFT_FACET_RATE_BANDS = [0, 2000, 5000, 10000, 20000]
+SHIFT_FACET_DISTANCE_RINGS_KM = [5, 10, 20, 50]
+# Counts are cached per grid cell of this many degrees (~5.5 km) for this long
+SHIFT_FACET_REGION_DEGREES = 0.05
+SHIFT_FACET_CACHE_SECONDS = 60
+
+# Market rates (shifts.market): rolling averages/percentiles per (role, specialty, country)
+MARKET_RATE_EMA_ALPHA = 0.05 # Weight of each new sample once there are 20
+MARKET_RATE_MIN_SAMPLES = 10 # Fewer than this and the next coarser statistic is used
+MARKET_RATE_FLOOR_RATIO = 0.9 # New shifts must pay at least this share of the rolling average
+MARKET_RATE_DEFAULT_FLOOR = Decimal("2000.00") # No usable statistics yet
+MARKET_RATE_HISTOGRAM_EDGES = [500, 1000, 1500, 2000, 2500, 3000, 4000, 5000, 6500, 8000, 10000, 15000, 20000, 30000, 50000]
+MARKET_RATE_CACHE_SECONDS = 300 # Per-process cache of floors read during validation
+
+# Clock-in/out QR codes (shifts.qr): HMAC-signed, rotate every window; a scan is accepted
+# for its own window and this many before it (scan/clock delay)
+QR_SIGNING_KEY = os.environ.get("QR_SIGNING_KEY", SECRET_KEY)
+QR_TOKEN_WINDOW_SECONDS = 60
+QR_TOKEN_LEEWAY_WINDOWS = 1
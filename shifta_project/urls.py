@@ -22,6 +22,7 @@ from django.contrib import admin
 from django.urls import path, include
 from drf_spectacular.views import SpectacularAPIView, SpectacularRedocView, SpectacularSwaggerView
 from core.router import registry
+from core.metrics import metrics_view
 
 # Force import of views to register them
 import accounts.views
@@ -44,4 +45,7 @@ urlpatterns = [
     path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
     path("api/docs/", SpectacularSwaggerView.as_view(url_name="schema"), name="swagger-ui"),
     path("api/redoc/", SpectacularRedocView.as_view(url_name="schema"), name="redoc"),
+
+    # Prometheus scrape target
+    path("metrics/", metrics_view, name="metrics"),
 ]
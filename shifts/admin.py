@@ -1,12 +1,13 @@
 from django.contrib import admin
-from .models import Shift, ShiftApplication
+from .market import percentile
+from .models import MarketRateStat, Shift, ShiftApplication, ShiftTemplate
 
 @admin.register(Shift)
 class ShiftAdmin(admin.ModelAdmin):
     list_display = ('role', 'facility', 'start_time', 'status', 'quantity_needed', 'quantity_filled', 'created_at')
     search_fields = ('role', 'facility__name')
     list_filter = ('status', 'start_time')
-    raw_id_fields = ('facility',)
+    raw_id_fields = ('facility', 'template')
 
 @admin.register(ShiftApplication)
 class ShiftApplicationAdmin(admin.ModelAdmin):
@@ -14,3 +15,28 @@ class ShiftApplicationAdmin(admin.ModelAdmin):
     search_fields = ('professional__user__email', 'shift__role')
     list_filter = ('status',)
     raw_id_fields = ('professional', 'shift')
+
+@admin.register(ShiftTemplate)
+class ShiftTemplateAdmin(admin.ModelAdmin):
+    list_display = ('name', 'role', 'facility', 'weekdays', 'start_time', 'end_time', 'is_active', 'expanded_until')
+    search_fields = ('name', 'role', 'facility__name')
+    list_filter = ('is_active',)
+    raw_id_fields = ('facility',)
+
+@admin.register(MarketRateStat)
+class MarketRateStatAdmin(admin.ModelAdmin):
+    list_display = ('specialty', 'role', 'country', 'filled_count', 'filled_average', 'p25', 'median', 'p75', 'posted_average', 'updated_at')
+    search_fields = ('role', 'specialty')
+    list_filter = ('country',)
+
+    @admin.display(description='P25')
+    def p25(self, obj):
+        return percentile(obj, 25)
+
+    @admin.display(description='Median')
+    def median(self, obj):
+        return percentile(obj, 50)
+
+    @admin.display(description='P75')
+    def p75(self, obj):
+        return percentile(obj, 75)
@@ -2,6 +2,7 @@ from core.services import BaseService
 from .models import ShiftApplication
 from core.models import Notification
 from django.utils import timezone
+from .transitions import transition
 
 class ApproveShiftStartService(BaseService):
     def __call__(self, user, application_id):
@@ -16,11 +17,7 @@ class ApproveShiftStartService(BaseService):
         if application.shift.facility.user != user:
             raise PermissionError("Not your shift.")
             
-        if application.status != 'ATTENDANCE_PENDING':
-            raise ValueError("Application is not pending attendance approval.")
-            
-        application.status = 'IN_PROGRESS'
-        application.save()
+        transition(application, 'IN_PROGRESS', error="Application is not pending attendance approval.")
         
         # Notify Professional
         Notification.objects.create(
@@ -0,0 +1,223 @@
+import math
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from django.db import connection, connections
+from django.utils import timezone
+from accounts.models import User, Facility, Professional
+from billing.models import Transaction
+from billing.tasks import payout_professional
+from .approval_services import ApproveShiftStartService
+from .qr import issue_token
+from .services import ShiftCreateService, ShiftApplyService, ShiftManageApplicationService, ClockInService, ClockOutService
+from .tasks import notify_matching_professionals
+
+STEPS = ("create", "match", "apply", "confirm", "clock_in", "approve", "clock_out", "payout")
+
+# Everyone stands at the facility, so geofences always pass
+LAT, LNG = 6.4541, 3.3947
+
+def percentile(sorted_values, pct):
+    # Nearest-rank percentile
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+class StepTimer:
+    def __init__(self):
+        self.durations = defaultdict(list)
+        self.errors = defaultdict(lambda: defaultdict(int))
+        self.skipped = defaultdict(int)
+
+    def run(self, step, func, *args, **kwargs):
+        """
+        Time one call of a step. Returns (ok, result); failures are counted, not raised,
+        so one broken transition shows up in the report instead of aborting the run.
+        """
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            self.durations[step].append(time.perf_counter() - start)
+            self.errors[step][f"{type(e).__name__}: {e}"] += 1
+            return False, None
+        self.durations[step].append(time.perf_counter() - start)
+        return True, result
+
+    def skip(self, step, count=1):
+        self.skipped[step] += count
+
+    def merge(self, other):
+        for step, values in other.durations.items():
+            self.durations[step].extend(values)
+        for step, errors in other.errors.items():
+            for message, count in errors.items():
+                self.errors[step][message] += count
+        for step, count in other.skipped.items():
+            self.skipped[step] += count
+
+    def report(self):
+        steps = {}
+        for step in STEPS:
+            values = sorted(self.durations.get(step, []))
+            total = sum(values)
+            error_count = sum(self.errors[step].values()) if step in self.errors else 0
+            steps[step] = {
+                "calls": len(values),
+                "errors": error_count,
+                "skipped": self.skipped.get(step, 0),
+                "error_messages": dict(self.errors[step]) if error_count else {},
+                "throughput_per_s": round(len(values) / total, 2) if total else None,
+                "mean_ms": round(total / len(values) * 1000, 3) if values else None,
+                "p50_ms": _ms(percentile(values, 50)),
+                "p95_ms": _ms(percentile(values, 95)),
+                "p99_ms": _ms(percentile(values, 99)),
+            }
+        return steps
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 3)
+
+class LifecycleBenchmark:
+    """
+    Drives shifts through create -> match -> apply -> confirm -> clock-in -> approve -> clock-out -> payout
+    using the real services and tasks, and reports per-step latency percentiles and throughput.
+
+    Data is created under a per-run email prefix and removed afterwards unless keep_data is set.
+    """
+    def __init__(self, shifts=50, applicants=3, quantity=2, concurrency=1, keep_data=False):
+        self.shift_count = shifts
+        self.applicant_count = max(applicants, quantity)
+        self.quantity = quantity
+        self.concurrency = concurrency
+        self.keep_data = keep_data
+        self.run_id = uuid.uuid4().hex[:8]
+
+    def setup(self):
+        facility_user = User.objects.create_user(email=f"bench-{self.run_id}-facility@example.com", password=None)
+        Facility.objects.create(
+            user=facility_user, name=f"Benchmark Hospital {self.run_id}", address="Benchmark",
+            rc_number=f"BENCH-{self.run_id}", is_verified=True, wallet_balance=Decimal("9999999999.00"),
+            location_lat=LAT, location_lng=LNG
+        )
+        users = User.objects.bulk_create([
+            User(email=f"bench-{self.run_id}-pro{i}@example.com", password="!")
+            for i in range(self.applicant_count * self.concurrency)
+        ])
+        Professional.objects.bulk_create([
+            Professional(
+                user=user, license_number=f"BENCH-{self.run_id}-{i}", specialties=["Benchmark"], is_verified=True,
+                current_location_lat=LAT, current_location_lng=LNG
+            )
+            for i, user in enumerate(users)
+        ])
+        self.facility_user_id = facility_user.id
+        self.professional_user_ids = [user.id for user in users]
+
+    def teardown(self):
+        # Cascades to the facility, professionals, shifts, applications and transactions
+        User.objects.filter(email__startswith=f"bench-{self.run_id}-").delete()
+
+    def run_worker(self, worker, shift_indexes):
+        timer = StepTimer()
+        # Each worker has its own professionals so workers never contend on the same rows
+        pro_ids = self.professional_user_ids[worker * self.applicant_count:(worker + 1) * self.applicant_count]
+        base = timezone.now() + timedelta(days=1)
+        try:
+            for index in shift_indexes:
+                self.run_lifecycle(timer, index, base, pro_ids)
+        finally:
+            if self.concurrency > 1:
+                connection.close()
+        return timer
+
+    def run_lifecycle(self, timer, index, base, pro_ids):
+        # Users are reloaded per lifecycle so cached relations don't flatter the numbers
+        facility_user = User.objects.get(id=self.facility_user_id)
+        start_time = base + timedelta(hours=12 * index)
+
+        ok, shift = timer.run(
+            "create", ShiftCreateService(), user=facility_user, role="Nurse", specialty="Benchmark",
+            quantity_needed=self.quantity, start_time=start_time, end_time=start_time + timedelta(hours=9),
+            rate=Decimal("2500.00")
+        )
+        if not ok:
+            timer.skip("match")
+            return
+        timer.run("match", notify_matching_professionals, shift.id)
+
+        applications = []
+        for pro_id in pro_ids:
+            ok, application = timer.run("apply", ShiftApplyService(), user=User.objects.get(id=pro_id), shift_id=shift.id)
+            if ok:
+                applications.append(application)
+
+        confirmed = []
+        for application in applications[:self.quantity]:
+            ok, _ = timer.run(
+                "confirm", ShiftManageApplicationService(),
+                user=User.objects.get(id=self.facility_user_id), application_id=application.id, action='CONFIRM'
+            )
+            if ok:
+                confirmed.append(application)
+
+        qr_code_data, _ = issue_token(facility_user.facility.id)
+        for application in confirmed:
+            pro_user = User.objects.get(professional__id=application.professional_id)
+            steps = (
+                ("clock_in", ClockInService(), dict(user=pro_user, shift_id=shift.id, lat=LAT, lng=LNG, qr_code_data=qr_code_data)),
+                ("approve", ApproveShiftStartService(), dict(user=User.objects.get(id=self.facility_user_id), application_id=application.id)),
+                ("clock_out", ClockOutService(), dict(user=pro_user, shift_id=shift.id, lat=LAT, lng=LNG, qr_code_data=qr_code_data)),
+                ("payout", payout_professional, dict(application_id=application.id)),
+            )
+            for position, (step, func, kwargs) in enumerate(steps):
+                ok, _ = timer.run(step, func, **kwargs)
+                if not ok:
+                    for later_step, _, _ in steps[position + 1:]:
+                        timer.skip(later_step)
+                    break
+
+    def run(self):
+        self.setup()
+        started = time.perf_counter()
+        try:
+            indexes = list(range(self.shift_count))
+            if self.concurrency == 1:
+                timer = self.run_worker(0, indexes)
+            else:
+                # Keep the main thread's connection out of the workers' way
+                connections.close_all()
+                timer = StepTimer()
+                with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+                    for worker_timer in pool.map(
+                        self.run_worker, range(self.concurrency),
+                        [indexes[worker::self.concurrency] for worker in range(self.concurrency)]
+                    ):
+                        timer.merge(worker_timer)
+            elapsed = time.perf_counter() - started
+
+            payouts = Transaction.objects.filter(
+                shift__facility__user_id=self.facility_user_id, transaction_type='PAYOUT'
+            ).count()
+        finally:
+            if not self.keep_data:
+                self.teardown()
+
+        return {
+            "run_id": self.run_id,
+            "config": {
+                "shifts": self.shift_count,
+                "applicants_per_shift": self.applicant_count,
+                "quantity_per_shift": self.quantity,
+                "concurrency": self.concurrency,
+                "database": connection.vendor,
+            },
+            "elapsed_seconds": round(elapsed, 3),
+            "shifts_per_s": round(self.shift_count / elapsed, 2) if elapsed else None,
+            "payouts": payouts,
+            "steps": timer.report(),
+        }
@@ -1,7 +1,13 @@
 from django.db import transaction
+from django.db.models import F
 from core.services import BaseService
 from .models import Shift, ShiftApplication
-from accounts.models import Review
+from .services import release_shift_slot
+from .commitments import release
+from .transitions import bulk_transition, transition
+from accounts.models import Facility, Professional
+from accounts.ratings import create_review
+from accounts.stats import LATE_CANCELLATION_REVIEW, record_cancellation
 from billing.models import Transaction
 from decimal import Decimal
 from django.utils import timezone
@@ -22,13 +28,20 @@ class FacilityCancelShiftService(BaseService):
         
         if professional_id:
             try:
-                application = ShiftApplication.objects.get(shift=shift, professional__id=professional_id, status='CONFIRMED')
+                application = ShiftApplication.objects.select_related('professional').get(shift=shift, professional__id=professional_id, status='CONFIRMED')
             except ShiftApplication.DoesNotExist:
                 raise ValueError("No confirmed application for this professional.")
                 
             if application.clock_in_time:
                 raise ValueError("Cannot remove professional who has started the shift.")
                 
+            # Claim the cancellation first so a concurrent cancel/clock-in can't also act on it
+            cancelled = bulk_transition(
+                ShiftApplication.objects.filter(id=application.id, clock_in_time__isnull=True), 'CANCELLED'
+            )
+            if not cancelled:
+                raise ValueError("No confirmed application for this professional.")
+                
             # Calculate Amounts
             duration = (shift.end_time - shift.start_time).total_seconds() / 3600
             total_cost = shift.rate * Decimal(duration)
@@ -37,13 +50,9 @@ class FacilityCancelShiftService(BaseService):
             compensation_amount = total_cost * Decimal('0.03') # 3%
             refund_amount = total_cost - penalty_amount # 90%
             
-            # Refund Facility
-            shift.facility.wallet_balance += refund_amount
-            shift.facility.save()
-            
-            # Credit Professional
-            application.professional.wallet_balance += compensation_amount
-            application.professional.save()
+            # Refund Facility / credit Professional (in-database increments, no lost updates)
+            Facility.objects.filter(id=shift.facility_id).update(wallet_balance=F('wallet_balance') + refund_amount)
+            Professional.objects.filter(id=application.professional_id).update(wallet_balance=F('wallet_balance') + compensation_amount)
             
             # Log Transactions
             Transaction.objects.create(
@@ -64,13 +73,9 @@ class FacilityCancelShiftService(BaseService):
                 shift=shift
             )
             
-            # Update Application
-            application.status = 'CANCELLED'
-            application.save()
-            
             # Update Shift
-            shift.quantity_filled -= 1
-            shift.save()
+            release([application.id])
+            release_shift_slot(shift.id)
             
             return {"status": "success", "message": "Professional removed. Refund processed."}
             
@@ -87,10 +92,12 @@ class ProfessionalCancelShiftService(BaseService):
             raise PermissionError("Only professionals can cancel.")
             
         try:
-            application = ShiftApplication.objects.get(shift__id=shift_id, professional=user.professional, status='CONFIRMED')
+            application = ShiftApplication.objects.select_related('shift__facility').get(shift__id=shift_id, professional=user.professional, status='CONFIRMED')
         except ShiftApplication.DoesNotExist:
             raise ValueError("No confirmed application.")
             
+        transition(application, 'CANCELLED', error="No confirmed application.")
+            
         shift = application.shift
         now = timezone.now()
         
@@ -102,22 +109,19 @@ class ProfessionalCancelShiftService(BaseService):
         if now > cutoff_time:
             # Late Cancellation
             # 1-star rating + Auto-review
-            Review.objects.create(
+            create_review(
                 reviewer=shift.facility.user, # System or Facility? User said "automatically". Let's attribute to Facility.
                 target_user=user,
                 rating=1,
-                comment="Automatic review: Late cancellation."
+                comment=LATE_CANCELLATION_REVIEW
             )
             message = "Cancelled with penalty."
         else:
             message = "Cancelled successfully."
+        record_cancellation(application.professional_id, late=now > cutoff_time)
             
-        # Update Application
-        application.status = 'CANCELLED'
-        application.save()
-        
         # Reopen Slot
-        shift.quantity_filled -= 1
-        shift.save()
+        release([application.id])
+        release_shift_slot(shift.id)
         
         return {"status": "success", "message": message}
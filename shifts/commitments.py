@@ -0,0 +1,59 @@
+from django.db import IntegrityError, connection, transaction
+from django.db.models import BooleanField
+from django.db.models.expressions import RawSQL
+from .models import ProfessionalCommitment
+
+# Application statuses that hold a professional's time
+ACTIVE_STATUSES = ['CONFIRMED', 'ATTENDANCE_PENDING', 'IN_PROGRESS']
+
+PERIOD_SQL = "tstzrange(start_time, end_time, '[)')"
+GIST_INDEX_NAME = "shifts_commit_period_gist"
+EXCLUSION_CONSTRAINT_NAME = "shifts_commit_no_overlap"
+
+def clashing_commitments(professional_ids, start_time, end_time, exclude_application_id=None):
+    """
+    Commitments of any of professional_ids that overlap [start_time, end_time).
+    On Postgres this is a GiST-indexed && probe; elsewhere a plain range comparison.
+    """
+    qs = ProfessionalCommitment.objects.filter(professional_id__in=professional_ids)
+    if exclude_application_id is not None:
+        qs = qs.exclude(application_id=exclude_application_id)
+    if connection.vendor == 'postgresql':
+        return qs.filter(RawSQL(
+            f"{PERIOD_SQL} && tstzrange(%s, %s, '[)')", (start_time, end_time), output_field=BooleanField()
+        ))
+    return qs.filter(start_time__lt=end_time, end_time__gt=start_time)
+
+def has_clash(professional_id, start_time, end_time, exclude_application_id=None):
+    return clashing_commitments([professional_id], start_time, end_time, exclude_application_id).exists()
+
+def book(application, shift):
+    """
+    Record the professional's time for a confirmed application.
+    Raises ValueError on a clash; with the exclusion constraint enabled
+    (manage.py shift_booking_constraint --enable) concurrent double bookings are caught by the DB too.
+    """
+    if has_clash(application.professional_id, shift.start_time, shift.end_time, exclude_application_id=application.id):
+        raise ValueError("This professional is already booked for an overlapping shift.")
+    try:
+        with transaction.atomic():
+            ProfessionalCommitment.objects.update_or_create(
+                application_id=application.id,
+                defaults={
+                    "professional_id": application.professional_id,
+                    "start_time": shift.start_time,
+                    "end_time": shift.end_time,
+                }
+            )
+    except IntegrityError:
+        raise ValueError("This professional is already booked for an overlapping shift.")
+
+def release(application_ids):
+    return ProfessionalCommitment.objects.filter(application_id__in=application_ids).delete()
+
+def exclusion_constraint_enabled():
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_constraint WHERE conname = %s", [EXCLUSION_CONSTRAINT_NAME])
+        return cursor.fetchone() is not None
@@ -0,0 +1,56 @@
+from collections import Counter
+from django.conf import settings
+from django.db.models import Case, Count, IntegerField, Value, When
+
+def _bucket(expression, edges):
+    # Index of the half-open [edges[i], edges[i + 1]) interval the value falls in; the last is open-ended
+    whens = [When(**{f"{expression}__lt": edge}, then=Value(i)) for i, edge in enumerate(edges[1:])]
+    return Case(*whens, default=Value(len(edges) - 1), output_field=IntegerField())
+
+def _ring(distance, rings):
+    whens = [When(distance__lte=limit, then=Value(i)) for i, limit in enumerate(rings)]
+    return Case(When(distance__isnull=True, then=Value(None)), *whens, default=Value(len(rings)), output_field=IntegerField())
+
+def facet_counts(queryset, distance=None):
+    """
+    Counts per specialty, role, rate band and (when distance is given) distance ring for the
+    shifts in queryset, from ONE grouped query: rows are grouped by all four dimensions at once
+    and each facet is summed out of the combinations in Python. The number of combinations is
+    bounded by the vocabularies, not by the number of shifts.
+    """
+    bands = settings.SHIFT_FACET_RATE_BANDS
+    rings = settings.SHIFT_FACET_DISTANCE_RINGS_KM
+
+    dimensions = {'rate_band': _bucket('rate', bands)}
+    if distance is not None:
+        dimensions['ring'] = _ring('distance', rings)
+        queryset = queryset.annotate(distance=distance)
+    rows = queryset.order_by().values('specialty', 'role', **dimensions).annotate(count=Count('id'))
+
+    specialty, role, band_counts, ring_counts = Counter(), Counter(), Counter(), Counter()
+    for row in rows:
+        specialty[row['specialty']] += row['count']
+        role[row['role']] += row['count']
+        band_counts[row['rate_band']] += row['count']
+        if distance is not None and row['ring'] is not None:
+            ring_counts[row['ring']] += row['count']
+
+    def ranked(counter):
+        # Most common first, ties alphabetical so cached and fresh results agree
+        return [{"value": value, "count": count} for value, count in sorted(counter.items(), key=lambda item: (-item[1], item[0]))]
+
+    facets = {
+        "specialty": ranked(specialty),
+        "role": ranked(role),
+        "rate_band": [
+            {"min": edge, "max": bands[i + 1] if i + 1 < len(bands) else None, "count": band_counts[i]}
+            for i, edge in enumerate(bands)
+        ],
+        "distance_km": None,
+    }
+    if distance is not None:
+        facets["distance_km"] = [
+            {"min": rings[i - 1] if i else 0, "max": rings[i] if i < len(rings) else None, "count": ring_counts[i]}
+            for i in range(len(rings) + 1)
+        ]
+    return facets
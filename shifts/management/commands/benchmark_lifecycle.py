@@ -0,0 +1,65 @@
+import contextlib
+import json
+import os
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from shifts.benchmark import LifecycleBenchmark
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the shift lifecycle (create -> match -> apply -> confirm -> clock-in -> approve -> "
+        "clock-out -> payout) against the configured database and print per-step latency as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--shifts", type=int, default=50)
+        parser.add_argument("--applicants", type=int, default=3, help="Professionals applying to each shift")
+        parser.add_argument("--quantity", type=int, default=2, help="Professionals confirmed per shift")
+        parser.add_argument("--concurrency", type=int, default=1, help="Parallel workers, each with its own DB connection")
+        parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+        parser.add_argument("--real-redis", action="store_true", help="Use the configured Redis instead of fakeredis")
+        parser.add_argument("--keep-data", action="store_true", help="Leave the generated rows in place")
+
+    def handle(self, *args, **options):
+        if options["shifts"] < 1 or options["concurrency"] < 1 or options["quantity"] < 1:
+            raise CommandError("--shifts, --quantity and --concurrency must be at least 1")
+
+        from communications.presence import presence
+        if not options["real_redis"]:
+            try:
+                import fakeredis
+            except ImportError:
+                raise CommandError("fakeredis is not installed; install it or pass --real-redis")
+            presence._client = fakeredis.FakeRedis(decode_responses=True)
+
+        # Tasks are queued in memory and never executed by a worker; the benchmark runs
+        # matching and payout itself so each is timed as its own step
+        from shifta_project.celery import app
+        app.conf.update(CELERY_BROKER_URL="memory://", CELERY_TASK_ALWAYS_EAGER=False, CELERY_TASK_IGNORE_RESULT=True)
+
+        benchmark = LifecycleBenchmark(
+            shifts=options["shifts"],
+            applicants=options["applicants"],
+            quantity=options["quantity"],
+            concurrency=options["concurrency"],
+            keep_data=options["keep_data"],
+        )
+        overrides = {
+            "CACHES": {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+            "CHANNEL_LAYERS": {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}},
+        } if not options["real_redis"] else {}
+
+        # Mock push/payout prints would drown the report
+        with override_settings(**overrides), open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            report = benchmark.run()
+        report["config"]["redis"] = "real" if options["real_redis"] else "fake"
+        report["config"]["debug"] = settings.DEBUG
+
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(output + "\n")
+            self.stderr.write(f"Wrote {options['output']}")
+        else:
+            self.stdout.write(output)
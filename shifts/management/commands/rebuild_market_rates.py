@@ -0,0 +1,16 @@
+import time
+from django.core.management.base import BaseCommand
+from shifts.market import rebuild_market_rates
+
+class Command(BaseCommand):
+    help = "Backfill (or repair) the rolling market-rate statistics from the Shift table."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=5000, help="Rows per read/insert batch")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        stats = rebuild_market_rates(chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {stats['stats']} market rate statistics in {time.monotonic() - started:.1f}s"
+        ))
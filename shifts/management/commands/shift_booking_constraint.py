@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection, transaction
+from shifts.commitments import EXCLUSION_CONSTRAINT_NAME, PERIOD_SQL, exclusion_constraint_enabled
+from shifts.models import ProfessionalCommitment
+
+class Command(BaseCommand):
+    help = (
+        "Enable or disable the Postgres exclusion constraint that makes the database reject "
+        "overlapping commitments for the same professional (double booking)."
+    )
+
+    def add_arguments(self, parser):
+        group = parser.add_mutually_exclusive_group()
+        group.add_argument("--enable", action="store_true")
+        group.add_argument("--disable", action="store_true")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError("Exclusion constraints need Postgres.")
+
+        table = ProfessionalCommitment._meta.db_table
+        if options["enable"]:
+            if exclusion_constraint_enabled():
+                self.stdout.write("Already enabled.")
+                return
+            try:
+                with transaction.atomic(), connection.cursor() as cursor:
+                    # uuid equality inside a GiST constraint needs btree_gist
+                    cursor.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+                    cursor.execute(
+                        f"ALTER TABLE {table} ADD CONSTRAINT {EXCLUSION_CONSTRAINT_NAME} "
+                        f"EXCLUDE USING gist (professional_id WITH =, {PERIOD_SQL} WITH &&)"
+                    )
+            except DatabaseError as e:
+                raise CommandError(
+                    f"Could not add the constraint ({str(e).strip()}). It needs the btree_gist extension "
+                    "and no existing overlapping commitments."
+                )
+            self.stdout.write(self.style.SUCCESS("Double-booking exclusion constraint enabled."))
+        elif options["disable"]:
+            with connection.cursor() as cursor:
+                cursor.execute(f"ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {EXCLUSION_CONSTRAINT_NAME}")
+            self.stdout.write(self.style.SUCCESS("Double-booking exclusion constraint disabled."))
+        else:
+            self.stdout.write("enabled" if exclusion_constraint_enabled() else "disabled")
@@ -0,0 +1,167 @@
+import bisect
+import time
+from collections import defaultdict
+from decimal import Decimal
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import MarketRateStat, Shift
+
+# Rolling market rates per (role, specialty, country). Writers fold samples into
+# MarketRateStat off the request path (shifts.tasks.record_market_rates); shift
+# validation reads the floor through a small per-process cache, so the write path
+# never aggregates over Shift.
+
+CENTS = Decimal('0.01')
+
+def market_key(role, specialty, country):
+    return (role or '').strip().lower(), (specialty or '').strip().lower(), country
+
+def _bucket(rate):
+    return bisect.bisect_right(settings.MARKET_RATE_HISTOGRAM_EDGES, rate)
+
+def fold(stat, kind, rates):
+    """
+    Fold rates (in arrival order) into stat's rolling figures for kind ('posted' or 'filled').
+    Plain mean until there are 1/alpha samples, exponential moving average after that.
+    """
+    alpha = settings.MARKET_RATE_EMA_ALPHA
+    count = getattr(stat, f'{kind}_count')
+    average = getattr(stat, f'{kind}_average')
+    average = float(average) if average is not None else 0.0
+    histogram = list(stat.filled_histogram) or [0.0] * (len(settings.MARKET_RATE_HISTOGRAM_EDGES) + 1)
+
+    for rate in rates:
+        rate = float(rate)
+        count += 1
+        weight = max(alpha, 1 / count)
+        average += weight * (rate - average)
+        if kind == 'filled':
+            # Same weighting as the average, so the histogram stays a distribution summing to 1
+            histogram = [w * (1 - weight) for w in histogram]
+            histogram[_bucket(rate)] += weight
+
+    setattr(stat, f'{kind}_count', count)
+    setattr(stat, f'{kind}_average', Decimal(average).quantize(CENTS))
+    if kind == 'filled':
+        stat.filled_histogram = histogram
+    return stat
+
+def percentile(stat, p):
+    """
+    p-th percentile (0-100) of recent filled rates, interpolated within the histogram bucket.
+    None without filled samples.
+    """
+    histogram = stat.filled_histogram
+    total = sum(histogram)
+    if not total:
+        return None
+    edges = settings.MARKET_RATE_HISTOGRAM_EDGES
+    target = total * p / 100
+    seen = 0.0
+    for i, weight in enumerate(histogram):
+        if weight and seen + weight >= target:
+            # The open-ended buckets are treated as one bucket width past the outer edges
+            low = edges[i - 1] if i > 0 else 0
+            high = edges[i] if i < len(edges) else edges[-1] * 2 - edges[-2]
+            return Decimal(low + (high - low) * (target - seen) / weight).quantize(CENTS)
+        seen += weight
+    return Decimal(edges[-1]).quantize(CENTS)
+
+def record_samples(samples):
+    """
+    samples: (role, specialty, country, kind, rate) in arrival order. Each one counts towards
+    its own role and towards the all-roles row of its specialty. Rows are locked in a fixed
+    order, so concurrent batches queue rather than deadlock or lose updates.
+    """
+    grouped = defaultdict(lambda: defaultdict(list))
+    for role, specialty, country, kind, rate in samples:
+        role, specialty, country = market_key(role, specialty, country)
+        for key in {(role, specialty, country), ('', specialty, country)}:
+            grouped[key][kind].append(rate)
+    if not grouped:
+        return 0
+
+    with transaction.atomic():
+        MarketRateStat.objects.bulk_create(
+            [MarketRateStat(role=role, specialty=specialty, country=country) for role, specialty, country in grouped],
+            ignore_conflicts=True
+        )
+        keys = Q()
+        for role, specialty, country in grouped:
+            keys |= Q(role=role, specialty=specialty, country=country)
+        stats = list(MarketRateStat.objects.select_for_update().filter(keys).order_by('id'))
+        now = timezone.now()
+        for stat in stats:
+            for kind, rates in grouped[(stat.role, stat.specialty, stat.country)].items():
+                fold(stat, kind, rates)
+            stat.updated_at = now
+        MarketRateStat.objects.bulk_update(
+            stats, ['posted_count', 'posted_average', 'filled_count', 'filled_average', 'filled_histogram', 'updated_at']
+        )
+    return len(stats)
+
+def rebuild_market_rates(chunk_size=5000):
+    """
+    Recompute every MarketRateStat from the Shift table, oldest first: one posted sample per
+    shift and one filled sample per filled slot. For the initial backfill and repairs.
+    """
+    stats = {}
+    rows = (
+        Shift.objects.order_by('created_at')
+        .values_list('role', 'specialty', 'facility__country', 'rate', 'quantity_filled')
+        .iterator(chunk_size=chunk_size)
+    )
+    for role, specialty, country, rate, quantity_filled in rows:
+        role, specialty, country = market_key(role, specialty, country)
+        for key in {(role, specialty, country), ('', specialty, country)}:
+            stat = stats.get(key)
+            if stat is None:
+                stat = stats[key] = MarketRateStat(role=key[0], specialty=key[1], country=key[2])
+            fold(stat, 'posted', [rate])
+            if quantity_filled:
+                fold(stat, 'filled', [rate] * quantity_filled)
+
+    with transaction.atomic():
+        MarketRateStat.objects.all().delete()
+        MarketRateStat.objects.bulk_create(stats.values(), batch_size=chunk_size)
+    clear_rate_cache()
+    return {"stats": len(stats)}
+
+_floor_cache = {}
+
+def clear_rate_cache():
+    _floor_cache.clear()
+
+def _floor_from(stat):
+    if stat is None:
+        return None
+    if stat.filled_count >= settings.MARKET_RATE_MIN_SAMPLES:
+        average = stat.filled_average
+    elif stat.posted_count >= settings.MARKET_RATE_MIN_SAMPLES:
+        average = stat.posted_average
+    else:
+        return None
+    return (average * Decimal(str(settings.MARKET_RATE_FLOOR_RATIO))).quantize(CENTS)
+
+def rate_floor(role, specialty, country):
+    """
+    Lowest hourly rate a new shift may offer: MARKET_RATE_FLOOR_RATIO of the rolling average
+    filled rate (posted rate while few have filled), falling back to the specialty across all
+    roles, then to MARKET_RATE_DEFAULT_FLOOR. The ratio is below 1 so the floor can drift down
+    as well as up; a floor at the average of rates it already admitted would only ever rise.
+    At most one indexed lookup per key every MARKET_RATE_CACHE_SECONDS per process.
+    """
+    key = market_key(role, specialty, country)
+    now = time.monotonic()
+    cached = _floor_cache.get(key)
+    if cached is not None and cached[0] > now:
+        return cached[1]
+
+    stats = {stat.role: stat for stat in MarketRateStat.objects.filter(
+        specialty=key[1], country=key[2], role__in=[key[0], '']
+    )}
+    floor = _floor_from(stats.get(key[0])) or _floor_from(stats.get('')) or settings.MARKET_RATE_DEFAULT_FLOOR
+    _floor_cache[key] = (now + settings.MARKET_RATE_CACHE_SECONDS, floor)
+    return floor
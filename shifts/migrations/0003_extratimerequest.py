@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:26
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shifts', '0002_shift_address_shift_is_negotiable_shift_latitude_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExtraTimeRequest',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('hours', models.DecimalField(decimal_places=2, max_digits=4)),
+                ('reason', models.TextField()),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('APPROVED', 'Approved'), ('REJECTED', 'Rejected')], default='PENDING', max_length=20)),
+                ('approved_at', models.DateTimeField(blank=True, null=True)),
+                ('approved_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='approved_extra_time', to=settings.AUTH_USER_MODEL)),
+                ('requested_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='extra_time_requests', to=settings.AUTH_USER_MODEL)),
+                ('shift_application', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='extra_time_requests', to='shifts.shiftapplication')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
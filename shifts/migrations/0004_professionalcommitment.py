@@ -0,0 +1,71 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:31
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models, transaction
+
+PERIOD_SQL = "tstzrange(start_time, end_time, '[)')"
+INDEX_NAME = "shifts_commit_period_gist"
+ACTIVE_STATUSES = ['CONFIRMED', 'ATTENDANCE_PENDING', 'IN_PROGRESS']
+
+def create_period_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        # With btree_gist the professional goes in the same GiST index (and the exclusion
+        # constraint becomes possible); without it, index the period alone
+        try:
+            with transaction.atomic(using=schema_editor.connection.alias):
+                cursor.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+            columns = f"professional_id, {PERIOD_SQL}"
+        except Exception:
+            columns = PERIOD_SQL
+        cursor.execute(f"CREATE INDEX {INDEX_NAME} ON shifts_professionalcommitment USING gist ({columns})")
+
+def drop_period_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f"DROP INDEX IF EXISTS {INDEX_NAME}")
+
+def backfill_commitments(apps, schema_editor):
+    ShiftApplication = apps.get_model('shifts', 'ShiftApplication')
+    ProfessionalCommitment = apps.get_model('shifts', 'ProfessionalCommitment')
+    batch = []
+    rows = ShiftApplication.objects.filter(status__in=ACTIVE_STATUSES).values_list(
+        'id', 'professional_id', 'shift__start_time', 'shift__end_time'
+    )
+    for application_id, professional_id, start_time, end_time in rows.iterator(chunk_size=5000):
+        batch.append(ProfessionalCommitment(
+            application_id=application_id, professional_id=professional_id, start_time=start_time, end_time=end_time
+        ))
+        if len(batch) >= 5000:
+            ProfessionalCommitment.objects.bulk_create(batch)
+            batch = []
+    ProfessionalCommitment.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_waitlist_conversion'),
+        ('shifts', '0003_extratimerequest'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfessionalCommitment',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('start_time', models.DateTimeField()),
+                ('end_time', models.DateTimeField()),
+                ('application', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='commitment', to='shifts.shiftapplication')),
+                ('professional', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='commitments', to='accounts.professional')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['professional', 'start_time'], name='shifts_commit_pro_start_idx')],
+            },
+        ),
+        migrations.RunPython(create_period_index, drop_period_index),
+        migrations.RunPython(backfill_commitments, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:34
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_waitlist_conversion'),
+        ('shifts', '0004_professionalcommitment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShiftTemplate',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('name', models.CharField(blank=True, max_length=255)),
+                ('role', models.CharField(max_length=100)),
+                ('specialty', models.CharField(max_length=100)),
+                ('quantity_needed', models.IntegerField(default=1)),
+                ('rate', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('is_negotiable', models.BooleanField(default=False)),
+                ('min_rate', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('address', models.TextField(blank=True, null=True)),
+                ('latitude', models.FloatField(blank=True, null=True)),
+                ('longitude', models.FloatField(blank=True, null=True)),
+                ('weekdays', models.JSONField(default=list)),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('is_active', models.BooleanField(default=True)),
+                ('expanded_until', models.DateField(blank=True, null=True)),
+                ('facility', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shift_templates', to='accounts.facility')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.AddField(
+            model_name='shift',
+            name='template',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='shifts', to='shifts.shifttemplate'),
+        ),
+    ]
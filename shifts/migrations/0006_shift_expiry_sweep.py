@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_waitlist_conversion'),
+        ('shifts', '0005_shifttemplate'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='shift',
+            name='status',
+            field=models.CharField(choices=[('OPEN', 'Open'), ('FILLED', 'Filled'), ('CLOSED', 'Closed'), ('EXPIRED', 'Expired'), ('COMPLETED', 'Completed'), ('CANCELLED', 'Cancelled')], default='OPEN', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='shift',
+            index=models.Index(fields=['status', 'start_time'], name='shifts_shift_status_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shift',
+            index=models.Index(condition=models.Q(('status', 'OPEN')), fields=['-created_at'], name='shifts_shift_open_created_idx'),
+        ),
+    ]
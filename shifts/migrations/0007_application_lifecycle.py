@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_waitlist_conversion'),
+        ('shifts', '0006_shift_expiry_sweep'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shiftapplication',
+            name='paid_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='shiftapplication',
+            index=models.Index(condition=models.Q(('status', 'IN_PROGRESS')), fields=['shift'], name='shifts_app_in_progress_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shiftapplication',
+            index=models.Index(condition=models.Q(('paid_at__isnull', True), ('status', 'COMPLETED')), fields=['clock_out_time'], name='shifts_app_unpaid_idx'),
+        ),
+    ]
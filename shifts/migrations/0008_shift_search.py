@@ -0,0 +1,79 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:47
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+INDEX_NAME = "shifts_shift_search_gin"
+
+# Weights: what the shift is (A), where (facility name B, address C)
+SHIFT_VECTOR_SQL = """
+    setweight(to_tsvector('english', coalesce({row}.role, '') || ' ' || coalesce({row}.specialty, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce({facility_name}, '')), 'B') ||
+    setweight(to_tsvector('english', coalesce({row}.address, '')), 'C')
+"""
+
+CREATE_SQL = f"""
+CREATE FUNCTION shifts_shift_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector := {SHIFT_VECTOR_SQL.format(
+        row="NEW", facility_name="(SELECT name FROM accounts_facility WHERE id = NEW.facility_id)"
+    )};
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER shifts_shift_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF role, specialty, address, facility_id ON shifts_shift
+    FOR EACH ROW EXECUTE FUNCTION shifts_shift_search_vector_update();
+
+CREATE FUNCTION shifts_facility_rename_search_update() RETURNS trigger AS $$
+BEGIN
+    -- Touching role fires the shift trigger, which picks up the new name
+    UPDATE shifts_shift SET role = role WHERE facility_id = NEW.id;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER shifts_facility_rename_search_trigger
+    AFTER UPDATE OF name ON accounts_facility
+    FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name)
+    EXECUTE FUNCTION shifts_facility_rename_search_update();
+
+UPDATE shifts_shift AS s SET search_vector = {SHIFT_VECTOR_SQL.format(row="s", facility_name="f.name")}
+    FROM accounts_facility AS f WHERE f.id = s.facility_id;
+
+CREATE INDEX {INDEX_NAME} ON shifts_shift USING gin (search_vector);
+"""
+
+DROP_SQL = f"""
+DROP INDEX IF EXISTS {INDEX_NAME};
+DROP TRIGGER IF EXISTS shifts_facility_rename_search_trigger ON accounts_facility;
+DROP FUNCTION IF EXISTS shifts_facility_rename_search_update();
+DROP TRIGGER IF EXISTS shifts_shift_search_vector_trigger ON shifts_shift;
+DROP FUNCTION IF EXISTS shifts_shift_search_vector_update();
+"""
+
+def create_search_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREATE_SQL)
+
+def drop_search_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_rating_summary'),
+        ('shifts', '0007_application_lifecycle'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shift',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_triggers, drop_search_triggers),
+    ]
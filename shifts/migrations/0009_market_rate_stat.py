@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:54
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shifts', '0008_shift_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarketRateStat',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('role', models.CharField(blank=True, max_length=100)),
+                ('specialty', models.CharField(max_length=100)),
+                ('country', models.CharField(max_length=100)),
+                ('posted_count', models.PositiveIntegerField(default=0)),
+                ('posted_average', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('filled_count', models.PositiveIntegerField(default=0)),
+                ('filled_average', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('filled_histogram', models.JSONField(default=list)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('specialty', 'country', 'role'), name='shifts_market_rate_key')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shifts', '0009_market_rate_stat'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='shiftapplication',
+            name='status',
+            field=models.CharField(choices=[('PENDING', 'Pending'), ('CONFIRMED', 'Confirmed'), ('REJECTED', 'Rejected'), ('ATTENDANCE_PENDING', 'Attendance Pending'), ('IN_PROGRESS', 'In Progress'), ('COMPLETED', 'Completed'), ('CANCELLED', 'Cancelled'), ('NO_SHOW', 'No Show')], default='PENDING', max_length=20),
+        ),
+    ]
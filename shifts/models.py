@@ -1,3 +1,4 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 from accounts.models import Facility, Professional
@@ -8,6 +9,8 @@ class Shift(BaseModel):
     STATUS_CHOICES = (
         ('OPEN', 'Open'),
         ('FILLED', 'Filled'),
+        ('CLOSED', 'Closed'), # Started while partially filled; no longer recruiting
+        ('EXPIRED', 'Expired'), # Started with nobody confirmed
         ('COMPLETED', 'Completed'),
         ('CANCELLED', 'Cancelled'),
     )
@@ -30,10 +33,51 @@ class Shift(BaseModel):
     longitude = models.FloatField(null=True, blank=True)
     
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='OPEN')
+    # Set when the shift was generated from a recurring template
+    template = models.ForeignKey('ShiftTemplate', on_delete=models.SET_NULL, null=True, blank=True, related_name='shifts')
+    # Keyword search over role, specialty, facility name and address. Maintained by database
+    # triggers on Postgres (also for bulk inserts and facility renames) and GIN-indexed; see shifts.search
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Expiry sweep: OPEN shifts by start time
+            models.Index(fields=['status', 'start_time'], name='shifts_shift_status_start_idx'),
+            # Open-shift listings, newest first; only the (small) OPEN set is indexed
+            models.Index(fields=['-created_at'], condition=models.Q(status='OPEN'), name='shifts_shift_open_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.role} at {self.facility.name}"
 
+class ShiftTemplate(BaseModel):
+    """
+    A recurring rota entry: the same shift on the given weekdays at the same times.
+    Expanded over a horizon into concrete Shift rows by ShiftTemplateExpandService.
+    """
+    facility = models.ForeignKey(Facility, on_delete=models.CASCADE, related_name='shift_templates')
+    name = models.CharField(max_length=255, blank=True) # e.g. "ICU night cover"
+    role = models.CharField(max_length=100)
+    specialty = models.CharField(max_length=100)
+    quantity_needed = models.IntegerField(default=1)
+    rate = models.DecimalField(max_digits=10, decimal_places=2) # Hourly rate per professional
+    is_negotiable = models.BooleanField(default=False)
+    min_rate = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    address = models.TextField(null=True, blank=True)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+
+    # Recurrence: weekdays as ints (Monday=0 ... Sunday=6); an end_time at or before
+    # start_time means the shift runs overnight into the next day
+    weekdays = models.JSONField(default=list)
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    is_active = models.BooleanField(default=True)
+    expanded_until = models.DateField(null=True, blank=True) # Last date shifts were generated for
+
+    def __str__(self):
+        return f"{self.name or self.role} ({self.facility.name})"
+
 class SavedAddress(BaseModel):
     facility = models.ForeignKey(Facility, on_delete=models.CASCADE, related_name='saved_addresses')
     name = models.CharField(max_length=255) # e.g., "Main Branch", "Annex"
@@ -53,6 +97,7 @@ class ShiftApplication(BaseModel):
         ('IN_PROGRESS', 'In Progress'), # Clocked In & Approved
         ('COMPLETED', 'Completed'), # Clocked Out
         ('CANCELLED', 'Cancelled'),
+        ('NO_SHOW', 'No Show'), # Confirmed, never clocked in before the shift ended
     )
     
     shift = models.ForeignKey(Shift, on_delete=models.CASCADE, related_name='applications')
@@ -61,9 +106,16 @@ class ShiftApplication(BaseModel):
     # applied_at is replaced by created_at from BaseModel
     clock_in_time = models.DateTimeField(null=True, blank=True)
     clock_out_time = models.DateTimeField(null=True, blank=True)
+    paid_at = models.DateTimeField(null=True, blank=True) # Set once by the payout task; makes payouts idempotent
     
     class Meta:
         unique_together = ('shift', 'professional')
+        indexes = [
+            # Completion scheduler: the (small) set of started applications
+            models.Index(fields=['shift'], condition=models.Q(status='IN_PROGRESS'), name='shifts_app_in_progress_idx'),
+            # Payout: completed but not yet paid
+            models.Index(fields=['clock_out_time'], condition=models.Q(status='COMPLETED', paid_at__isnull=True), name='shifts_app_unpaid_idx'),
+        ]
         
     def __str__(self):
         return f"{self.professional} applied for {self.shift}"
@@ -85,3 +137,50 @@ class ExtraTimeRequest(BaseModel):
     
     def __str__(self):
         return f"Extra Time: {self.hours}hrs for {self.shift_application}"
+
+class ProfessionalCommitment(BaseModel):
+    """
+    One row per application that currently books a professional's time
+    (CONFIRMED / ATTENDANCE_PENDING / IN_PROGRESS), with the shift's time copied in.
+    Clash checks probe this table instead of joining applications to shifts.
+
+    On Postgres the migration adds a GiST index on tstzrange(start_time, end_time), so
+    overlap probes are a single indexed && lookup; see shifts.commitments.
+    """
+    professional = models.ForeignKey(Professional, on_delete=models.CASCADE, related_name='commitments')
+    application = models.OneToOneField(ShiftApplication, on_delete=models.CASCADE, related_name='commitment')
+    start_time = models.DateTimeField()
+    end_time = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['professional', 'start_time'], name='shifts_commit_pro_start_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.professional} booked {self.start_time} - {self.end_time}"
+
+class MarketRateStat(BaseModel):
+    """
+    Rolling hourly-rate statistics for one (role, specialty, country); role '' is the row for
+    every role in the specialty. Folded in sample by sample (see shifts.market), so reads
+    never aggregate over Shift. Averages are exponential moving averages and the histogram
+    counts decay at the same rate, so percentiles follow the recent market too.
+    """
+    role = models.CharField(max_length=100, blank=True) # Lower-cased; '' = all roles
+    specialty = models.CharField(max_length=100) # Lower-cased
+    country = models.CharField(max_length=100)
+    posted_count = models.PositiveIntegerField(default=0)
+    posted_average = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    filled_count = models.PositiveIntegerField(default=0)
+    filled_average = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    # Decayed weight of filled rates per settings.MARKET_RATE_HISTOGRAM_EDGES bucket
+    filled_histogram = models.JSONField(default=list)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['specialty', 'country', 'role'], name='shifts_market_rate_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.role or '*'}/{self.specialty} ({self.country})"
@@ -0,0 +1,59 @@
+import time
+import uuid
+from django.conf import settings
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+# Rotating clock-in/out QR payloads: "<facility>.<window>.<shift or ->.<signature>".
+# The facility screen fetches a fresh one every window; a scan is checked here (HMAC and
+# clock only) before the services touch the database, so junk and stale codes cost nothing.
+
+SALT = "shifts.qr"
+VERSION = "q1"
+
+def _window(now=None):
+    return int((time.time() if now is None else now) // settings.QR_TOKEN_WINDOW_SECONDS)
+
+def _sign(body):
+    return salted_hmac(SALT, body, secret=settings.QR_SIGNING_KEY, algorithm="sha256").hexdigest()[:32]
+
+def issue_token(facility_id, shift_id=None, now=None):
+    """
+    Token for facility_id (optionally only for shift_id) valid for the current window.
+    Returns (token, seconds until the next window).
+    """
+    window = _window(now)
+    shift_part = uuid.UUID(str(shift_id)).hex if shift_id else "-"
+    body = f"{VERSION}.{uuid.UUID(str(facility_id)).hex}.{window}.{shift_part}"
+    next_window_at = (window + 1) * settings.QR_TOKEN_WINDOW_SECONDS
+    return f"{body}.{_sign(body)}", max(0, int(next_window_at - (time.time() if now is None else now)))
+
+def verify_token(token, now=None):
+    """
+    Returns (facility_id, shift_id or None) for a genuine token from the current window or
+    the QR_TOKEN_LEEWAY_WINDOWS before it. Raises ValueError otherwise. No database access.
+    """
+    try:
+        version, facility_hex, window, shift_part, signature = (token or "").split(".")
+        body = f"{version}.{facility_hex}.{window}.{shift_part}"
+        if version != VERSION or not constant_time_compare(signature, _sign(body)):
+            raise ValueError
+        facility_id = uuid.UUID(facility_hex)
+        shift_id = uuid.UUID(shift_part) if shift_part != "-" else None
+        window = int(window)
+    except (ValueError, TypeError, AttributeError):
+        raise ValueError("Invalid Facility QR Code.")
+
+    current = _window(now)
+    if not current - settings.QR_TOKEN_LEEWAY_WINDOWS <= window <= current:
+        raise ValueError("This QR code has expired. Scan the code currently shown at the facility.")
+    return facility_id, shift_id
+
+def check_scan(token, shift_id, now=None):
+    """
+    verify_token plus the shift binding: a shift-specific code only works for that shift.
+    Returns the facility id the application's shift must belong to.
+    """
+    facility_id, token_shift_id = verify_token(token, now=now)
+    if token_shift_id is not None and token_shift_id != uuid.UUID(str(shift_id)):
+        raise ValueError("This QR code is for a different shift.")
+    return facility_id
@@ -0,0 +1,58 @@
+from django.conf import settings
+from django.db.models import F, FloatField, OuterRef, Subquery, Value
+from django.db.models.functions import Cast, Coalesce, Least
+from accounts.models import ProfessionalFacilityStats
+from core.utils import haversine_expression
+
+def _float(expression):
+    # Postgres divides integers as integers
+    return Cast(expression, FloatField())
+
+def rank_applications(queryset, shift):
+    """
+    Annotate applications with the ranking signals and order best first, all in one query:
+    distance to the shift, smoothed average rating, reliability (late cancellations against
+    completions) and completions at this facility. Counters come from the precomputed
+    ProfessionalStats / ProfessionalFacilityStats / RatingSummary rows, so cost doesn't grow with history.
+    """
+    weights = settings.APPLICANT_RANKING_WEIGHTS
+    max_km = float(settings.APPLICANT_RANKING_MAX_KM)
+    prior, prior_weight = settings.APPLICANT_RATING_PRIOR, settings.APPLICANT_RATING_PRIOR_WEIGHT
+
+    # Use shift location if available, otherwise facility location
+    target_lat = shift.latitude if shift.latitude is not None else shift.facility.location_lat
+    target_lng = shift.longitude if shift.longitude is not None else shift.facility.location_lng
+    if target_lat is not None and target_lng is not None:
+        distance = haversine_expression(
+            'professional__current_location_lat', 'professional__current_location_lng', target_lat, target_lng
+        )
+    else:
+        distance = Value(None, output_field=FloatField())
+
+    completed = Coalesce(F('professional__stats__completed_count'), 0)
+    late = Coalesce(F('professional__stats__late_cancellation_count'), 0)
+    rating_sum = Coalesce(F('professional__user__rating_summary__total'), 0)
+    rating_count = Coalesce(F('professional__user__rating_summary__count'), 0)
+
+    qs = queryset.select_related('professional__user__rating_summary', 'professional__stats').annotate(
+        distance_km=distance,
+        avg_rating=(_float(rating_sum) + prior * prior_weight) / (_float(rating_count) + prior_weight),
+        reliability=(_float(completed) + 1.0) / (_float(completed + late) + 1.0),
+        facility_completions=Coalesce(
+            Subquery(
+                ProfessionalFacilityStats.objects
+                .filter(professional_id=OuterRef('professional_id'), facility_id=shift.facility_id)
+                .values('completed_count')[:1]
+            ),
+            0
+        ),
+    )
+    return qs.annotate(
+        score=(
+            weights["distance"] * Coalesce(1.0 - Least(F('distance_km'), Value(max_km)) / max_km, 0.0)
+            + weights["rating"] * F('avg_rating') / 5.0
+            + weights["reliability"] * F('reliability')
+            + weights["history"] * _float(Least(F('facility_completions'), Value(settings.APPLICANT_RANKING_HISTORY_CAP)))
+            / settings.APPLICANT_RANKING_HISTORY_CAP
+        )
+    ).order_by('-score', 'created_at')
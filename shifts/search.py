@@ -0,0 +1,70 @@
+import base64
+import json
+import math
+import uuid
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.functions import Cast
+from django.utils.dateparse import parse_datetime
+
+# Must match the config the search_vector trigger was built with (migration 0008)
+SEARCH_CONFIG = 'english'
+
+def apply_search(queryset, text):
+    """
+    Filter shifts by keyword and annotate a rank. On Postgres this is a GIN lookup on the
+    trigger-maintained search_vector; elsewhere (tests on sqlite) it falls back to icontains
+    with a flat rank. Blank text leaves the queryset unfiltered with rank 0.
+    """
+    text = (text or '').strip()
+    if not text:
+        return queryset.annotate(rank=Value(0.0, output_field=FloatField()))
+
+    if connection.vendor == 'postgresql':
+        query = SearchQuery(text, search_type='websearch', config=SEARCH_CONFIG)
+        # ts_rank returns real; widen it so the cursor round-trips exactly
+        return queryset.filter(search_vector=query).annotate(
+            rank=Cast(SearchRank(F('search_vector'), query), FloatField())
+        )
+
+    condition = Q()
+    for word in text.split():
+        condition &= (
+            Q(role__icontains=word) | Q(specialty__icontains=word)
+            | Q(address__icontains=word) | Q(facility__name__icontains=word)
+        )
+    return queryset.filter(condition).annotate(rank=Value(0.0, output_field=FloatField()))
+
+def encode_cursor(shift):
+    payload = [shift.rank, shift.created_at.isoformat(), str(shift.id)]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode('ascii')
+
+def decode_cursor(cursor):
+    try:
+        rank, created_at, shift_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        rank = float(rank)
+        created_at = parse_datetime(created_at)
+        if created_at is None or not math.isfinite(rank):
+            raise ValueError
+        # Checked here, or a bad id only fails later as a ValidationError inside the query
+        return rank, created_at, uuid.UUID(str(shift_id))
+    except (ValueError, TypeError, json.JSONDecodeError):
+        raise ValueError("Invalid cursor.")
+
+def paginate(queryset, cursor=None, limit=20):
+    """
+    Keyset pagination over (rank, created_at, id), best first. Returns (page, next_cursor);
+    next_cursor is None on the last page. Each page is one indexed query however deep it is.
+    """
+    queryset = queryset.order_by('-rank', '-created_at', '-id')
+    if cursor:
+        rank, created_at, shift_id = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(rank__lt=rank)
+            | Q(rank=rank, created_at__lt=created_at)
+            | Q(rank=rank, created_at=created_at, id__lt=shift_id)
+        )
+    page = list(queryset[:limit + 1])
+    next_cursor = encode_cursor(page[limit - 1]) if len(page) > limit else None
+    return page[:limit], next_cursor
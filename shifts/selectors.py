@@ -1,9 +1,24 @@
+import logging
+import math
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Prefetch
+from django.db.models.functions import Coalesce
+from core.utils import haversine_expression
 from core.services import BaseSelector
-from .models import Shift, ShiftApplication
+from .models import Shift, ShiftApplication, ShiftTemplate
+from .ranking import rank_applications
+from .search import apply_search, paginate
+from .facets import facet_counts
+
+logger = logging.getLogger(__name__)
+
+# Applications that put a professional on the rota
+STAFFED_STATUSES = ['CONFIRMED', 'IN_PROGRESS', 'ATTENDANCE_PENDING', 'COMPLETED']
 
 class ShiftSelector(BaseSelector):
     def list_open_shifts(self, specialty=None):
-        qs = Shift.objects.filter(status='OPEN')
+        qs = Shift.objects.filter(status='OPEN').select_related('facility')
         if specialty:
             qs = qs.filter(specialty=specialty)
         return qs
@@ -11,9 +26,12 @@ class ShiftSelector(BaseSelector):
     def list_facility_shifts(self, facility):
         return Shift.objects.filter(facility=facility).order_by('-created_at')
 
+    def list_facility_templates(self, facility):
+        return ShiftTemplate.objects.filter(facility=facility).order_by('-created_at')
+
     def list_professional_shifts(self, professional):
         # Filter by status OPEN
-        qs = Shift.objects.filter(status='OPEN')
+        qs = Shift.objects.filter(status='OPEN').select_related('facility')
         
         # Filter by specialty (if professional has specialties)
         # Assuming professional.specialties is a list of strings
@@ -30,14 +48,74 @@ class ShiftSelector(BaseSelector):
         
         return qs.order_by('-created_at')
 
+    def search_shifts(self, text=None, status='OPEN', lat=None, lng=None, radius_km=None, cursor=None, limit=20):
+        """
+        Keyword search (see shifts.search), optionally narrowed by status and by distance from
+        (lat, lng). Returns (page, next_cursor); shifts in the page carry rank and distance_km.
+        """
+        # The vector is only needed inside the query
+        qs = Shift.objects.select_related('facility').defer('search_vector')
+        if status:
+            qs = qs.filter(status=status)
+        qs = apply_search(qs, text)
+        if lat is not None and lng is not None:
+            qs = qs.annotate(distance_km=self.distance_from(lat, lng))
+            if radius_km is not None:
+                qs = qs.filter(distance_km__lte=radius_km)
+        return paginate(qs, cursor=cursor, limit=limit)
+
+    def shift_facets(self, status='OPEN', lat=None, lng=None):
+        """
+        Facet counts for the shift feed (see shifts.facets). Callers in the same region share one
+        cached result for SHIFT_FACET_CACHE_SECONDS: the point is snapped to a grid cell and rings
+        are measured from the cell's centre, so they're accurate to about half a cell.
+        """
+        if lat is not None and lng is not None:
+            cell = settings.SHIFT_FACET_REGION_DEGREES
+            lat = (math.floor(lat / cell) + 0.5) * cell
+            lng = (math.floor(lng / cell) + 0.5) * cell
+            region = f"{lat:.4f}:{lng:.4f}"
+        else:
+            region = "all"
+        cache_key = f"shiftfacets:{status or 'any'}:{region}"
+
+        try:
+            cached = cache.get(cache_key)
+        except Exception:
+            logger.warning("Facet cache unavailable", exc_info=True)
+            cached = None
+        if cached is not None:
+            return cached
+
+        qs = Shift.objects.all()
+        if status:
+            qs = qs.filter(status=status)
+        facets = facet_counts(qs, distance=self.distance_from(lat, lng) if region != "all" else None)
+        try:
+            cache.set(cache_key, facets, settings.SHIFT_FACET_CACHE_SECONDS)
+        except Exception:
+            logger.warning("Facet cache unavailable", exc_info=True)
+        return facets
+
+    def distance_from(self, lat, lng):
+        # Use shift location if available, otherwise facility location
+        return haversine_expression(
+            Coalesce('latitude', 'facility__location_lat'), Coalesce('longitude', 'facility__location_lng'), lat, lng
+        )
+
+    def get_own_shift_facility_id(self, shift_id, user):
+        # Ownership check and the facility id in one query; None if it isn't the user's shift
+        return Shift.objects.filter(id=shift_id, facility__user=user).values_list('facility_id', flat=True).first()
+
     def get_shift(self, shift_id):
         return Shift.objects.get(id=shift_id)
         
     def list_applications(self, shift_id, user):
-        shift = Shift.objects.get(id=shift_id)
-        if shift.facility.user != user:
+        shift = Shift.objects.select_related('facility').get(id=shift_id)
+        if shift.facility.user_id != user.id:
             raise PermissionError("Not your shift.")
-        return ShiftApplication.objects.filter(shift=shift)
+        # Best candidates first; see shifts.ranking
+        return rank_applications(ShiftApplication.objects.filter(shift=shift), shift)
 
     def list_calendar_shifts(self, facility, date_start, date_end, applicant_id=None):
         qs = Shift.objects.filter(facility=facility)
@@ -52,7 +130,12 @@ class ShiftSelector(BaseSelector):
             # Filter shifts where specific applicant has applied and is confirmed
             qs = qs.filter(
                 applications__professional__id=applicant_id, 
-                applications__status__in=['CONFIRMED', 'IN_PROGRESS', 'ATTENDANCE_PENDING', 'COMPLETED']
+                applications__status__in=STAFFED_STATUSES
             )
             
-        return qs.distinct()
+        # One extra query for everyone on the rota, rather than one per shift
+        return qs.distinct().prefetch_related(Prefetch(
+            'applications',
+            queryset=ShiftApplication.objects.filter(status__in=STAFFED_STATUSES).select_related('professional__user'),
+            to_attr='staffed_applications'
+        ))
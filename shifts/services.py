@@ -1,9 +1,46 @@
+from datetime import datetime, timedelta
+from django.conf import settings
 from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+from accounts.models import Facility
+from accounts.stats import record_completions
 from core.services import BaseService
-from .models import Shift, ShiftApplication
-from .tasks import notify_matching_professionals
+from .models import Shift, ShiftApplication, ShiftTemplate
+from .commitments import book, has_clash, release
+from .transitions import transition
+from .tasks import notify_matching_professionals, notify_matching_professionals_batch, record_market_rates
+from .market import rate_floor
+from .qr import check_scan
 from decimal import Decimal
 
+# How far ahead a template may be expanded in one go
+MAX_TEMPLATE_HORIZON_DAYS = 90
+
+def shift_cost(rate, start_time, end_time, quantity_needed):
+    # Rate is per hour per professional (as per user requirement: "put the amount for one hour... price will be 30*8")
+    # So total_cost = rate * duration * quantity
+    duration = (end_time - start_time).total_seconds() / 3600
+    return rate * Decimal(duration) * quantity_needed
+
+def check_market_rate(facility, role, specialty, rate):
+    # Rate Validation (User requirement: "price cannot be set below average"); see shifts.market
+    floor = rate_floor(role, specialty, facility.country)
+    if rate < floor:
+        raise ValueError(f"Rate cannot be below the market rate floor of {floor} for {role} ({specialty})")
+
+def debit_facility_wallet(facility, amount):
+    """
+    Take amount from the facility wallet in one conditional UPDATE (no row lock, no lost updates).
+    Raises ValueError if the balance can't cover it.
+    """
+    debited = Facility.objects.filter(id=facility.id, wallet_balance__gte=amount).update(
+        wallet_balance=F('wallet_balance') - amount
+    )
+    if not debited:
+        facility.refresh_from_db(fields=['wallet_balance'])
+        raise ValueError(f"Insufficient wallet balance. Required: {amount}, Available: {facility.wallet_balance}")
+
 class ShiftCreateService(BaseService):
     @transaction.atomic
     def __call__(self, user, role, specialty, quantity_needed, start_time, end_time, rate, is_negotiable=False, min_rate=None):
@@ -16,28 +53,15 @@ class ShiftCreateService(BaseService):
             raise PermissionError("Facility must be verified to create shifts. Please upload your documents.")
         
         # Cost Calculation & Deduction (Phase 2)
-        # Duration in hours
-        duration = (end_time - start_time).total_seconds() / 3600
-        if duration <= 0:
+        if end_time <= start_time:
              raise ValueError("End time must be after start time.")
              
-        # Rate Validation (User requirement: "price cannot be set below average")
-        # For now, let's assume a hardcoded average or use min_rate if provided
-        AVERAGE_RATE = Decimal('2000.00') # Placeholder average rate
-        if rate < AVERAGE_RATE:
-            raise ValueError(f"Rate cannot be below the average rate of {AVERAGE_RATE}")
+        check_market_rate(facility, role, specialty, rate)
 
-        # Rate is per hour per professional (as per user requirement: "put the amount for one hour... price will be 30*8")
-        # So total_cost = rate * duration * quantity
-        total_cost = rate *  Decimal(duration) * quantity_needed
-        
-        # Check Wallet Balance
-        if facility.wallet_balance < total_cost:
-             raise ValueError(f"Insufficient wallet balance. Required: {total_cost}, Available: {facility.wallet_balance}")
+        total_cost = shift_cost(rate, start_time, end_time, quantity_needed)
         
-        # Deduct from Wallet
-        facility.wallet_balance -= total_cost
-        facility.save()
+        # Check & deduct in one statement
+        debit_facility_wallet(facility, total_cost)
         
         shift = Shift.objects.create(
             facility=facility,
@@ -52,11 +76,148 @@ class ShiftCreateService(BaseService):
             min_rate=min_rate
         )
         
-        # Trigger notification task
-        notify_matching_professionals.delay(shift.id)
+        # Trigger notification task once the shift is visible to the worker
+        transaction.on_commit(lambda: notify_matching_professionals.delay(str(shift.id)))
+        transaction.on_commit(lambda: record_market_rates.delay([str(shift.id)], 'posted'))
         
         return shift
 
+def template_occurrences(template, start_date, end_date):
+    """
+    (start, end) datetimes for every occurrence of template between start_date and end_date inclusive.
+    """
+    tz = timezone.get_current_timezone()
+    overnight = template.end_time <= template.start_time
+    day = start_date
+    while day <= end_date:
+        if day.weekday() in template.weekdays:
+            start = timezone.make_aware(datetime.combine(day, template.start_time), tz)
+            end_day = day + timedelta(days=1) if overnight else day
+            yield start, timezone.make_aware(datetime.combine(end_day, template.end_time), tz)
+        day += timedelta(days=1)
+
+class ShiftTemplateCreateService(BaseService):
+    @transaction.atomic
+    def __call__(self, user, role, specialty, weekdays, start_time, end_time, rate, quantity_needed=1, name="",
+                 is_negotiable=False, min_rate=None, address=None, latitude=None, longitude=None, horizon_days=None):
+        if not user.is_facility:
+            raise PermissionError("Only facilities can create shift templates.")
+            
+        facility = user.facility
+        if not facility.is_verified:
+            raise PermissionError("Facility must be verified to create shifts. Please upload your documents.")
+            
+        if not weekdays or any(day not in range(7) for day in weekdays):
+            raise ValueError("Weekdays must be a list of days from 0 (Monday) to 6 (Sunday).")
+        if start_time == end_time:
+            raise ValueError("End time must be different from start time.")
+        # Every generated shift is debited at quantity_needed slots; zero or less would debit nothing or credit the wallet
+        if quantity_needed < 1:
+            raise ValueError("Quantity needed must be at least 1.")
+        check_market_rate(facility, role, specialty, rate)
+            
+        template = ShiftTemplate.objects.create(
+            facility=facility,
+            name=name,
+            role=role,
+            specialty=specialty,
+            quantity_needed=quantity_needed,
+            rate=rate,
+            is_negotiable=is_negotiable,
+            min_rate=min_rate,
+            address=address,
+            latitude=latitude,
+            longitude=longitude,
+            weekdays=sorted(set(weekdays)),
+            start_time=start_time,
+            end_time=end_time
+        )
+        
+        shifts = []
+        if horizon_days:
+            _, shifts = ShiftTemplateExpandService()(user=user, template_id=template.id, days=horizon_days, template=template)
+        return template, shifts
+
+class ShiftTemplateExpandService(BaseService):
+    """
+    Generate the template's shifts for the next `days` days (continuing after whatever was
+    generated before) and return (template, new_shifts). The whole batch is one wallet debit, one bulk INSERT and one matching job.
+    """
+    @transaction.atomic
+    def __call__(self, user, template_id, days=28, template=None):
+        if not user.is_facility:
+            raise PermissionError("Only facilities can post shifts.")
+            
+        facility = user.facility
+        if not facility.is_verified:
+            raise PermissionError("Facility must be verified to create shifts. Please upload your documents.")
+            
+        if template is None:
+            # Row lock: a concurrent expand of the same template waits here, then sees our
+            # expanded_until and shifts, so the same days are never inserted or paid for twice
+            try:
+                template = ShiftTemplate.objects.select_for_update().get(id=template_id, facility=facility)
+            except ShiftTemplate.DoesNotExist:
+                raise ValueError("Template not found.")
+        if template.facility_id != facility.id:
+            raise PermissionError("Not your template.")
+        if not template.is_active:
+            raise ValueError("Template is not active.")
+        if not 1 <= days <= MAX_TEMPLATE_HORIZON_DAYS:
+            raise ValueError(f"Days must be between 1 and {MAX_TEMPLATE_HORIZON_DAYS}.")
+            
+        now = timezone.now()
+        today = timezone.localdate(now)
+        start_date = today
+        if template.expanded_until and template.expanded_until >= start_date:
+            start_date = template.expanded_until + timedelta(days=1)
+        end_date = today + timedelta(days=days - 1)
+        if start_date > end_date:
+            return template, []
+            
+        occurrences = [(start, end) for start, end in template_occurrences(template, start_date, end_date) if start > now]
+        # Belt and braces: never post a second shift from this template at the same start time
+        if occurrences:
+            existing = set(Shift.objects.filter(
+                template=template, start_time__gte=occurrences[0][0], start_time__lte=occurrences[-1][0]
+            ).values_list('start_time', flat=True))
+            occurrences = [(start, end) for start, end in occurrences if start not in existing]
+            
+        shifts = [
+            Shift(
+                facility=facility,
+                template=template,
+                role=template.role,
+                specialty=template.specialty,
+                quantity_needed=template.quantity_needed,
+                quantity_filled=0,
+                start_time=start,
+                end_time=end,
+                rate=template.rate,
+                is_negotiable=template.is_negotiable,
+                min_rate=template.min_rate,
+                address=template.address,
+                latitude=template.latitude,
+                longitude=template.longitude
+            )
+            for start, end in occurrences
+        ]
+        
+        if shifts:
+            total_cost = sum(shift_cost(s.rate, s.start_time, s.end_time, s.quantity_needed) for s in shifts)
+            debit_facility_wallet(facility, total_cost)
+            Shift.objects.bulk_create(shifts)
+            
+        ShiftTemplate.objects.filter(id=template.id).update(expanded_until=end_date, updated_at=now)
+        template.expanded_until = end_date
+        
+        if shifts:
+            shift_ids = [str(s.id) for s in shifts]
+            transaction.on_commit(lambda: notify_matching_professionals_batch.delay(shift_ids))
+            transaction.on_commit(lambda: record_market_rates.delay(shift_ids, 'posted'))
+            
+        return template, shifts
+
 class ShiftApplyService(BaseService):
     def __call__(self, user, shift_id):
         if not user.is_professional:
@@ -70,15 +231,8 @@ class ShiftApplyService(BaseService):
             raise ValueError("Already applied.")
             
         # Clash Prevention (Phase 4)
-        # Check for any CONFIRMED or IN_PROGRESS application that overlaps with this shift's time
-        clashing_apps = ShiftApplication.objects.filter(
-            professional=user.professional,
-            status__in=['CONFIRMED', 'IN_PROGRESS', 'ATTENDANCE_PENDING'],
-            shift__start_time__lt=shift.end_time,
-            shift__end_time__gt=shift.start_time
-        )
-        
-        if clashing_apps.exists():
+        # Any booked (confirmed/started) time that overlaps this shift; one indexed range probe
+        if has_clash(user.professional.id, shift.start_time, shift.end_time):
             raise ValueError("This shift clashes with another shift you have accepted.")
             
         application = ShiftApplication.objects.create(
@@ -93,47 +247,68 @@ class ShiftManageApplicationService(BaseService):
         if not user.is_facility:
             raise PermissionError("Only facilities can manage applications.")
             
-        application = ShiftApplication.objects.get(id=application_id)
-        if application.shift.facility != user.facility:
+        application = ShiftApplication.objects.select_related('shift').get(id=application_id)
+        if application.shift.facility_id != user.facility.id:
             raise PermissionError("Not your shift.")
             
+        # Both actions are conditional UPDATEs, so two managers acting on the same shift at once
+        # can't double-confirm an application or push quantity_filled past quantity_needed
         if action == 'CONFIRM':
-            if application.shift.quantity_filled >= application.shift.quantity_needed:
-                raise ValueError("Shift is already filled.")
+            transition(application, 'CONFIRMED', error="Application is not pending.")
+            book(application, application.shift)
                 
-            application.status = 'CONFIRMED'
-            application.save()
-            
-            # Update shift filled count
-            shift = application.shift
-            shift.quantity_filled += 1
-            if shift.quantity_filled >= shift.quantity_needed:
-                shift.status = 'FILLED'
-            shift.save()
+            # Take a slot and flip to FILLED in the same statement (the CASE sees the pre-update count)
+            filled = Shift.objects.filter(
+                id=application.shift_id, status='OPEN', quantity_filled__lt=F('quantity_needed')
+            ).update(
+                quantity_filled=F('quantity_filled') + 1,
+                status=Case(
+                    When(quantity_filled__gte=F('quantity_needed') - 1, then=Value('FILLED')),
+                    default=F('status')
+                ),
+                updated_at=timezone.now()
+            )
+            if not filled:
+                # Rolls back the claim above
+                raise ValueError("Shift is already filled.")
+            transaction.on_commit(lambda: record_market_rates.delay([str(application.shift_id)], 'filled'))
             
         elif action == 'REJECT':
-            application.status = 'REJECTED'
-            application.save()
+            transition(application, 'REJECTED', error="Application is not pending.")
             
         return application
 
+def release_shift_slot(shift_id):
+    """
+    Give back one filled slot, reopening the shift if it was FILLED. Set-based, like the confirm path.
+    """
+    return Shift.objects.filter(id=shift_id, quantity_filled__gt=0).update(
+        quantity_filled=F('quantity_filled') - 1,
+        status=Case(When(status='FILLED', then=Value('OPEN')), default=F('status')),
+        updated_at=timezone.now()
+    )
+
 class ClockInService(BaseService):
     def __call__(self, user, shift_id, lat, lng, qr_code_data):
-        # 1. Verify User is Professional
+        # 1. Verify the QR code (signature and time window only, no queries)
+        # PRD: "unique QR/Barcode for my facility"; see shifts.qr
+        facility_id = check_scan(qr_code_data, shift_id)
+
+        # 2. Verify User is Professional
         if not user.is_professional:
             raise PermissionError("Only professionals can clock in.")
             
-        # 2. Get Application
+        # 3. Get Application, with its shift and facility in the same query
         try:
-            application = ShiftApplication.objects.get(shift__id=shift_id, professional=user.professional, status='CONFIRMED')
+            application = ShiftApplication.objects.select_related('shift__facility').defer('shift__search_vector').get(
+                shift__id=shift_id, professional__user=user, status='CONFIRMED'
+            )
         except ShiftApplication.DoesNotExist:
             raise ValueError("No confirmed application for this shift.")
-            
-        # 3. Verify QR Code (Simple check: qr_code_data == facility_id or similar)
-        # PRD: "unique QR/Barcode for my facility"
-        if qr_code_data != str(application.shift.facility.id):
-             raise ValueError("Invalid Facility QR Code.")
-          # 4. Geo-fencing Check
+        if application.shift.facility_id != facility_id:
+            raise ValueError("Invalid Facility QR Code.")
+
+        # 4. Geo-fencing Check
         # Use Shift location if available, else Facility location
         from core.utils import haversine
         facility = application.shift.facility # Get facility once
@@ -149,16 +324,13 @@ class ClockInService(BaseService):
             if distance > 2.0: # 2km radius as per Phase 3 requirement
                 raise ValueError(f"You are too far from the shift location. Distance: {distance:.2f}km")
         
-        # 5. Clock In
-        from django.utils import timezone
-        application.clock_in_time = timezone.now()
-        application.status = 'ATTENDANCE_PENDING' # Phase 3: Needs approval
-        application.save()
+        # 5. Clock In (Phase 3: Needs approval)
+        transition(application, 'ATTENDANCE_PENDING', error="No confirmed application for this shift.", clock_in_time=timezone.now())
         
         # 6. Notify Facility
         from core.models import Notification
         Notification.objects.create(
-            user=facility.user,
+            user_id=facility.user_id,
             title="Shift Start Request",
             message=f"{user.email} has started the shift '{application.shift.role}'. Please approve.",
             notification_type="SHIFT_START",
@@ -170,15 +342,19 @@ class ClockInService(BaseService):
 class ClockOutService(BaseService):
     def __call__(self, user, shift_id, lat, lng, qr_code_data):
         # Similar checks...
+        facility_id = check_scan(qr_code_data, shift_id)
         if not user.is_professional:
             raise PermissionError("Only professionals can clock out.")
             
+        # Clock-out ends a started (approved) shift
         try:
-            application = ShiftApplication.objects.get(shift__id=shift_id, professional=user.professional, status='CONFIRMED')
+            application = ShiftApplication.objects.select_related('shift__facility').defer('shift__search_vector').get(
+                shift__id=shift_id, professional__user=user, status='IN_PROGRESS'
+            )
         except ShiftApplication.DoesNotExist:
-            raise ValueError("No confirmed application for this shift.")
+            raise ValueError("No shift in progress to clock out of.")
             
-        if qr_code_data != str(application.shift.facility.id):
+        if application.shift.facility_id != facility_id:
              raise ValueError("Invalid Facility QR Code.")
              
         from core.utils import haversine
@@ -186,19 +362,20 @@ class ClockOutService(BaseService):
         if distance > 0.5:
             raise ValueError("You must be at the facility to clock out.")
             
-        from django.utils import timezone
-        application.clock_out_time = timezone.now()
-        application.save()
+        with transaction.atomic():
+            transition(application, 'COMPLETED', error="No shift in progress to clock out of.", clock_out_time=timezone.now())
+            # Time is no longer booked
+            release([application.id])
+            record_completions([(application.professional_id, application.shift.facility_id)])
         
         # Trigger Payment (Epic 6)
         from billing.tasks import payout_professional
         # Schedule for 24 hours later as per PRD
-        payout_professional.apply_async((application.id,), countdown=24*3600)
+        payout_professional.apply_async((str(application.id),), countdown=settings.PAYOUT_DELAY_SECONDS)
         
         return application
 
 from .models import ExtraTimeRequest
-from django.utils import timezone
 
 class ExtraTimeService(BaseService):
     def request_extra_time(self, user, shift_application_id, hours, reason):
@@ -1,57 +1,309 @@
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
 from celery import shared_task
-from accounts.models import Professional
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, Count, DecimalField, Exists, F, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from accounts.models import Facility, Professional
+from accounts.stats import record_completions
+from core.models import Notification
 from core.utils import haversine
-from .models import Shift
+from .models import Shift, ShiftApplication
+from .commitments import ACTIVE_STATUSES, clashing_commitments, release
+from .transitions import bulk_transition
+
+# Marks the one reminder complete_finished_shifts sends per unapproved clock-in
+ATTENDANCE_OVERDUE_REASON = "attendance_approval_overdue"
 
 @shared_task
 def notify_matching_professionals(shift_id):
-    try:
-        shift = Shift.objects.get(id=shift_id)
-    except Shift.DoesNotExist:
-        return
+    notify_matching_professionals_batch([shift_id])
 
-    facility_lat = shift.facility.location_lat
-    facility_lng = shift.facility.location_lng
-    
-    if not facility_lat or not facility_lng:
+@shared_task
+def notify_matching_professionals_batch(shift_ids):
+    """
+    Match a batch of new shifts (e.g. a template expansion) in one job: candidates are loaded
+    once per specialty, clashes come from one overlap probe over the whole batch window, and
+    each professional gets a single notification however many of the shifts they match.
+    """
+    shifts = list(Shift.objects.filter(id__in=shift_ids).select_related('facility').order_by('start_time'))
+
+    # Use shift location if available, otherwise facility location
+    located = []
+    for shift in shifts:
+        target_lat = shift.latitude if shift.latitude is not None else shift.facility.location_lat
+        target_lng = shift.longitude if shift.longitude is not None else shift.facility.location_lng
+        if target_lat is not None and target_lng is not None:
+            located.append((shift, target_lat, target_lng))
+    if not located:
         return
 
     # Find professionals with matching specialty
     # In a real app with PostGIS, we'd do this in the DB query.
     # Here we fetch matching specialties and filter by distance and availability in Python.
-    
-    # Initial filter for professionals based on specialty and verification
-    potential_candidates = Professional.objects.filter(
-        specialties__contains=[shift.specialty], # Assuming JSON list
-        is_verified=True,
-        current_location_lat__isnull=False,
-        current_location_lng__isnull=False
+    candidates = {}
+    for specialty in {shift.specialty for shift, _, _ in located}:
+        pros = Professional.objects.filter(
+            is_verified=True,
+            current_location_lat__isnull=False,
+            current_location_lng__isnull=False
+        ).select_related('user')
+        if connection.vendor == 'postgresql':
+            candidates[specialty] = list(pros.filter(specialties__contains=[specialty])) # Assuming JSON list
+        else:
+            # SQLite has no JSON containment lookup; check the list in Python
+            candidates[specialty] = [pro for pro in pros if specialty in (pro.specialties or [])]
+
+    # Location Check (20km radius)
+    nearby = {}
+    for shift, target_lat, target_lng in located:
+        nearby[shift.id] = [
+            pro for pro in candidates[shift.specialty]
+            if haversine(pro.current_location_lat, pro.current_location_lng, target_lat, target_lng) <= 20
+        ]
+
+    # Clash Check: one overlap probe covering every shift in the batch, then per-shift checks in memory
+    pro_ids = {pro.id for pros in nearby.values() for pro in pros}
+    booked = defaultdict(list)
+    if pro_ids:
+        window = clashing_commitments(
+            pro_ids, min(s.start_time for s, _, _ in located), max(s.end_time for s, _, _ in located)
+        ).values_list('professional_id', 'start_time', 'end_time')
+        for professional_id, start_time, end_time in window:
+            booked[professional_id].append((start_time, end_time))
+
+    matched = defaultdict(list)
+    users = {}
+    for shift, _, _ in located:
+        for pro in nearby[shift.id]:
+            if any(start < shift.end_time and end > shift.start_time for start, end in booked[pro.id]):
+                continue
+            matched[pro.id].append(shift)
+            users[pro.id] = pro.user_id
+
+    # Professionals who matched the same shifts share one payload
+    groups = defaultdict(list)
+    for pro_id, pro_shifts in matched.items():
+        groups[tuple(s.id for s in pro_shifts)].append(users[pro_id])
+
+    # Send notifications: live sockets get it in-app, everyone else gets a push
+    from communications.services import NotificationService
+    service = NotificationService()
+    by_id = {shift.id: shift for shift, _, _ in located}
+    for group_shift_ids, user_ids in groups.items():
+        first = by_id[group_shift_ids[0]]
+        if len(group_shift_ids) == 1:
+            message = f"New shift available at {first.facility.name}"
+        else:
+            message = f"{len(group_shift_ids)} new shifts available at {first.facility.name}"
+        service.fan_out(
+            user_ids,
+            {
+                "title": "New shift available",
+                "message": message,
+                "notification_type": "SHIFT_POSTED",
+                "related_object_id": str(first.id)
+            }
+        )
+
+@shared_task
+def record_market_rates(shift_ids, kind):
+    """
+    Fold the rates of newly posted (kind='posted') or newly filled (kind='filled', one id per
+    confirmed slot, repeats allowed) shifts into the market-rate statistics.
+    """
+    from .market import record_samples
+
+    rows = {
+        str(shift_id): (role, specialty, country, rate) for shift_id, role, specialty, country, rate in
+        Shift.objects.filter(id__in=set(shift_ids)).values_list('id', 'role', 'specialty', 'facility__country', 'rate')
+    }
+    samples = []
+    for shift_id in shift_ids:
+        if str(shift_id) in rows:
+            role, specialty, country, rate = rows[str(shift_id)]
+            samples.append((role, specialty, country, kind, rate))
+    return record_samples(samples)
+
+@shared_task
+def expire_stale_shifts(grace_minutes=None, batch_size=None, max_batches=None):
+    """
+    Take OPEN shifts that have already started off the market: EXPIRED if nobody was confirmed,
+    CLOSED if partially filled. The prepaid cost of the unfilled slots goes back to each facility,
+    except slots already settled when the facility removed a professional.
+    Each batch is one locked select, one status UPDATE, one wallet UPDATE for every facility in it
+    and one bulk insert of refund transactions, in its own short transaction.
+    """
+    from billing.models import Transaction
+    from .services import shift_cost
+
+    grace_minutes = settings.SHIFT_EXPIRY_GRACE_MINUTES if grace_minutes is None else grace_minutes
+    batch_size = batch_size or settings.SHIFT_EXPIRY_BATCH_SIZE
+    max_batches = max_batches or settings.SHIFT_EXPIRY_MAX_BATCHES
+    now = timezone.now()
+    cutoff = now - timedelta(minutes=grace_minutes)
+
+    summary = {"expired": 0, "closed": 0, "refunded": 0}
+    for _ in range(max_batches):
+        with transaction.atomic():
+            # Locked rows can't be confirmed into mid-sweep; skip_locked lets overlapping runs split the work
+            rows = list(
+                Shift.objects
+                .filter(status='OPEN', start_time__lt=cutoff)
+                .order_by('start_time')
+                .select_for_update(skip_locked=True, of=('self',))
+                .values('id', 'facility_id', 'facility__user_id', 'rate', 'start_time', 'end_time',
+                        'quantity_needed', 'quantity_filled')[:batch_size]
+            )
+            if not rows:
+                break
+            ids = [row['id'] for row in rows]
+
+            Shift.objects.filter(id__in=ids, status='OPEN').update(
+                status=Case(When(quantity_filled=0, then=Value('EXPIRED')), default=Value('CLOSED')),
+                updated_at=now
+            )
+            # Nobody is going to confirm these applicants now
+            bulk_transition(ShiftApplication.objects.filter(shift_id__in=ids), 'REJECTED')
+
+            # Removing a professional (FacilityCancelShiftService) refunds that slot at 90% and reopens it,
+            # one REFUND per slot; those slots are settled and must not be refunded again here
+            settled = dict(
+                Transaction.objects.filter(shift_id__in=ids, transaction_type='REFUND')
+                .values('shift_id').annotate(slots=Count('id')).values_list('shift_id', 'slots')
+            )
+
+            # Same formula as the debit in ShiftCreateService, so the refund matches what was taken
+            refunds = []
+            by_facility = defaultdict(Decimal)
+            for row in rows:
+                unfilled = row['quantity_needed'] - row['quantity_filled'] - settled.get(row['id'], 0)
+                if unfilled <= 0:
+                    continue
+                amount = shift_cost(row['rate'], row['start_time'], row['end_time'], unfilled).quantize(Decimal('0.01'))
+                by_facility[row['facility_id']] += amount
+                refunds.append(Transaction(
+                    user_id=row['facility__user_id'],
+                    amount=amount,
+                    transaction_type='REFUND',
+                    reference=str(uuid.uuid4()),
+                    status='SUCCESS',
+                    shift_id=row['id']
+                ))
+
+            if by_facility:
+                Facility.objects.filter(id__in=list(by_facility)).update(
+                    wallet_balance=F('wallet_balance') + Case(
+                        *[When(id=facility_id, then=Value(amount)) for facility_id, amount in by_facility.items()],
+                        output_field=DecimalField(max_digits=12, decimal_places=2)
+                    )
+                )
+                Transaction.objects.bulk_create(refunds)
+
+        summary["expired"] += sum(1 for row in rows if row['quantity_filled'] == 0)
+        summary["closed"] += sum(1 for row in rows if row['quantity_filled'] > 0)
+        summary["refunded"] += len(refunds)
+        if len(rows) < batch_size:
+            break
+
+    return summary
+
+@shared_task
+def complete_finished_shifts(grace_minutes=None, batch_size=None, max_batches=None):
+    """
+    Close out work nobody clocked out of: IN_PROGRESS applications whose shift ended more than
+    the grace period ago become COMPLETED (clocked out at the shift's end), their time is released
+    and their payouts are queued. CONFIRMED applications that never clocked in become NO_SHOW.
+    Clock-ins the facility never approved are neither paid nor closed: the facility is reminded
+    once, and the next run completes the work after it approves.
+    Staffed shifts past their end become COMPLETED once none of their applications is still active.
+    Bounded batches, one conditional UPDATE each, like the expiry sweep.
+    """
+    from billing.tasks import payout_professionals
+
+    grace_minutes = settings.SHIFT_COMPLETION_GRACE_MINUTES if grace_minutes is None else grace_minutes
+    batch_size = batch_size or settings.SHIFT_COMPLETION_BATCH_SIZE
+    max_batches = max_batches or settings.SHIFT_COMPLETION_MAX_BATCHES
+    cutoff = timezone.now() - timedelta(minutes=grace_minutes)
+
+    summary = {"applications": 0, "no_shows": 0, "awaiting_approval": 0, "shifts": 0}
+    for _ in range(max_batches):
+        with transaction.atomic():
+            rows = list(
+                ShiftApplication.objects
+                .filter(status='IN_PROGRESS', shift__end_time__lt=cutoff)
+                .order_by('shift__end_time')
+                .select_for_update(skip_locked=True, of=('self',))
+                .values_list('id', 'professional_id', 'shift__facility_id')[:batch_size]
+            )
+            if not rows:
+                break
+            ids = [application_id for application_id, _, _ in rows]
+
+            bulk_transition(
+                ShiftApplication.objects.filter(id__in=ids), 'COMPLETED',
+                clock_out_time=Coalesce(
+                    F('clock_out_time'), Subquery(Shift.objects.filter(id=OuterRef('shift_id')).values('end_time')[:1])
+                )
+            )
+            release(ids)
+            record_completions([(professional_id, facility_id) for _, professional_id, facility_id in rows])
+            # Same payout delay as a manual clock-out
+            batch = [str(application_id) for application_id in ids]
+            transaction.on_commit(
+                lambda batch=batch: payout_professionals.apply_async((batch,), countdown=settings.PAYOUT_DELAY_SECONDS)
+            )
+
+        summary["applications"] += len(ids)
+        if len(ids) < batch_size:
+            break
+
+    # Booked but never clocked in: release the time, nothing to pay
+    for _ in range(max_batches):
+        with transaction.atomic():
+            ids = list(
+                ShiftApplication.objects
+                .filter(status='CONFIRMED', shift__end_time__lt=cutoff)
+                .select_for_update(skip_locked=True, of=('self',))
+                .values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            bulk_transition(ShiftApplication.objects.filter(id__in=ids), 'NO_SHOW')
+            release(ids)
+
+        summary["no_shows"] += len(ids)
+        if len(ids) < batch_size:
+            break
+
+    # Clocked in, never approved: only the facility can say whether the work happened
+    reminded = Notification.objects.filter(
+        notification_type='REMINDER', related_object_id=OuterRef('id'), data__reason=ATTENDANCE_OVERDUE_REASON
     )
-    
-    matching_pros = []
-    for pro in potential_candidates:
-        # Location Check (20km radius)
-        # Use shift location if available, otherwise facility location
-        target_lat = shift.latitude if shift.latitude is not None else facility_lat
-        target_lng = shift.longitude if shift.longitude is not None else facility_lng
-        
-        if target_lat is not None and target_lng is not None:
-            dist = haversine(pro.current_location_lat, pro.current_location_lng, target_lat, target_lng)
-            
-            if dist <= 20: # 20km radius
-                # Clash Check: Check if pro has any overlapping confirmed shift
-                has_clash = ShiftApplication.objects.filter(
-                    professional=pro,
-                    status__in=['CONFIRMED', 'IN_PROGRESS', 'ATTENDANCE_PENDING'],
-                    shift__start_time__lt=shift.end_time,
-                    shift__end_time__gt=shift.start_time
-                ).exists()
-                
-                if not has_clash:
-                    matching_pros.append(pro)
-    
-    # Send notifications
-    for pro in matching_pros:
-        # Mock sending Push/SMS
-        print(f"Sending notification to {pro.user.email}: New shift available at {shift.facility.name}")
+    overdue = list(
+        ShiftApplication.objects
+        .filter(status='ATTENDANCE_PENDING', shift__end_time__lt=cutoff)
+        .exclude(Exists(reminded))
+        .values_list('id', 'shift__facility__user_id', 'shift__role', 'professional__user__email')[:batch_size]
+    )
+    Notification.objects.bulk_create([
+        Notification(
+            user_id=facility_user_id,
+            title="Clock-in awaiting approval",
+            message=f"{email} clocked in for '{role}', which has ended. Approve the start so the shift can be completed and paid.",
+            notification_type='REMINDER',
+            related_object_id=application_id,
+            data={"reason": ATTENDANCE_OVERDUE_REASON}
+        ) for application_id, facility_user_id, role, email in overdue
+    ])
+    summary["awaiting_approval"] = len(overdue)
 
+    summary["shifts"] = bulk_transition(
+        Shift.objects.filter(end_time__lt=cutoff).exclude(applications__status__in=ACTIVE_STATUSES),
+        'COMPLETED', only_from=['FILLED', 'CLOSED']
+    )
+    return summary
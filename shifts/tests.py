@@ -1,3 +1,750 @@
-from django.test import TestCase
+import base64
+import json
+import threading
+import time as time_module
+import uuid
+from datetime import time, timedelta
+from decimal import Decimal
+from unittest import skipUnless
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import F
+from unittest import mock
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from accounts.models import User, Facility, Professional, ProfessionalFacilityStats, ProfessionalStats, RatingSummary
+from accounts.ratings import create_review
+from billing.models import Transaction
+from core.models import Notification
+from .cancellation_services import FacilityCancelShiftService, ProfessionalCancelShiftService
+from .qr import issue_token, verify_token
+from .market import clear_rate_cache, percentile, rate_floor, rebuild_market_rates, record_samples
+from .models import MarketRateStat, Shift, ShiftApplication, ShiftTemplate, ProfessionalCommitment
+from billing.tasks import pay_completed_applications, payout_professional
+from .approval_services import ApproveShiftStartService
+from .selectors import ShiftSelector
+from .tasks import complete_finished_shifts, expire_stale_shifts, record_market_rates
+from .services import ClockInService, ClockOutService, ShiftCreateService, ShiftManageApplicationService, ShiftTemplateCreateService, ShiftTemplateExpandService, shift_cost
 
-# Create your tests here.
+def run_concurrently(calls):
+    """
+    Start every call at the same moment on its own thread (and DB connection).
+    Returns one result per call: the return value or the exception raised.
+    """
+    barrier = threading.Barrier(len(calls))
+    results = [None] * len(calls)
+
+    def worker(index, func):
+        try:
+            barrier.wait()
+            results[index] = func()
+        except Exception as e:
+            results[index] = e
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker, args=(i, func)) for i, func in enumerate(calls)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+@skipUnless(connection.vendor == 'postgresql', "Needs row-level concurrency (Postgres)")
+class ConcurrentShiftFillingTests(TransactionTestCase):
+    QUANTITY = 3
+    APPLICANTS = 12
+
+    def setUp(self):
+        # Confirms really commit here, so keep their market-rate jobs away from the broker
+        patcher = mock.patch("shifts.services.record_market_rates.delay")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.facility_user = User.objects.create_user(email="facility@example.com", password="x")
+        Facility.objects.create(user=self.facility_user, name="General", address="1 Marina", rc_number="RC-1", is_verified=True)
+        start = timezone.now() + timedelta(days=2)
+        self.shift = Shift.objects.create(
+            facility=self.facility_user.facility, role="Nurse", specialty="ICU", quantity_needed=self.QUANTITY,
+            start_time=start, end_time=start + timedelta(hours=8), rate=Decimal("2500.00")
+        )
+        self.applications = []
+        for i in range(self.APPLICANTS):
+            user = User.objects.create_user(email=f"pro{i}@example.com", password="x")
+            professional = Professional.objects.create(user=user, license_number=f"LIC-{i}")
+            self.applications.append(ShiftApplication.objects.create(shift=self.shift, professional=professional))
+
+    def confirm(self, application_id):
+        # Each thread loads its own user, like separate requests would
+        return lambda: ShiftManageApplicationService()(
+            user=User.objects.get(id=self.facility_user.id), application_id=application_id, action='CONFIRM'
+        )
+
+    def test_concurrent_confirms_never_overfill(self):
+        results = run_concurrently([self.confirm(app.id) for app in self.applications])
+
+        successes = [r for r in results if isinstance(r, ShiftApplication)]
+        failures = [r for r in results if isinstance(r, Exception)]
+        self.assertEqual(len(successes), self.QUANTITY)
+        self.assertTrue(all(isinstance(e, ValueError) for e in failures), failures)
+
+        self.shift.refresh_from_db()
+        self.assertEqual(self.shift.quantity_filled, self.QUANTITY)
+        self.assertEqual(self.shift.status, 'FILLED')
+        self.assertEqual(ShiftApplication.objects.filter(shift=self.shift, status='CONFIRMED').count(), self.QUANTITY)
+
+    def test_same_application_confirmed_twice_counts_once(self):
+        application = self.applications[0]
+        results = run_concurrently([self.confirm(application.id) for _ in range(6)])
+
+        self.assertEqual(sum(isinstance(r, ShiftApplication) for r in results), 1)
+        self.shift.refresh_from_db()
+        self.assertEqual(self.shift.quantity_filled, 1)
+        self.assertEqual(self.shift.status, 'OPEN')
+
+    def test_cancellations_racing_confirms_keep_counter_consistent(self):
+        first = self.applications[:self.QUANTITY]
+        for application in first:
+            self.confirm(application.id)()
+        self.shift.refresh_from_db()
+        self.assertEqual(self.shift.status, 'FILLED')
+
+        cancels = [
+            (lambda app=app: ProfessionalCancelShiftService()(
+                user=User.objects.get(professional__id=app.professional_id), shift_id=self.shift.id
+            ))
+            for app in first
+        ]
+        confirms = [self.confirm(app.id) for app in self.applications[self.QUANTITY:]]
+        run_concurrently(cancels + confirms)
+
+        self.shift.refresh_from_db()
+        confirmed = ShiftApplication.objects.filter(shift=self.shift, status='CONFIRMED').count()
+        self.assertEqual(self.shift.quantity_filled, confirmed)
+        self.assertLessEqual(confirmed, self.QUANTITY)
+        self.assertEqual(self.shift.status, 'FILLED' if confirmed == self.QUANTITY else 'OPEN')
+
+class CommitmentTests(TestCase):
+    def setUp(self):
+        self.facility_user = User.objects.create_user(email="facility@example.com", password="x")
+        Facility.objects.create(user=self.facility_user, name="General", address="1 Marina", rc_number="RC-1", is_verified=True)
+        pro_user = User.objects.create_user(email="pro@example.com", password="x")
+        self.professional = Professional.objects.create(user=pro_user, license_number="LIC-1")
+        self.start = timezone.now() + timedelta(days=2)
+
+    def apply(self, offset_hours):
+        start = self.start + timedelta(hours=offset_hours)
+        shift = Shift.objects.create(
+            facility=self.facility_user.facility, role="Nurse", specialty="ICU",
+            start_time=start, end_time=start + timedelta(hours=8), rate=Decimal("2500.00")
+        )
+        return ShiftApplication.objects.create(shift=shift, professional=self.professional)
+
+    def confirm(self, application):
+        return ShiftManageApplicationService()(user=self.facility_user, application_id=application.id, action='CONFIRM')
+
+    def test_overlapping_confirm_is_rejected(self):
+        first, overlapping, later = self.apply(0), self.apply(4), self.apply(8)
+        self.confirm(first)
+        with self.assertRaisesMessage(ValueError, "already booked"):
+            self.confirm(overlapping)
+        # Back-to-back shifts don't overlap ([start, end) ranges)
+        self.confirm(later)
+
+        overlapping.refresh_from_db()
+        overlapping.shift.refresh_from_db()
+        self.assertEqual(overlapping.status, 'PENDING')
+        self.assertEqual(overlapping.shift.quantity_filled, 0)
+        self.assertEqual(ProfessionalCommitment.objects.filter(professional=self.professional).count(), 2)
+
+    def test_cancelling_frees_the_time(self):
+        first, overlapping = self.apply(0), self.apply(4)
+        self.confirm(first)
+        ProfessionalCancelShiftService()(user=self.professional.user, shift_id=first.shift_id)
+        self.confirm(overlapping)
+        self.assertEqual(ProfessionalCommitment.objects.get(professional=self.professional).application_id, overlapping.id)
+
+class ShiftTemplateTests(TestCase):
+    def setUp(self):
+        self.facility_user = User.objects.create_user(email="facility@example.com", password="x")
+        self.facility = Facility.objects.create(
+            user=self.facility_user, name="General", address="1 Marina", rc_number="RC-1",
+            is_verified=True, wallet_balance=Decimal("10000000.00")
+        )
+
+    def create(self, **kwargs):
+        options = dict(
+            user=self.facility_user, role="Nurse", specialty="ICU", weekdays=[0, 2, 4],
+            start_time=time(20, 0), end_time=time(8, 0), rate=Decimal("2500.00"), quantity_needed=2
+        )
+        options.update(kwargs)
+        return ShiftTemplateCreateService()(**options)
+
+    @mock.patch("shifts.services.record_market_rates.delay")
+    @mock.patch("shifts.services.notify_matching_professionals_batch.delay")
+    def test_month_of_shifts_is_one_debit_and_one_matching_job(self, delay, record_delay):
+        with self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as queries:
+            template, shifts = self.create(horizon_days=28)
+
+        self.assertGreaterEqual(len(shifts), 11)
+        self.assertLessEqual(len(queries), 10)
+        for shift in shifts:
+            self.assertIn(shift.start_time.weekday(), template.weekdays)
+            # Overnight: ends at 08:00 the next day
+            self.assertEqual(shift.end_time - shift.start_time, timedelta(hours=12))
+
+        expected = sum(shift_cost(s.rate, s.start_time, s.end_time, s.quantity_needed) for s in shifts)
+        self.facility.refresh_from_db()
+        self.assertEqual(self.facility.wallet_balance, Decimal("10000000.00") - expected)
+        delay.assert_called_once_with([str(s.id) for s in shifts])
+        record_delay.assert_called_once_with([str(s.id) for s in shifts], 'posted')
+
+    def test_expanding_again_only_adds_new_days(self):
+        template, first = self.create(horizon_days=14)
+        _, again = ShiftTemplateExpandService()(user=self.facility_user, template_id=template.id, days=14)
+        self.assertEqual(again, [])
+        _, more = ShiftTemplateExpandService()(user=self.facility_user, template_id=template.id, days=28)
+        self.assertTrue(more)
+        self.assertTrue(all(s.start_time.date() > template.expanded_until - timedelta(days=14) for s in more))
+        self.assertEqual(Shift.objects.filter(template=template).count(), len(first) + len(more))
+
+    def test_quantity_needed_must_be_positive(self):
+        for quantity in (0, -3):
+            with self.subTest(quantity=quantity), self.assertRaisesMessage(ValueError, "Quantity needed must be at least 1"):
+                self.create(quantity_needed=quantity, horizon_days=28)
+        self.assertFalse(ShiftTemplate.objects.exists())
+        self.assertFalse(Shift.objects.exists())
+        self.facility.refresh_from_db()
+        self.assertEqual(self.facility.wallet_balance, Decimal("10000000.00"))
+
+    def test_unknown_or_foreign_template_is_not_found(self):
+        with self.assertRaisesMessage(ValueError, "Template not found"):
+            ShiftTemplateExpandService()(user=self.facility_user, template_id=uuid.uuid4(), days=7)
+
+        other_user = User.objects.create_user(email="other@example.com", password="x")
+        Facility.objects.create(user=other_user, name="Other", address="2 Marina", rc_number="RC-2", is_verified=True)
+        template, _ = self.create()
+        with self.assertRaisesMessage(ValueError, "Template not found"):
+            ShiftTemplateExpandService()(user=other_user, template_id=template.id, days=7)
+
+    def test_insufficient_balance_posts_nothing(self):
+        Facility.objects.filter(id=self.facility.id).update(wallet_balance=Decimal("1000.00"))
+        with self.assertRaisesMessage(ValueError, "Insufficient wallet balance"):
+            self.create(horizon_days=28)
+        self.assertFalse(ShiftTemplate.objects.exists())
+        self.assertFalse(Shift.objects.exists())
+
+@skipUnless(connection.vendor == 'postgresql', "Needs row-level concurrency (Postgres)")
+class ConcurrentTemplateExpandTests(TransactionTestCase):
+    @mock.patch("shifts.services.record_market_rates.delay")
+    @mock.patch("shifts.services.notify_matching_professionals_batch.delay")
+    def test_concurrent_expands_post_and_debit_once(self, *delays):
+        facility_user = User.objects.create_user(email="facility@example.com", password="x")
+        facility = Facility.objects.create(
+            user=facility_user, name="General", address="1 Marina", rc_number="RC-1",
+            is_verified=True, wallet_balance=Decimal("10000000.00")
+        )
+        template, _ = ShiftTemplateCreateService()(
+            user=facility_user, role="Nurse", specialty="ICU", weekdays=list(range(7)),
+            start_time=time(20, 0), end_time=time(8, 0), rate=Decimal("2500.00")
+        )
+
+        results = run_concurrently([
+            lambda: ShiftTemplateExpandService()(user=User.objects.get(id=facility_user.id), template_id=template.id, days=14)
+            for _ in range(4)
+        ])
+
+        posted = [result[1] for result in results if not isinstance(result, Exception)]
+        self.assertEqual(len(posted), 4, results)
+        self.assertEqual(sum(1 for shifts in posted if shifts), 1)
+        created = list(Shift.objects.filter(template=template))
+        self.assertEqual(len(created), len({s.start_time for s in created}))
+        facility.refresh_from_db()
+        expected = sum(shift_cost(s.rate, s.start_time, s.end_time, s.quantity_needed) for s in created)
+        self.assertEqual(facility.wallet_balance, Decimal("10000000.00") - expected)
+
+class ShiftExpiryTests(TestCase):
+    def setUp(self):
+        self.facility_user = User.objects.create_user(email="facility@example.com", password="x")
+        self.facility = Facility.objects.create(
+            user=self.facility_user, name="General", address="1 Marina", rc_number="RC-1", is_verified=True
+        )
+        self.now = timezone.now()
+
+    def shift(self, starts_in_hours, quantity_needed=1, quantity_filled=0):
+        start = self.now + timedelta(hours=starts_in_hours)
+        return Shift.objects.create(
+            facility=self.facility, role="Nurse", specialty="ICU", rate=Decimal("2000.00"),
+            start_time=start, end_time=start + timedelta(hours=8),
+            quantity_needed=quantity_needed, quantity_filled=quantity_filled
+        )
+
+    def test_started_open_shifts_are_closed_and_unfilled_slots_refunded(self):
+        empty = self.shift(-2, quantity_needed=2)
+        partial = self.shift(-3, quantity_needed=3, quantity_filled=1)
+        upcoming = self.shift(5)
+        pro_user = User.objects.create_user(email="pro@example.com", password="x")
+        pending = ShiftApplication.objects.create(
+            shift=empty, professional=Professional.objects.create(user=pro_user, license_number="LIC-1")
+        )
+
+        summary = expire_stale_shifts(batch_size=1)
+        self.assertEqual(summary, {"expired": 1, "closed": 1, "refunded": 2})
+
+        statuses = dict(Shift.objects.values_list('id', 'status'))
+        self.assertEqual(statuses[empty.id], 'EXPIRED')
+        self.assertEqual(statuses[partial.id], 'CLOSED')
+        self.assertEqual(statuses[upcoming.id], 'OPEN')
+        pending.refresh_from_db()
+        self.assertEqual(pending.status, 'REJECTED')
+
+        # 2 + 2 unfilled slots x 8h x 2000
+        self.facility.refresh_from_db()
+        self.assertEqual(self.facility.wallet_balance, Decimal("64000.00"))
+        self.assertEqual(Transaction.objects.filter(transaction_type='REFUND').count(), 2)
+
+        # Re-running finds nothing left to refund
+        self.assertEqual(expire_stale_shifts(), {"expired": 0, "closed": 0, "refunded": 0})
+        self.facility.refresh_from_db()
+        self.assertEqual(self.facility.wallet_balance, Decimal("64000.00"))
+
+    @mock.patch("shifts.services.record_market_rates.delay")
+    @mock.patch("shifts.services.notify_matching_professionals.delay")
+    def test_slots_refunded_on_removal_are_not_refunded_again(self, *_):
+        Facility.objects.filter(id=self.facility.id).update(wallet_balance=Decimal("100000.00"))
+        start = self.now + timedelta(hours=6)
+        # 2 slots x 8h x 2500
+        shift = ShiftCreateService()(
+            user=self.facility_user, role="Nurse", specialty="ICU", quantity_needed=2,
+            start_time=start, end_time=start + timedelta(hours=8), rate=Decimal("2500.00")
+        )
+        pro = Professional.objects.create(user=User.objects.create_user(email="pro@example.com", password="x"), license_number="LIC-1")
+        application = ShiftApplication.objects.create(shift=shift, professional=pro)
+        ShiftManageApplicationService()(user=self.facility_user, application_id=application.id, action='CONFIRM')
+
+        # 90% of one slot back; the 10% penalty stays spent
+        FacilityCancelShiftService()(user=self.facility_user, shift_id=shift.id, professional_id=pro.id)
+        self.facility.refresh_from_db()
+        self.assertEqual(self.facility.wallet_balance, Decimal("78000.00"))
+
+        Shift.objects.filter(id=shift.id).update(start_time=self.now - timedelta(hours=2), end_time=self.now + timedelta(hours=6))
+        self.assertEqual(expire_stale_shifts(), {"expired": 1, "closed": 0, "refunded": 1})
+        # Only the slot that was never filled comes back in full
+        self.facility.refresh_from_db()
+        self.assertEqual(self.facility.wallet_balance, Decimal("98000.00"))
+
+class ApplicationLifecycleTests(TestCase):
+    LAT, LNG = 6.45, 3.39
+
+    def setUp(self):
+        self.facility_user = User.objects.create_user(email="facility@example.com", password="x")
+        self.facility = Facility.objects.create(
+            user=self.facility_user, name="General", address="1 Marina", rc_number="RC-1", is_verified=True,
+            location_lat=self.LAT, location_lng=self.LNG
+        )
+        self.pro_user = User.objects.create_user(email="pro@example.com", password="x")
+        self.professional = Professional.objects.create(user=self.pro_user, license_number="LIC-1")
+
+    def start_shift(self, starts_in_hours):
+        start = timezone.now() + timedelta(hours=starts_in_hours)
+        shift = Shift.objects.create(
+            facility=self.facility, role="Nurse", specialty="ICU", rate=Decimal("2000.00"),
+            start_time=start, end_time=start + timedelta(hours=8)
+        )
+        application = ShiftApplication.objects.create(shift=shift, professional=self.professional)
+        ShiftManageApplicationService()(user=self.facility_user, application_id=application.id, action='CONFIRM')
+        scan = dict(user=self.pro_user, shift_id=shift.id, lat=self.LAT, lng=self.LNG, qr_code_data=issue_token(self.facility.id)[0])
+        ClockInService()(**scan)
+        ApproveShiftStartService()(user=self.facility_user, application_id=application.id)
+        application.refresh_from_db()
+        self.assertEqual(application.status, 'IN_PROGRESS')
+        return application, scan
+
+    @mock.patch("billing.tasks.payout_professional.apply_async")
+    def test_clock_out_completes_and_pays_once(self, apply_async):
+        application, scan = self.start_shift(-1)
+        ClockOutService()(**scan)
+        apply_async.assert_called_once_with((str(application.id),), countdown=settings.PAYOUT_DELAY_SECONDS)
+        application.refresh_from_db()
+        self.assertEqual(application.status, 'COMPLETED')
+        self.assertFalse(ProfessionalCommitment.objects.filter(application=application).exists())
+
+        # However often the payout fires (scheduled run, early release, retry) it pays once
+        payout_professional(application.id)
+        self.assertEqual(payout_professional(application.id), 0)
+        self.professional.refresh_from_db()
+        self.assertEqual(self.professional.wallet_balance, Decimal("16000.00"))
+        self.assertEqual(Transaction.objects.filter(transaction_type='PAYOUT').count(), 1)
+
+        with self.assertRaisesMessage(ValueError, "No shift in progress"):
+            ClockOutService()(**scan)
+
+    def test_bad_qr_scans_are_rejected_without_queries(self):
+        start = timezone.now() + timedelta(minutes=30)
+        shift = Shift.objects.create(
+            facility=self.facility, role="Nurse", specialty="ICU", rate=Decimal("2000.00"),
+            start_time=start, end_time=start + timedelta(hours=8)
+        )
+        application = ShiftApplication.objects.create(shift=shift, professional=self.professional)
+        ShiftManageApplicationService()(user=self.facility_user, application_id=application.id, action='CONFIRM')
+
+        token, refresh_in = issue_token(self.facility.id, shift_id=shift.id)
+        self.assertLessEqual(refresh_in, settings.QR_TOKEN_WINDOW_SECONDS)
+        self.assertEqual(verify_token(token), (self.facility.id, shift.id))
+        stale, _ = issue_token(self.facility.id, now=time_module.time() - 5 * settings.QR_TOKEN_WINDOW_SECONDS)
+        other_shift, _ = issue_token(self.facility.id, shift_id=self.facility.id)
+        rejected = {
+            "static facility id": str(self.facility.id),
+            "tampered": token.replace(token.split(".")[1], other_shift.split(".")[1][::-1]),
+            "stale": stale,
+            "other shift": other_shift,
+        }
+        for label, qr_code_data in rejected.items():
+            with self.subTest(label), self.assertNumQueries(0), self.assertRaises(ValueError):
+                ClockInService()(user=self.pro_user, shift_id=shift.id, lat=self.LAT, lng=self.LNG, qr_code_data=qr_code_data)
+
+        # A genuine code from another facility needs the application to tell
+        with self.assertRaisesMessage(ValueError, "Invalid Facility QR Code."):
+            ClockInService()(
+                user=self.pro_user, shift_id=shift.id, lat=self.LAT, lng=self.LNG, qr_code_data=issue_token(uuid.uuid4())[0]
+            )
+
+        # Valid scan: the application, shift and facility come from one query, then the
+        # update and the notification (is_professional is already cached on the user)
+        with self.assertNumQueries(3):
+            ClockInService()(user=self.pro_user, shift_id=shift.id, lat=self.LAT, lng=self.LNG, qr_code_data=token)
+        application.refresh_from_db()
+        self.assertEqual(application.status, 'ATTENDANCE_PENDING')
+
+    def test_scheduler_completes_shifts_past_their_end(self):
+        finished, _ = self.start_shift(-10)
+        running, _ = self.start_shift(-2)
+
+        summary = complete_finished_shifts()
+        self.assertEqual(summary["applications"], 1)
+
+        finished.refresh_from_db()
+        running.refresh_from_db()
+        self.assertEqual(finished.status, 'COMPLETED')
+        self.assertEqual(finished.clock_out_time, finished.shift.end_time)
+        self.assertEqual(running.status, 'IN_PROGRESS')
+        self.assertEqual(Shift.objects.get(id=finished.shift_id).status, 'COMPLETED')
+        self.assertEqual(Shift.objects.get(id=running.shift_id).status, 'FILLED')
+        self.assertEqual(list(ProfessionalCommitment.objects.values_list('application_id', flat=True)), [running.id])
+        self.assertEqual(ProfessionalStats.objects.get(professional=self.professional).completed_count, 1)
+        self.assertEqual(ProfessionalFacilityStats.objects.get(professional=self.professional).completed_count, 1)
+
+    def confirm_shift(self, starts_in_hours, clock_in=False):
+        start = timezone.now() + timedelta(hours=starts_in_hours)
+        shift = Shift.objects.create(
+            facility=self.facility, role="Nurse", specialty="ICU", rate=Decimal("2000.00"),
+            start_time=start, end_time=start + timedelta(hours=8)
+        )
+        application = ShiftApplication.objects.create(shift=shift, professional=self.professional)
+        ShiftManageApplicationService()(user=self.facility_user, application_id=application.id, action='CONFIRM')
+        if clock_in:
+            ClockInService()(user=self.pro_user, shift_id=shift.id, lat=self.LAT, lng=self.LNG, qr_code_data=issue_token(self.facility.id)[0])
+        return application
+
+    def test_scheduler_closes_no_shows_and_holds_unapproved_clock_ins(self):
+        no_show = self.confirm_shift(-30)
+        unapproved = self.confirm_shift(-1, clock_in=True)
+        # Clocked in while the shift was running; it has ended since
+        Shift.objects.filter(id=unapproved.shift_id).update(
+            start_time=F('start_time') - timedelta(hours=10), end_time=F('end_time') - timedelta(hours=10)
+        )
+
+        summary = complete_finished_shifts()
+        self.assertEqual((summary["no_shows"], summary["awaiting_approval"]), (1, 1))
+        no_show.refresh_from_db()
+        self.assertEqual(no_show.status, 'NO_SHOW')
+        self.assertEqual(Shift.objects.get(id=no_show.shift_id).status, 'COMPLETED')
+        # Not paid or closed without the facility; its shift stays open for completion
+        self.assertEqual(ShiftApplication.objects.get(id=unapproved.id).status, 'ATTENDANCE_PENDING')
+        self.assertEqual(Shift.objects.get(id=unapproved.shift_id).status, 'FILLED')
+        self.assertEqual(list(ProfessionalCommitment.objects.values_list('application_id', flat=True)), [unapproved.id])
+        reminder = Notification.objects.get(related_object_id=unapproved.id, notification_type='REMINDER')
+        self.assertEqual(reminder.user_id, self.facility_user.id)
+        # Reminded once, however often the scheduler runs
+        self.assertEqual(complete_finished_shifts()["awaiting_approval"], 0)
+
+        # Once the facility approves, the next run completes and closes it out
+        ApproveShiftStartService()(user=self.facility_user, application_id=unapproved.id)
+        self.assertEqual(complete_finished_shifts()["applications"], 1)
+        self.assertEqual(ShiftApplication.objects.get(id=unapproved.id).status, 'COMPLETED')
+        self.assertEqual(Shift.objects.get(id=unapproved.shift_id).status, 'COMPLETED')
+
+    def test_payout_sweep_pays_due_applications_missed_by_their_job(self):
+        due, _ = self.start_shift(-40)
+        recent, _ = self.start_shift(-10)
+        ShiftApplication.objects.filter(id=due.id).update(status='COMPLETED', clock_out_time=timezone.now() - timedelta(hours=25))
+        ShiftApplication.objects.filter(id=recent.id).update(status='COMPLETED', clock_out_time=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(pay_completed_applications(), 1)
+        self.assertIsNotNone(ShiftApplication.objects.get(id=due.id).paid_at)
+        self.assertIsNone(ShiftApplication.objects.get(id=recent.id).paid_at)
+        self.assertEqual(pay_completed_applications(), 0)
+
+    def test_transitions_cannot_skip_steps(self):
+        shift = Shift.objects.create(
+            facility=self.facility, role="Nurse", specialty="ICU", rate=Decimal("2000.00"),
+            start_time=timezone.now(), end_time=timezone.now() + timedelta(hours=8)
+        )
+        application = ShiftApplication.objects.create(shift=shift, professional=self.professional)
+        with self.assertRaisesMessage(ValueError, "not pending attendance approval"):
+            ApproveShiftStartService()(user=self.facility_user, application_id=application.id)
+        application.refresh_from_db()
+        self.assertEqual(application.status, 'PENDING')
+
+class ApplicantRankingTests(TestCase):
+    def setUp(self):
+        self.facility_user = User.objects.create_user(email="facility@example.com", password="x")
+        self.facility = Facility.objects.create(
+            user=self.facility_user, name="General", address="1 Marina", rc_number="RC-1", is_verified=True,
+            location_lat=6.45, location_lng=3.39
+        )
+        start = timezone.now() + timedelta(days=1)
+        self.shift = Shift.objects.create(
+            facility=self.facility, role="Nurse", specialty="ICU", rate=Decimal("2000.00"),
+            start_time=start, end_time=start + timedelta(hours=8)
+        )
+
+    def applicant(self, name, lat, ratings=(), **stats):
+        user = User.objects.create_user(email=f"{name}@example.com", password="x")
+        professional = Professional.objects.create(
+            user=user, license_number=name, current_location_lat=lat, current_location_lng=3.39
+        )
+        if stats:
+            ProfessionalStats.objects.create(professional=professional, **stats)
+        for rating in ratings:
+            create_review(self.facility_user, user, rating, "Review")
+        ShiftApplication.objects.create(shift=self.shift, professional=professional)
+        return professional
+
+    def test_applicants_ranked_in_one_query(self):
+        regular = self.applicant("regular", 6.46, ratings=[5, 5, 4, 5], completed_count=20)
+        ProfessionalFacilityStats.objects.create(professional=regular, facility=self.facility, completed_count=6)
+        newcomer = self.applicant("newcomer", 6.46)
+        flaky = self.applicant("flaky", 6.46, ratings=[1, 1, 1, 1], completed_count=2, late_cancellation_count=4)
+        far = self.applicant("far", 6.75, ratings=[5, 5, 4, 5], completed_count=20)
+
+        with self.assertNumQueries(2):
+            ranked = list(ShiftSelector().list_applications(self.shift.id, self.facility_user))
+            # Professionals and users come with the ranking query
+            [app.professional.user.email for app in ranked]
+
+        # Known, reliable and close first; an unknown newcomer beats a well-rated professional
+        # out of range, who still beats a poorly rated, unreliable one
+        self.assertEqual([app.professional_id for app in ranked], [regular.id, newcomer.id, far.id, flaky.id])
+        self.assertGreater(ranked[2].distance_km, 30)
+        self.assertEqual(ranked[0].facility_completions, 6)
+
+    def test_late_cancellation_updates_stats(self):
+        professional = self.applicant("pro", 6.46)
+        ShiftManageApplicationService()(
+            user=self.facility_user, application_id=professional.applications.get().id, action='CONFIRM'
+        )
+        Shift.objects.filter(id=self.shift.id).update(start_time=timezone.now() + timedelta(hours=1))
+        ProfessionalCancelShiftService()(user=professional.user, shift_id=self.shift.id)
+
+        stats = ProfessionalStats.objects.get(professional=professional)
+        self.assertEqual((stats.cancellation_count, stats.late_cancellation_count), (1, 1))
+        summary = RatingSummary.objects.get(user=professional.user)
+        self.assertEqual((summary.count, summary.total, summary.stars_1), (1, 1, 1))
+
+@skipUnless(connection.vendor == 'postgresql', "Uses the tsvector trigger and GIN index (Postgres)")
+class ShiftSearchTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(email="facility@example.com", password="x")
+        self.facility = Facility.objects.create(
+            user=user, name="Lagoon Clinic", address="1 Marina", rc_number="RC-1", is_verified=True,
+            location_lat=6.45, location_lng=3.39
+        )
+        self.start = timezone.now() + timedelta(days=1)
+
+    def shift(self, role, specialty, address="", **fields):
+        return Shift.objects.create(
+            facility=self.facility, role=role, specialty=specialty, address=address, rate=Decimal("2000.00"),
+            start_time=self.start, end_time=self.start + timedelta(hours=8), **fields
+        )
+
+    def test_vector_follows_shift_and_facility_writes(self):
+        shift = self.shift("Nurse", "ICU", "Victoria Island")
+        selector = ShiftSelector()
+        self.assertEqual([s.id for s in selector.search_shifts("victoria")[0]], [shift.id])
+        self.assertEqual(selector.search_shifts("nursing")[0][0].id, shift.id) # stemmed
+
+        Shift.objects.filter(id=shift.id).update(role="Pharmacist")
+        self.assertEqual(selector.search_shifts("nurse")[0], [])
+
+        self.facility.name = "Harbour Hospital"
+        self.facility.save()
+        self.assertEqual([s.id for s in selector.search_shifts("harbour")[0]], [shift.id])
+        self.assertEqual(selector.search_shifts("lagoon")[0], [])
+
+    def test_ranked_and_cursor_paginated(self):
+        # Matching on role (weight A) beats matching only on address (weight C)
+        by_address = self.shift("Porter", "General", "Theatre Road")
+        by_role = [self.shift("Theatre Nurse", "Surgery") for _ in range(4)]
+        Shift.objects.filter(id=by_role[0].id).update(status='FILLED')
+        far = self.shift("Theatre Nurse", "Surgery", latitude=9.07, longitude=7.49)
+
+        selector = ShiftSelector()
+        seen, cursor = [], None
+        with self.assertNumQueries(2):
+            while True:
+                page, cursor = selector.search_shifts("theatre", lat=6.45, lng=3.39, radius_km=50, cursor=cursor, limit=2)
+                seen.extend(page)
+                if cursor is None:
+                    break
+
+        self.assertEqual(len(seen), 4)
+        self.assertEqual(seen[-1].id, by_address.id)
+        self.assertEqual({s.id for s in seen[:3]}, {s.id for s in by_role[1:]})
+        self.assertNotIn(far.id, [s.id for s in seen])
+        self.assertLess(seen[0].distance_km, 1)
+
+        with self.assertRaises(ValueError):
+            selector.search_shifts("theatre", cursor="not-a-cursor")
+
+    def test_bad_parameters_are_rejected(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.get(email="facility@example.com"))
+        url = reverse("shift-search")
+        bad_id = base64.urlsafe_b64encode(json.dumps([0.0, "2024-01-01T00:00:00", "abc"]).encode()).decode()
+        for params in (
+            {"lat": "nan", "lng": "3.39"}, {"lat": "6.45", "lng": "inf"},
+            {"lat": "6.45", "lng": "3.39", "radius_km": "inf"}, {"status": "BOGUS"},
+            {"cursor": bad_id}, {"cursor": "not-a-cursor"},
+        ):
+            with self.subTest(params):
+                self.assertEqual(client.get(url, params).status_code, 400)
+
+        self.shift("Nurse", "ICU")
+        self.shift("Nurse", "ICU")
+        first = client.get(url, {"q": "nurse", "limit": 1}).json()["data"]
+        self.assertIsNotNone(first["next_cursor"])
+        second = client.get(url, {"q": "nurse", "limit": 1, "cursor": first["next_cursor"]}).json()["data"]
+        self.assertNotEqual(first["results"][0]["id"], second["results"][0]["id"])
+
+class ShiftFacetTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(email="facility@example.com", password="x")
+        self.facility = Facility.objects.create(
+            user=user, name="General", address="1 Marina", rc_number="RC-1", is_verified=True,
+            location_lat=6.45, location_lng=3.39
+        )
+        start = timezone.now() + timedelta(days=1)
+        for role, specialty, rate, lat in [
+            ("Nurse", "ICU", "1500.00", None), # At the facility
+            ("Nurse", "ICU", "6000.00", 6.53), # ~9 km north
+            ("Nurse", "ER", "6000.00", 6.60), # ~17 km
+            ("Doctor", "ER", "25000.00", 7.40), # ~105 km
+        ]:
+            Shift.objects.create(
+                facility=self.facility, role=role, specialty=specialty, rate=Decimal(rate),
+                start_time=start, end_time=start + timedelta(hours=8),
+                latitude=lat, longitude=3.39 if lat else None
+            )
+        Shift.objects.filter(role="Doctor").update(status='FILLED')
+        Shift.objects.create(
+            facility=self.facility, role="Doctor", specialty="ER", rate=Decimal("25000.00"),
+            start_time=start, end_time=start + timedelta(hours=8), latitude=7.40, longitude=3.39
+        )
+        cache.clear()
+
+    def test_all_facets_in_one_query_then_cached(self):
+        selector = ShiftSelector()
+        with self.assertNumQueries(1):
+            facets = selector.shift_facets(lat=6.46, lng=3.39)
+
+        self.assertEqual(facets["specialty"], [{"value": "ER", "count": 2}, {"value": "ICU", "count": 2}])
+        self.assertEqual(facets["role"], [{"value": "Nurse", "count": 3}, {"value": "Doctor", "count": 1}])
+        self.assertEqual([band["count"] for band in facets["rate_band"]], [1, 0, 2, 0, 1])
+        self.assertEqual(facets["rate_band"][-1]["max"], None)
+        self.assertEqual([ring["count"] for ring in facets["distance_km"]], [1, 1, 1, 0, 1])
+
+        # A nearby point in the same grid cell is served from the cache
+        with self.assertNumQueries(0):
+            self.assertEqual(selector.shift_facets(lat=6.47, lng=3.391), facets)
+
+        everywhere = selector.shift_facets(status=None)
+        self.assertIsNone(everywhere["distance_km"])
+        self.assertEqual(sum(facet["count"] for facet in everywhere["role"]), 5)
+
+    def test_bad_parameters_are_rejected(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.get(email="facility@example.com"))
+        url = reverse("shift-facets")
+        for params in ({"lat": "nan", "lng": "3.39"}, {"lat": "6.45", "lng": "inf"}, {"lat": "north"}, {"status": "anything:else"}):
+            with self.subTest(params):
+                self.assertEqual(client.get(url, params).status_code, 400)
+        self.assertEqual(client.get(url, {"status": "FILLED", "lat": "6.45", "lng": "3.39"}).status_code, 200)
+
+class MarketRateTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email="facility@example.com", password="x")
+        self.facility = Facility.objects.create(
+            user=self.user, name="General", address="1 Marina", rc_number="RC-1", is_verified=True,
+            wallet_balance=Decimal("1000000.00")
+        )
+        self.start = timezone.now() + timedelta(days=1)
+        clear_rate_cache()
+
+    def post(self, rate, role="Nurse", specialty="ICU"):
+        return ShiftCreateService()(
+            user=self.user, role=role, specialty=specialty, quantity_needed=1,
+            start_time=self.start, end_time=self.start + timedelta(hours=8), rate=Decimal(rate)
+        )
+
+    def test_floor_follows_filled_rates(self):
+        # No statistics yet: the default floor
+        with self.assertRaises(ValueError):
+            self.post("1999.00")
+
+        record_samples([("Nurse", "ICU", "Nigeria", "filled", rate) for rate in [3000, 4000] * 10])
+        stat = MarketRateStat.objects.get(role="nurse", specialty="icu")
+        self.assertEqual((stat.filled_count, stat.filled_average), (20, Decimal("3500.00")))
+        self.assertAlmostEqual(sum(stat.filled_histogram), 1.0)
+        self.assertEqual(percentile(stat, 50), Decimal("4000.00"))
+        # The rejected post above cached the default floor for this key
+        clear_rate_cache()
+
+        # Cached per process: one lookup, then none until the TTL passes
+        with self.assertNumQueries(1):
+            self.assertEqual(rate_floor("nurse ", "ICU", "Nigeria"), Decimal("3150.00"))
+        with self.assertNumQueries(0):
+            self.assertEqual(rate_floor("Nurse", "ICU", "Nigeria"), Decimal("3150.00"))
+        with self.assertRaises(ValueError):
+            self.post("3000.00")
+
+        # Other roles in the specialty fall back to the all-roles row, other specialties to the default
+        self.assertEqual(rate_floor("Midwife", "ICU", "Nigeria"), Decimal("3150.00"))
+        self.assertEqual(rate_floor("Nurse", "ER", "Nigeria"), Decimal("2000.00"))
+
+    # The statistics job runs inline instead of through the broker
+    @mock.patch("shifts.services.record_market_rates.delay", side_effect=record_market_rates)
+    @mock.patch("shifts.services.notify_matching_professionals.delay")
+    def test_posting_and_filling_update_the_statistics(self, notify_delay, record_delay):
+        with self.captureOnCommitCallbacks(execute=True):
+            shift = self.post("2500.00")
+        record_delay.assert_called_once_with([str(shift.id)], 'posted')
+        stat = MarketRateStat.objects.get(role="nurse", specialty="icu")
+        self.assertEqual((stat.posted_count, stat.posted_average, stat.filled_count), (1, Decimal("2500.00"), 0))
+
+        pro_user = User.objects.create_user(email="pro@example.com", password="x")
+        professional = Professional.objects.create(user=pro_user, license_number="LIC-1")
+        application = ShiftApplication.objects.create(shift=shift, professional=professional)
+        with self.captureOnCommitCallbacks(execute=True):
+            ShiftManageApplicationService()(user=self.user, application_id=application.id, action='CONFIRM')
+        stat.refresh_from_db()
+        self.assertEqual((stat.filled_count, stat.filled_average), (1, Decimal("2500.00")))
+        self.assertEqual(MarketRateStat.objects.get(role="", specialty="icu").filled_count, 1)
+
+        # The backfill arrives at the same numbers from the Shift table
+        rebuild_market_rates()
+        rebuilt = MarketRateStat.objects.get(role="nurse", specialty="icu")
+        self.assertEqual((rebuilt.posted_count, rebuilt.filled_count, rebuilt.filled_average), (1, 1, Decimal("2500.00")))
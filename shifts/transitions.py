@@ -0,0 +1,57 @@
+from django.utils import timezone
+from .models import Shift, ShiftApplication
+
+# Allowed status moves, source -> targets. Every status write goes through
+# bulk_transition/transition, which turn this table into a conditional
+# UPDATE ... WHERE status IN (<sources>), so concurrent writers can't skip a step
+# or move a row twice.
+APPLICATION_TRANSITIONS = {
+    'PENDING': {'CONFIRMED', 'REJECTED'},
+    'CONFIRMED': {'ATTENDANCE_PENDING', 'CANCELLED', 'NO_SHOW'}, # NO_SHOW: completion scheduler after end_time
+    'ATTENDANCE_PENDING': {'IN_PROGRESS'}, # Facility approves the clock-in
+    'IN_PROGRESS': {'COMPLETED'}, # Clock-out, or the completion scheduler after end_time
+    'REJECTED': set(),
+    'CANCELLED': set(),
+    'COMPLETED': set(),
+    'NO_SHOW': set(),
+}
+
+SHIFT_TRANSITIONS = {
+    'OPEN': {'FILLED', 'CLOSED', 'EXPIRED', 'CANCELLED'},
+    'FILLED': {'OPEN', 'COMPLETED', 'CANCELLED'},
+    'CLOSED': {'COMPLETED', 'CANCELLED'},
+    'EXPIRED': set(),
+    'COMPLETED': set(),
+    'CANCELLED': set(),
+}
+
+TRANSITIONS = {
+    ShiftApplication: APPLICATION_TRANSITIONS,
+    Shift: SHIFT_TRANSITIONS,
+}
+
+def allowed_sources(model, to_status):
+    return [source for source, targets in TRANSITIONS[model].items() if to_status in targets]
+
+def bulk_transition(queryset, to_status, only_from=None, **fields):
+    """
+    Move every row in queryset that may legally reach to_status (optionally only from the
+    statuses in only_from) in one UPDATE, setting any extra fields too. Returns the number moved.
+    """
+    sources = allowed_sources(queryset.model, to_status)
+    if only_from is not None:
+        sources = [source for source in sources if source in only_from]
+    return queryset.filter(status__in=sources).update(status=to_status, updated_at=timezone.now(), **fields)
+
+def transition(instance, to_status, error=None, only_from=None, **fields):
+    """
+    Conditionally move one row and mirror the change on the instance.
+    Raises ValueError (error, or a generic message) if the row wasn't in an allowed state.
+    """
+    moved = bulk_transition(type(instance).objects.filter(pk=instance.pk), to_status, only_from=only_from, **fields)
+    if not moved:
+        raise ValueError(error or f"Cannot move from {instance.status} to {to_status}.")
+    instance.status = to_status
+    for name, value in fields.items():
+        setattr(instance, name, value)
+    return instance
@@ -1,13 +1,20 @@
+import math
+import uuid
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from core.router import route
 from .services import ShiftCreateService, ShiftApplyService, ShiftManageApplicationService, ClockInService, ClockOutService, ExtraTimeService
+from .services import ShiftTemplateCreateService, ShiftTemplateExpandService
 from .cancellation_services import FacilityCancelShiftService, ProfessionalCancelShiftService
 from .approval_services import ApproveShiftStartService
+from .models import Shift
 from .selectors import ShiftSelector
+from .qr import issue_token
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiTypes, inline_serializer
 from rest_framework import serializers
+from decimal import Decimal, InvalidOperation
+from django.utils.dateparse import parse_time
 
 @extend_schema(
     parameters=[
@@ -29,7 +36,7 @@ from rest_framework import serializers
     }
 )
 
-@route("shifts/", name="shift-list-create")
+@route("shifts/", name="shift-list-create", query_budget=1)
 class ShiftListCreateView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -96,6 +103,145 @@ class ShiftListCreateView(APIView):
         except ValueError as e:
             return Response({"error": str(e)}, status=400)
 
+SEARCH_MAX_LIMIT = 50
+
+@extend_schema(
+    parameters=[
+        OpenApiParameter(name='q', description='Keywords across role, specialty, address and facility name', required=False, type=str),
+        OpenApiParameter(name='status', description='Shift status (default OPEN)', required=False, type=str),
+        OpenApiParameter(name='lat', description='Latitude for the distance filter', required=False, type=float),
+        OpenApiParameter(name='lng', description='Longitude for the distance filter', required=False, type=float),
+        OpenApiParameter(name='radius_km', description='Only shifts within this many km of lat/lng', required=False, type=float),
+        OpenApiParameter(name='cursor', description='next_cursor from the previous page', required=False, type=str),
+        OpenApiParameter(name='limit', description=f'Page size (max {SEARCH_MAX_LIMIT})', required=False, type=int),
+    ],
+    responses={
+        200: inline_serializer(
+            name='ShiftSearchResponse',
+            fields={
+                'results': inline_serializer(
+                    name='ShiftSearchResult',
+                    many=True,
+                    fields={
+                        'id': serializers.UUIDField(),
+                        'facility': serializers.CharField(),
+                        'role': serializers.CharField(),
+                        'specialty': serializers.CharField(),
+                        'address': serializers.CharField(),
+                        'start_time': serializers.DateTimeField(),
+                        'end_time': serializers.DateTimeField(),
+                        'rate': serializers.DecimalField(max_digits=10, decimal_places=2),
+                        'status': serializers.CharField(),
+                        'rank': serializers.FloatField(),
+                        'distance_km': serializers.FloatField(allow_null=True)
+                    }
+                ),
+                'next_cursor': serializers.CharField(allow_null=True)
+            }
+        ),
+        400: inline_serializer(name='ShiftSearchError', fields={'error': serializers.CharField()})
+    }
+)
+@route("shifts/search/", name="shift-search", query_budget=1)
+class ShiftSearchView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        params = request.query_params
+        try:
+            lat = float(params["lat"]) if params.get("lat") else None
+            lng = float(params["lng"]) if params.get("lng") else None
+            radius_km = float(params["radius_km"]) if params.get("radius_km") else None
+            limit = min(max(int(params.get("limit") or 20), 1), SEARCH_MAX_LIMIT)
+        except ValueError:
+            return Response({"error": "lat, lng, radius_km and limit must be numbers"}, status=400)
+        # float() accepts "nan" and "inf", which would compare false against every shift
+        if any(value is not None and not math.isfinite(value) for value in (lat, lng, radius_km)):
+            return Response({"error": "lat, lng, radius_km and limit must be numbers"}, status=400)
+        if radius_km is not None and (lat is None or lng is None):
+            return Response({"error": "radius_km needs lat and lng"}, status=400)
+
+        status = params.get("status", "OPEN")
+        if status and status not in dict(Shift.STATUS_CHOICES):
+            return Response({"error": "Unknown status"}, status=400)
+
+        selector = ShiftSelector()
+        try:
+            shifts, next_cursor = selector.search_shifts(
+                text=params.get("q"),
+                status=status,
+                lat=lat, lng=lng, radius_km=radius_km,
+                cursor=params.get("cursor"),
+                limit=limit
+            )
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
+
+        data = [{
+            "id": s.id,
+            "facility": s.facility.name,
+            "role": s.role,
+            "specialty": s.specialty,
+            "address": s.address,
+            "start_time": s.start_time,
+            "end_time": s.end_time,
+            "rate": s.rate,
+            "status": s.status,
+            "rank": s.rank,
+            "distance_km": getattr(s, "distance_km", None)
+        } for s in shifts]
+
+        return Response({"results": data, "next_cursor": next_cursor})
+
+def _facet_serializer(name, **fields):
+    return inline_serializer(name=name, many=True, fields={**fields, 'count': serializers.IntegerField()})
+
+@extend_schema(
+    parameters=[
+        OpenApiParameter(name='status', description='Shift status (default OPEN)', required=False, type=str),
+        OpenApiParameter(name='lat', description='Latitude; adds distance rings', required=False, type=float),
+        OpenApiParameter(name='lng', description='Longitude; adds distance rings', required=False, type=float),
+    ],
+    responses={
+        200: inline_serializer(
+            name='ShiftFacetsResponse',
+            fields={
+                'specialty': _facet_serializer('ShiftFacetSpecialty', value=serializers.CharField()),
+                'role': _facet_serializer('ShiftFacetRole', value=serializers.CharField()),
+                'rate_band': _facet_serializer(
+                    'ShiftFacetRateBand', min=serializers.IntegerField(), max=serializers.IntegerField(allow_null=True)
+                ),
+                'distance_km': _facet_serializer(
+                    'ShiftFacetDistanceRing', min=serializers.IntegerField(), max=serializers.IntegerField(allow_null=True)
+                ),
+            }
+        ),
+        400: inline_serializer(name='ShiftFacetsError', fields={'error': serializers.CharField()})
+    }
+)
+@route("shifts/facets/", name="shift-facets", query_budget=1)
+class ShiftFacetsView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        params = request.query_params
+        try:
+            lat = float(params["lat"]) if params.get("lat") else None
+            lng = float(params["lng"]) if params.get("lng") else None
+        except ValueError:
+            return Response({"error": "lat and lng must be numbers"}, status=400)
+        # float() accepts "nan" and "inf", which can't be placed on the grid
+        if any(value is not None and not math.isfinite(value) for value in (lat, lng)):
+            return Response({"error": "lat and lng must be numbers"}, status=400)
+
+        # The status ends up in the cache key, so only real statuses (or "" for any) get through
+        status = params.get("status", "OPEN")
+        if status and status not in dict(Shift.STATUS_CHOICES):
+            return Response({"error": "Unknown status"}, status=400)
+
+        selector = ShiftSelector()
+        return Response(selector.shift_facets(status=status, lat=lat, lng=lng))
+
 @extend_schema(
     responses={
         200: inline_serializer(
@@ -139,7 +285,7 @@ class ShiftApplyView(APIView):
         400: inline_serializer(name='ManageValidationError', fields={'error': serializers.CharField()})
     }
 )
-@route("shifts/applications/<int:application_id>/manage/", name="shift-application-manage")
+@route("shifts/applications/<uuid:application_id>/manage/", name="shift-application-manage")
 class ShiftApplicationManageView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -155,25 +301,87 @@ class ShiftApplicationManageView(APIView):
             return Response({"error": str(e)}, status=400)
 
 @extend_schema(
+    responses={
+        200: inline_serializer(
+            name='ShiftApplicantListResponse',
+            many=True,
+            fields={
+                'application_id': serializers.UUIDField(),
+                'status': serializers.CharField(),
+                'professional_id': serializers.UUIDField(),
+                'name': serializers.CharField(),
+                'distance_km': serializers.FloatField(allow_null=True),
+                'avg_rating': serializers.FloatField(),
+                'reliability': serializers.FloatField(),
+                'facility_completions': serializers.IntegerField(),
+                'score': serializers.FloatField()
+            }
+        ),
+        403: inline_serializer(name='ShiftApplicantListPermissionError', fields={'error': serializers.CharField()})
+    }
+)
+@route("shifts/<uuid:shift_id>/applicants/", name="shift-applicant-list", query_budget=2)
+class ShiftApplicantListView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, shift_id):
+        try:
+            applications = ShiftSelector().list_applications(shift_id, request.user)
+        except PermissionError as e:
+            return Response({"error": str(e)}, status=403)
+            
+        # Already ranked, best first
+        data = [{
+            "application_id": app.id,
+            "status": app.status,
+            "professional_id": app.professional_id,
+            "name": app.professional.user.email, # Or full name if available
+            "distance_km": round(app.distance_km, 2) if app.distance_km is not None else None,
+            "avg_rating": round(app.avg_rating, 2),
+            "reliability": round(app.reliability, 3),
+            "facility_completions": app.facility_completions,
+            "score": round(app.score, 4)
+        } for app in applications]
+        
+        return Response(data)
+
+@extend_schema(
+    parameters=[
+        OpenApiParameter(name='shift_id', description='Only valid for clocking in/out of this shift', required=False, type=OpenApiTypes.UUID),
+    ],
     responses={
         200: inline_serializer(
             name='FacilityQRCodeResponse',
-            fields={'qr_data': serializers.CharField()}
+            fields={'qr_data': serializers.CharField(), 'refresh_in': serializers.IntegerField()}
         ),
-        403: inline_serializer(name='QRCodePermissionError', fields={'error': serializers.CharField()})
+        403: inline_serializer(name='QRCodePermissionError', fields={'error': serializers.CharField()}),
+        400: inline_serializer(name='QRCodeValidationError', fields={'error': serializers.CharField()}),
+        404: inline_serializer(name='QRCodeShiftNotFound', fields={'error': serializers.CharField()})
     }
 )
-@route("facility/qrcode/", name="facility-qrcode")
+@route("facility/qrcode/", name="facility-qrcode", query_budget=1)
 class FacilityQRCodeView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        if not request.user.is_facility:
+        shift_id = request.query_params.get("shift_id")
+        if shift_id:
+            try:
+                shift_id = uuid.UUID(shift_id)
+            except ValueError:
+                return Response({"error": "shift_id must be a UUID"}, status=400)
+            facility_id = ShiftSelector().get_own_shift_facility_id(shift_id, request.user)
+            if facility_id is None:
+                return Response({"error": "Shift not found"}, status=404)
+        elif request.user.is_facility:
+            facility_id = request.user.facility.id
+        else:
             return Response({"error": "Only facilities have QR codes"}, status=403)
             
-        # Return the facility ID as the QR code data
-        # Frontend will generate the QR image from this string.
-        return Response({"qr_data": str(request.user.facility.id)})
+        # Signed and short-lived (see shifts.qr): the facility screen fetches a new one every
+        # refresh_in seconds. Frontend will generate the QR image from this string.
+        qr_data, refresh_in = issue_token(facility_id, shift_id=shift_id)
+        return Response({"qr_data": qr_data, "refresh_in": refresh_in})
 
 @extend_schema(
     request=inline_serializer(
@@ -304,7 +512,7 @@ class ShiftCancelView(APIView):
         403: inline_serializer(name='FacilityShiftListPermissionError', fields={'error': serializers.CharField()})
     }
 )
-@route("shifts/facility/", name="facility-shift-list")
+@route("shifts/facility/", name="facility-shift-list", query_budget=2)
 class FacilityShiftListView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -343,7 +551,7 @@ class FacilityShiftListView(APIView):
         403: inline_serializer(name='StatsPermissionError', fields={'error': serializers.CharField()})
     }
 )
-@route("facility/dashboard/stats/", name="facility-dashboard-stats")
+@route("facility/dashboard/stats/", name="facility-dashboard-stats", query_budget=4)
 class FacilityDashboardStatsView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -389,7 +597,7 @@ class FacilityDashboardStatsView(APIView):
         403: inline_serializer(name='ProfShiftListPermissionError', fields={'error': serializers.CharField()})
     }
 )
-@route("shifts/professional/", name="professional-shift-list")
+@route("shifts/professional/", name="professional-shift-list", query_budget=2)
 class ProfessionalShiftListView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -534,7 +742,7 @@ class ExtraTimeApproveView(APIView):
         403: inline_serializer(name='CalendarPermissionError', fields={'error': serializers.CharField()})
     }
 )
-@route("shifts/calendar/", name="shift-calendar")
+@route("shifts/calendar/", name="shift-calendar", query_budget=3)
 class CalendarViewSet(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -559,8 +767,8 @@ class CalendarViewSet(APIView):
         
         data = []
         for shift in shifts:
-            # Get confirmed professionals for this shift
-            apps = shift.applications.filter(status__in=['CONFIRMED', 'IN_PROGRESS', 'ATTENDANCE_PENDING', 'COMPLETED'])
+            # Confirmed professionals for this shift (prefetched by the selector)
+            apps = shift.staffed_applications
             professionals = [{
                 "id": app.professional.id,
                 "name": app.professional.user.email, # Or full name if available
@@ -577,3 +785,162 @@ class CalendarViewSet(APIView):
             })
             
         return Response(data)
+
+def _template_data(template):
+    return {
+        "id": template.id,
+        "name": template.name,
+        "role": template.role,
+        "specialty": template.specialty,
+        "weekdays": template.weekdays,
+        "start_time": template.start_time,
+        "end_time": template.end_time,
+        "quantity_needed": template.quantity_needed,
+        "rate": template.rate,
+        "is_active": template.is_active,
+        "expanded_until": template.expanded_until
+    }
+
+@route("shifts/templates/", name="shift-template-list-create", query_budget=2)
+class ShiftTemplateListCreateView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        responses={
+            200: inline_serializer(
+                name='ShiftTemplate',
+                many=True,
+                fields={
+                    'id': serializers.UUIDField(),
+                    'name': serializers.CharField(),
+                    'role': serializers.CharField(),
+                    'specialty': serializers.CharField(),
+                    'weekdays': serializers.ListField(child=serializers.IntegerField()),
+                    'start_time': serializers.TimeField(),
+                    'end_time': serializers.TimeField(),
+                    'quantity_needed': serializers.IntegerField(),
+                    'rate': serializers.DecimalField(max_digits=10, decimal_places=2),
+                    'is_active': serializers.BooleanField(),
+                    'expanded_until': serializers.DateField(allow_null=True)
+                }
+            ),
+            403: inline_serializer(name='ShiftTemplateListPermissionError', fields={'error': serializers.CharField()})
+        }
+    )
+    def get(self, request):
+        if not request.user.is_facility:
+            return Response({"error": "Only facilities can view this."}, status=403)
+            
+        templates = ShiftSelector().list_facility_templates(request.user.facility)
+        return Response([_template_data(t) for t in templates])
+
+    @extend_schema(
+        request=inline_serializer(
+            name='ShiftTemplateCreateRequest',
+            fields={
+                'name': serializers.CharField(required=False),
+                'role': serializers.CharField(),
+                'specialty': serializers.CharField(),
+                'weekdays': serializers.ListField(child=serializers.IntegerField(), help_text="0 = Monday ... 6 = Sunday"),
+                'start_time': serializers.TimeField(),
+                'end_time': serializers.TimeField(help_text="At or before start_time means overnight"),
+                'quantity_needed': serializers.IntegerField(required=False),
+                'rate': serializers.DecimalField(max_digits=10, decimal_places=2),
+                'is_negotiable': serializers.BooleanField(required=False),
+                'min_rate': serializers.DecimalField(max_digits=10, decimal_places=2, required=False),
+                'address': serializers.CharField(required=False),
+                'latitude': serializers.FloatField(required=False),
+                'longitude': serializers.FloatField(required=False),
+                'horizon_days': serializers.IntegerField(required=False, help_text="Post this many days of shifts straight away"),
+            }
+        ),
+        responses={
+            201: inline_serializer(
+                name='ShiftTemplateCreateResponse',
+                fields={
+                    'id': serializers.UUIDField(),
+                    'shifts_created': serializers.IntegerField()
+                }
+            ),
+            403: inline_serializer(name='ShiftTemplateCreatePermissionError', fields={'error': serializers.CharField()}),
+            400: inline_serializer(name='ShiftTemplateCreateValidationError', fields={'error': serializers.CharField()})
+        }
+    )
+    def post(self, request):
+        start_time = parse_time(str(request.data.get("start_time", "")))
+        end_time = parse_time(str(request.data.get("end_time", "")))
+        if start_time is None or end_time is None:
+            return Response({"error": "start_time and end_time must be HH:MM times."}, status=400)
+        try:
+            rate = Decimal(str(request.data.get("rate")))
+            min_rate = request.data.get("min_rate")
+            min_rate = Decimal(str(min_rate)) if min_rate is not None else None
+            weekdays = [int(day) for day in request.data.get("weekdays") or []]
+            quantity_needed = int(request.data.get("quantity_needed", 1))
+            horizon_days = request.data.get("horizon_days")
+            horizon_days = int(horizon_days) if horizon_days is not None else None
+        except (InvalidOperation, TypeError, ValueError):
+            return Response({"error": "Invalid rate, weekdays, quantity_needed or horizon_days."}, status=400)
+            
+        service = ShiftTemplateCreateService()
+        try:
+            template, shifts = service(
+                user=request.user,
+                name=request.data.get("name", ""),
+                role=request.data.get("role"),
+                specialty=request.data.get("specialty"),
+                weekdays=weekdays,
+                start_time=start_time,
+                end_time=end_time,
+                rate=rate,
+                quantity_needed=quantity_needed,
+                is_negotiable=request.data.get("is_negotiable", False),
+                min_rate=min_rate,
+                address=request.data.get("address"),
+                latitude=request.data.get("latitude"),
+                longitude=request.data.get("longitude"),
+                horizon_days=horizon_days
+            )
+            return Response({"id": template.id, "shifts_created": len(shifts)}, status=201)
+        except PermissionError as e:
+            return Response({"error": str(e)}, status=403)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
+
+@extend_schema(
+    request=inline_serializer(
+        name='ShiftTemplateExpandRequest',
+        fields={
+            'days': serializers.IntegerField(required=False, help_text="Horizon from today, default 28"),
+        }
+    ),
+    responses={
+        200: inline_serializer(
+            name='ShiftTemplateExpandResponse',
+            fields={
+                'shifts_created': serializers.IntegerField(),
+                'expanded_until': serializers.DateField()
+            }
+        ),
+        403: inline_serializer(name='ShiftTemplateExpandPermissionError', fields={'error': serializers.CharField()}),
+        400: inline_serializer(name='ShiftTemplateExpandValidationError', fields={'error': serializers.CharField()})
+    }
+)
+@route("shifts/templates/<uuid:template_id>/expand/", name="shift-template-expand")
+class ShiftTemplateExpandView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, template_id):
+        try:
+            days = int(request.data.get("days", 28))
+        except (TypeError, ValueError):
+            return Response({"error": "days must be a number."}, status=400)
+            
+        service = ShiftTemplateExpandService()
+        try:
+            template, shifts = service(user=request.user, template_id=template_id, days=days)
+            return Response({"shifts_created": len(shifts), "expanded_until": template.expanded_until})
+        except PermissionError as e:
+            return Response({"error": str(e)}, status=403)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)